@@ -1,11 +1,30 @@
 import streamlit as st
-import anthropic
 import os
-import re
-import glob
+import uuid
 from datetime import datetime
-from fpdf import FPDF
-import base64
+
+from pocketpa.admission import (
+    PRIORITY_BACKGROUND, PRIORITY_CHAT, PRIORITY_REPORT, estimate_tokens, get_admission_controller
+)
+from pocketpa.clients import get_async_anthropic_client
+from pocketpa.context import ConversationContext
+from pocketpa.pdf_cache import PDFCache
+from pocketpa.drafts import SESSION_ID_RE, DraftJournal
+from pocketpa.gap_detection import Gap, build_gap_check_request, check_report, format_gaps, parse_gap_check
+from pocketpa.incident import (
+    FIELDS_CLOSE, FIELDS_OPEN, IncidentRecord, insert_before_heading, parse_fields, split_fields_block
+)
+from pocketpa.progress import ProgressTracker
+from pocketpa.report_index import KIND_CONVERSATION, KIND_FORMAL, ReportIndex
+from pocketpa.rendering import render_message
+from pocketpa.reports import build_report_request, format_conversation_log
+from pocketpa.prompts import CacheStats, build_system_blocks
+from pocketpa.skills import get_skill_registry
+from pocketpa.service import ConversationService, ServiceBusy, complete_claude, stream_claude
+from pocketpa.speculation import ReportSpeculator, SpeculationStats, draft_key
+from pocketpa.streaming import REPORT_TAG, BlockStreamFilter, StreamTimer, TagStreamFilter
+from pocketpa.tenancy import HOME_HEADER, HomeStorage, valid_home
+from pocketpa.tracing import current_span, get_tracer
 
 # Page Configuration
 st.set_page_config(
@@ -18,13 +37,91 @@ st.set_page_config(
 # Constants - API key should be stored in Streamlit secrets
 API_KEY = st.secrets.get("ANTHROPIC_API_KEY", "")
 MODEL_NAME = "claude-opus-4-20250514"
-MEMORY_DIR = os.path.join("memory", "staff-contexts")
-DRAFT_FILE = "current_draft_session.txt"
+# Each care home's reports, drafts and caches live in their own folder under here (see pocketpa/tenancy.py)
+MEMORY_ROOT = "memory"
+HOME_ID = st.secrets.get("HOME_ID", "default")
+# Behind scripts/serve.py the router names the home per request; workers it launches trust that header
+TRUST_HOME_HEADER = st.secrets.get("TRUST_HOME_HEADER", bool(os.environ.get("POCKETPA_WORKER_ID")))
+# Rendered PDFs: in-memory LRU plus an optional on-disk tier
+PDF_CACHE_SIZE = int(st.secrets.get("PDF_CACHE_SIZE", 64))
+PDF_DISK_CACHE = st.secrets.get("PDF_DISK_CACHE", True)
+# Past Reports browser
+REPORTS_PER_PAGE = 10
+REPORT_KINDS = {"All": None, "Formal": KIND_FORMAL, "Conversation": KIND_CONVERSATION}
+# Bulk exports are written to the home's exports/ folder before download
+EXPORT_FORMATS = {"ZIP of PDFs": ".zip", "One PDF with contents": ".pdf"}
+# Chat history drawn per rerun; earlier messages are shown a page at a time on request
+HISTORY_PAGE = int(st.secrets.get("HISTORY_PAGE", 30))
+AVATARS = {"user": "👤", "assistant": "🛡️"}
+# Render replies token-by-token instead of waiting behind a spinner
+STREAM_RESPONSES = st.secrets.get("STREAM_RESPONSES", True)
+# Raw messages sent with each chat turn; older turns are sent as a structured summary
+CONTEXT_RECENT_MESSAGES = int(st.secrets.get("CONTEXT_RECENT_MESSAGES", 6))
+# Start drafting the report in the background once progress reaches this (above 1 disables it)
+SPECULATE_AT_PROGRESS = float(st.secrets.get("SPECULATE_AT_PROGRESS", 0.875))
+# How long a report waits on an unfinished draft before generating the narrative itself
+DRAFT_WAIT_SECONDS = float(st.secrets.get("DRAFT_WAIT_SECONDS", 5))
+# Shared HTTP connection pool for the Anthropic client
+POOL_SIZE = int(st.secrets.get("ANTHROPIC_POOL_SIZE", 20))
+KEEPALIVE_SECONDS = float(st.secrets.get("ANTHROPIC_KEEPALIVE_SECONDS", 60))
+TIMEOUT_SECONDS = float(st.secrets.get("ANTHROPIC_TIMEOUT_SECONDS", 60))
+# Shared async backend: turns in flight across all sessions, and queue depth
+SERVICE_MAX_CONCURRENCY = int(st.secrets.get("SERVICE_MAX_CONCURRENCY", 8))
+SERVICE_MAX_QUEUE = int(st.secrets.get("SERVICE_MAX_QUEUE", 256))
+BUSY_MESSAGE = "⚠️ PocketPA is helping a lot of people right now. Please try again in a moment."
+# Provider rate limits we admit requests under (set to your account's tier), and retries on 429/529
+REQUESTS_PER_MINUTE = int(st.secrets.get("ANTHROPIC_REQUESTS_PER_MINUTE", 50))
+TOKENS_PER_MINUTE = int(st.secrets.get("ANTHROPIC_TOKENS_PER_MINUTE", 40000))
+MAX_RETRIES = int(st.secrets.get("ANTHROPIC_MAX_RETRIES", 4))
+RATE_LIMITED_MESSAGE = "⚠️ PocketPA is still rate limited after several retries. Please wait a minute and try again."
+# Stage timings: optional JSONL trace file and Prometheus /metrics port (0 = off), and the sidebar admin panel
+TRACE_FILE = st.secrets.get("TRACE_FILE", "")
+METRICS_PORT = int(st.secrets.get("METRICS_PORT", 0))
+ADMIN_PANEL = st.secrets.get("ADMIN_PANEL", False)
+# Generated reports are checked for gaps locally; only findings the rules can't settle are sent to Claude
+GAP_CHECK_WITH_CLAUDE = st.secrets.get("GAP_CHECK_WITH_CLAUDE", True)
+
+# Static prompt text - kept byte-identical across turns so it is served from the prompt cache
+# Used when the incident record already holds the basic facts: the header,
+# people and footer are rendered locally and only these sections are written.
+REPORT_NARRATIVE_PROMPT = """You are writing the narrative sections of a formal incident report for a UK care home. You are given the structured incident record and the staff member's own words. Be professional, factual and thorough. Do not invent details.
+
+Write ONLY these sections, in this order, with these exact headings:
+INCIDENT DESCRIPTION
+[Full narrative of what happened - expand on raw notes to be comprehensive]
+
+CHILD'S EMOTIONAL STATE
+Before: [description]
+During: [description]
+After: [description]
+
+IMMEDIATE ACTION TAKEN
+[Actions and interventions]
+
+INJURIES / DAMAGE
+[Description or "None reported"]
+
+FOLLOW-UP REQUIRED
+[Yes/No and details]
 
-# Ensure memory directory exists
-os.makedirs(MEMORY_DIR, exist_ok=True)
+COMPLIANCE NOTES
+[Assess if anything is missing or needs attention]"""
+
+CHAT_GUIDANCE = f"""Respond naturally and empathetically. Guide them through incident reporting by asking ONE question at a time. Be warm and patient.
+
+Make responses feel human:
+- "Take your time, I'm here to help"
+- "I understand this can be stressful"
+- "Let me make sure I have everything..."
+- Use staff member's language and tone
+- Be concise but thorough.
+- If the user is stressed, reassure them first.
+
+IMPORTANT: When you have gathered ALL required information (Date, Time, Location, Child, Staff, Description, People, Actions, Injuries) according to the skill instructions, YES/NO for specific details is fine if covered, output the tag {REPORT_TAG} at the end of your response.
 
-# Custom Styling
+After every response, add a hidden block {FIELDS_OPEN}{{...}}{FIELDS_CLOSE} holding a JSON object with the report fields the staff member's latest message gave or corrected. Use only these keys: date (DD/MM/YYYY), time (HH:MM), location, child_name, description (the full factual narrative so far), staff_present (list of names), witnesses (list), immediate_action, emotional_state (object with before, during, after), injuries_damage, follow_up, reporting_staff. Leave out anything not mentioned; use {FIELDS_OPEN}{{}}{FIELDS_CLOSE} if nothing new was given. The staff member never sees this block."""
+
+# Custom Styling - emitted on every run: Streamlit removes elements a rerun does not repeat
 st.markdown("""
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600&display=swap');
@@ -176,251 +273,558 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+@st.cache_resource
+def get_registry():
+    """Skills and context documents, held in memory and reloaded when the files change."""
+    return get_skill_registry(".")
+
 def load_system_context():
-    """Load context from markdown files."""
-    agents_content = ""
-    skill_content = ""
-    
-    # Load AGENTS.md
-    agents_path = "AGENTS.md"
-    if os.path.exists(agents_path):
-        try:
-            with open(agents_path, "r", encoding="utf-8") as f:
-                agents_content = f.read()
-        except Exception as e:
-            st.error(f"Error loading {agents_path}: {e}")
-    
-    # Load skills/incident-report.md
-    skills_path = os.path.join("skills", "incident-report.md")
-    if os.path.exists(skills_path):
-        try:
-            with open(skills_path, "r", encoding="utf-8") as f:
-                skill_content = f.read()
-        except Exception as e:
-            st.error(f"Error loading {skills_path}: {e}")
-            
+    """Load context from markdown files (no file I/O unless they changed on disk)."""
+    registry = get_registry()
+    agents_content = registry.document("AGENTS.md")
+    skill_content = registry.skill_text("incident-report")
+    for path, error in registry.errors.items():
+        st.error(f"Error loading {path}: {error}")
     return agents_content, skill_content
 
-class PDFReport(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'PocketPA Incident Report', 0, 1, 'C')
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-def create_pdf_report(report_text):
-    pdf = PDFReport()
-    pdf.add_page()
-    pdf.set_font("Arial", size=11)
-    
-    # Handle simple markdown-like headers in report
-    for line in report_text.split('\n'):
-        if line.isupper() and len(line) > 5 and ":" not in line:
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(0, 10, line, 0, 1)
-            pdf.set_font("Arial", size=11)
+@st.cache_resource
+def get_service():
+    """One asyncio conversation service per process, shared by every session."""
+    return ConversationService(max_concurrency=SERVICE_MAX_CONCURRENCY, max_queue=SERVICE_MAX_QUEUE)
+
+@st.cache_resource
+def get_client():
+    """
+    One pooled async Anthropic client per process, shared by every session.
+    Only used from the conversation service's event loop.
+    """
+    client = get_async_anthropic_client(
+        API_KEY,
+        pool_size=POOL_SIZE,
+        keepalive=KEEPALIVE_SECONDS,
+        timeout=TIMEOUT_SECONDS
+    )
+    # Retries are handled by the admission controller, which honours retry-after
+    return client.with_options(max_retries=0)
+
+@st.cache_resource
+def get_admission():
+    """One admission controller per process, so all sessions share the provider's rate limits."""
+    return get_admission_controller(
+        "anthropic",
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        max_retries=MAX_RETRIES
+    )
+
+@st.cache_resource
+def get_app_tracer():
+    """Process-wide stage timings, shared by every session."""
+    return get_tracer(TRACE_FILE or None, METRICS_PORT or None)
+
+def trace_error(error):
+    """Mark the current span as failed when an error is handled rather than raised."""
+    span = current_span()
+    if span is not None:
+        span.set(error=error)
+
+def render_pdf(report_text):
+    from pocketpa.pdf import create_pdf_report
+    with get_app_tracer().span("create_pdf_report", chars=len(report_text)):
+        return create_pdf_report(report_text)
+
+def get_storage():
+    """Where this session's care home keeps its data."""
+    home = HOME_ID
+    if TRUST_HOME_HEADER:
+        home = st.context.headers.get(HOME_HEADER) or home
+    if not valid_home(home):
+        st.error("This PocketPA address is not set up for a care home.")
+        st.stop()
+    return HomeStorage(MEMORY_ROOT, home)
+
+def get_pdf_cache():
+    """The home's cache of rendered PDFs, keyed by report content."""
+    return get_home_pdf_cache(get_storage().home)
+
+@st.cache_resource
+def get_home_pdf_cache(home):
+    """Process-wide cache of rendered PDFs for one home."""
+    storage = HomeStorage(MEMORY_ROOT, home)
+    return PDFCache(
+        render_pdf,
+        max_entries=PDF_CACHE_SIZE,
+        disk_dir=storage.pdf_cache_dir if PDF_DISK_CACHE else None
+    )
+
+def pdf_download(report_text, file_name, key, label="📄 Download PDF"):
+    """Offer a PDF download, rendering the PDF only the first time it is asked for."""
+    cache = get_pdf_cache()
+    if cache.contains(report_text) or st.button("📄 Prepare PDF", key=f"{key}_prepare"):
+        st.download_button(label, cache.get(report_text), file_name=file_name, mime="application/pdf", key=key)
+
+def build_export(rows, export_format):
+    """Write the selected reports to one file in the home's exports/ folder and return its path."""
+    from pocketpa.export import export_merged_pdf, export_zip, report_heading
+    exports_dir = get_storage().exports_dir
+    os.makedirs(exports_dir, exist_ok=True)
+    previous = st.session_state.pop("bulk_export", None)
+    if previous and os.path.exists(previous):
+        os.remove(previous)
+    path = os.path.join(exports_dir, f"reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}{EXPORT_FORMATS[export_format]}")
+    with get_app_tracer().span("export_reports", reports=len(rows), format=EXPORT_FORMATS[export_format]):
+        if export_format == "ZIP of PDFs":
+            bar = st.progress(0.0, text="Rendering PDFs...")
+            export_zip([row["path"] for row in rows], path, cache=get_pdf_cache(),
+                       progress=lambda done, total: bar.progress(done / total, text=f"Rendered {done} of {total}"))
         else:
-            # Replace unsupported characters if any
-            clean_line = line.encode('latin-1', 'replace').decode('latin-1')
-            pdf.multi_cell(0, 7, clean_line)
-            
-    return pdf.output(dest='S').encode('latin-1')
+            with st.spinner("Building PDF..."):
+                export_merged_pdf([(report_heading(row), row["path"]) for row in rows], path)
+    return path
+
+def get_report_index():
+    """The home's index of saved reports."""
+    return get_home_report_index(get_storage().home)
+
+@st.cache_resource
+def get_home_report_index(home):
+    """Process-wide index of one home's saved reports, backfilled from disk on first use."""
+    storage = HomeStorage(MEMORY_ROOT, home)
+    index = ReportIndex(storage.report_index_path, storage.reports_dir)
+    index.ensure_built()
+    return index
 
 def save_report_to_file(content, is_formal_report=False):
-    """Save content to a file in memory/staff-contexts/."""
+    """Save content to a file in the home's staff-contexts/ folder."""
     if not content:
         return False, "No content to save."
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     prefix = "FORMAL_INCIDENT_REPORT" if is_formal_report else "conversation_log"
     filename = f"{prefix}_{timestamp}.txt"
-    filepath = os.path.join(MEMORY_DIR, filename)
+    reports_dir = get_storage().reports_dir
+    filepath = os.path.join(reports_dir, filename)
     
     try:
+        os.makedirs(reports_dir, exist_ok=True)
         with open(filepath, "w", encoding="utf-8") as f:
             f.write(content)
+        get_report_index().add(filepath, content)
         return True, f"Saved to {filepath}"
     except Exception as e:
         return False, f"Failed to save: {e}"
 
+def get_session_id():
+    """Stable id for this browser session, kept in the URL so a reload recovers the draft."""
+    session_id = st.query_params.get("session")
+    if not session_id or not SESSION_ID_RE.match(session_id):
+        session_id = uuid.uuid4().hex
+        st.query_params["session"] = session_id
+    return session_id
+
+def get_journal():
+    """This session's append-only draft journal."""
+    if "draft_journal" not in st.session_state:
+        st.session_state.draft_journal = DraftJournal(get_session_id(), get_storage().drafts_dir)
+    return st.session_state.draft_journal
+
 def save_draft(messages):
-    """Auto-save current session to draft file."""
+    """Auto-save any new messages (or an undo) to the session journal."""
+    try:
+        with get_app_tracer().span("save_draft"):
+            get_journal().sync(messages)
+    except OSError as e:
+        st.toast(f"Draft autosave failed: {e}", icon="⚠️")
+
+def compact_draft(messages):
+    """Rewrite the session journal down to the live messages once a report is final."""
     try:
-        with open(DRAFT_FILE, 'w', encoding='utf-8') as f:
-            for msg in messages:
-                # Sanitise content for storage
-                content = msg['content'].replace("|||", "")
-                f.write(f"{msg['role']}::{content}|||")
-    except Exception:
-        pass 
+        get_journal().compact(messages)
+    except OSError as e:
+        st.toast(f"Draft autosave failed: {e}", icon="⚠️")
 
 def load_draft():
-    """Load session from draft file if exists."""
-    messages = []
-    if os.path.exists(DRAFT_FILE):
-        try:
-            with open(DRAFT_FILE, 'r', encoding='utf-8') as f:
-                data = f.read()
-                chunks = data.split('|||')
-                for chunk in chunks:
-                    if '::' in chunk:
-                        role, content = chunk.split('::', 1)
-                        if role and content:
-                            messages.append({"role": role, "content": content})
-        except Exception:
-            pass
-    return messages
+    """Recover this session's messages from its journal, if any."""
+    try:
+        return get_journal().load()
+    except OSError as e:
+        st.toast(f"Could not restore draft: {e}", icon="⚠️")
+        return []
+
+@st.cache_resource
+def get_speculation_stats():
+    """Speculative draft hit/miss counters, shared by every session."""
+    return SpeculationStats()
+
+def get_speculator():
+    """This session's speculative report draft."""
+    if "report_speculator" not in st.session_state:
+        st.session_state.report_speculator = ReportSpeculator(get_speculation_stats())
+    return st.session_state.report_speculator
 
 def calculate_progress(messages):
-    """Estimate report progress based on gathered fields."""
-    full_text = " ".join([m['content'].lower() for m in messages])
-    
-    fields = {
-        "Date/Time": False,
-        "Location": False,
-        "Child ID": False,
-        "Staff Present": False,
-        "Description": False,
-        "Emotional State": False,
-        "Action Taken": False,
-        "Injuries": False
-    }
-    
-    # Enhanced patterns
-    if re.search(r'\b(date|time|happened at|when)\b', full_text): fields["Date/Time"] = True
-    if re.search(r'\b(where|location|room|lounge|garden|bedroom)\b', full_text): fields["Location"] = True
-    if re.search(r'\b(child|resident|who|initials|name|him|her)\b', full_text): fields["Child ID"] = True
-    if re.search(r'\b(staff|witness|present|saw|colleague)\b', full_text): fields["Staff Present"] = True
-    if len(messages) > 4: fields["Description"] = True 
-    if re.search(r'\b(emotion|feeling|upset|calm|angry|crying|distressed|happy)\b', full_text): fields["Emotional State"] = True
-    if re.search(r'\b(did|action|intervention|called|helped|comforted|administered)\b', full_text): fields["Action Taken"] = True
-    if re.search(r'\b(hurt|injury|mark|bruise|cut|scratch|wound|no injur)\b', full_text): fields["Injuries"] = True
-    
-    completed = sum(fields.values())
-    total = len(fields)
-    return completed / total, fields
+    """Estimate report progress based on gathered fields (only new messages are scanned)."""
+    if "progress_tracker" not in st.session_state:
+        st.session_state.progress_tracker = ProgressTracker()
+    return st.session_state.progress_tracker.update(messages)
+
+def record_usage(usage):
+    """Track prompt-cache hits and misses for this session, and token counts on the current span."""
+    span = current_span()
+    if span is not None:
+        span.record_usage(usage)
+    if "cache_stats" not in st.session_state:
+        st.session_state.cache_stats = CacheStats()
+    return st.session_state.cache_stats.record(usage)
+
+def build_narrative_request(record, messages):
+    """Build the request for just the narrative sections, from the record and the staff's own words."""
+    staff_words = "\n".join(f"- {msg['content']}" for msg in messages if msg["role"] == "user")
+
+    system_blocks = build_system_blocks([REPORT_NARRATIVE_PROMPT])
+
+    user_message = f"INCIDENT RECORD:\n{record.to_json()}\n\nSTAFF MEMBER'S OWN WORDS:\n{staff_words}"
+    return system_blocks, [{"role": "user", "content": user_message}]
 
 def generate_formal_report(messages):
-    """Generate a formal incident report using Claude."""
-    try:
-        client = anthropic.Anthropic(api_key=API_KEY)
-        
-        conversation_text = ""
-        for msg in messages:
-            role = msg["role"].upper()
-            content = msg["content"]
-            conversation_text += f"{role}: {content}\n\n"
-
-        system_prompt = """You are generating a formal incident report for a UK care home. Use the information provided to create a comprehensive, compliant report. Be professional and thorough.
-
-Report format:
-INCIDENT REPORT
-BASIC INFORMATION
-Date: [date]
-Time: [time]
-Location: [location]
-Child: [name/ID]
-Reporting Staff: [staff name]
-Report ID: [auto-generated]
+    """
+    Generate a formal incident report. When the incident record has the basic
+    facts, only the narrative sections come from Claude. Returns a bare
+    ReportError if Claude fails.
+    """
+    with get_app_tracer().span("generate_formal_report", stream=False) as span:
+        record = IncidentRecord.from_messages(messages)
+        if not record.can_render_header():
+            span.set(path="full")
+            get_speculator().invalidate()
+            return complete_report(*build_report_request(messages), max_tokens=2048)
 
-INCIDENT DESCRIPTION
-[Full narrative of what happened - expand on raw notes to be comprehensive]
+        narrative = take_report_draft(record, messages)
+        span.set(path="local", draft_hit=narrative is not None)
+        if narrative is None:
+            narrative = complete_report(*build_narrative_request(record, messages), max_tokens=1200)
+            if isinstance(narrative, ReportError):
+                return narrative
+        body = "".join(insert_before_heading([narrative], "CHILD'S EMOTIONAL STATE", record.render_people()))
+        return record.render_header() + body + record.render_footer()
 
-PEOPLE INVOLVED
-Staff Present: [names]
-Witnesses: [names or "None"]
+def watch_errors(chunks, outcome):
+    """Pass chunks through, noting any ReportError in outcome["error"]."""
+    for chunk in chunks:
+        if isinstance(chunk, ReportError):
+            outcome["error"] = chunk
+        yield chunk
 
-CHILD'S EMOTIONAL STATE
-Before: [description]
-During: [description]
-After: [description]
+def stream_formal_report(messages, outcome):
+    """
+    Stream a formal incident report, yielding text chunks. The locally rendered
+    header is yielded straight away; only the narrative is streamed from Claude.
+    If Claude fails, outcome["error"] is set and the footer is left off.
+    """
+    with get_app_tracer().span("generate_formal_report", stream=True) as span:
+        record = IncidentRecord.from_messages(messages)
+        if not record.can_render_header():
+            span.set(path="full")
+            get_speculator().invalidate()
+            yield from watch_errors(stream_report(*build_report_request(messages), max_tokens=2048), outcome)
+            return
 
-IMMEDIATE ACTION TAKEN
-[Actions and interventions]
+        yield record.render_header()
+        narrative = take_report_draft(record, messages)
+        span.set(path="local", draft_hit=narrative is not None)
+        if narrative is not None:
+            narrative_chunks = [narrative]
+        else:
+            narrative_chunks = watch_errors(stream_report(*build_narrative_request(record, messages), max_tokens=1200), outcome)
+        yield from insert_before_heading(narrative_chunks, "CHILD'S EMOTIONAL STATE", record.render_people())
+        if "error" not in outcome:
+            yield record.render_footer()
 
-INJURIES / DAMAGE
-[Description or "None reported"]
+def start_report_draft(messages):
+    """
+    Draft the report narrative in the background once the interview is nearly
+    done. The draft is keyed on the incident record and the staff's messages,
+    so a later turn that changes either invalidates it and a fresh draft is
+    started.
+    """
+    record = IncidentRecord.from_messages(messages)
+    if not record.can_render_header():
+        return
+    client = get_client()
+    admission = get_admission()
+    service = get_service()
+    system_blocks, report_messages = build_narrative_request(record, messages)
+    tokens = estimate_tokens(system_blocks, report_messages, 1200)
 
-FOLLOW-UP REQUIRED
-[Yes/No and details]
+    # Queued under its own key so it never holds up this session's next chat turn
+    draft_owner = f"{get_session_id()}:draft"
+    try:
+        get_speculator().prepare(draft_key(record, messages), lambda: service.submit(draft_owner, lambda: admission.run_async(
+            lambda: complete_claude(
+                client,
+                model=MODEL_NAME,
+                max_tokens=1200,
+                system=system_blocks,
+                messages=report_messages
+            ),
+            tokens,
+            PRIORITY_BACKGROUND
+        )))
+    except ServiceBusy:
+        pass  # busy - the report will be generated live instead
 
-COMPLIANCE NOTES
-[Assess if anything is missing or needs attention]
+def take_report_draft(record, messages):
+    """Return the speculative narrative for `record` and `messages`, or None if there is no matching draft ready."""
+    response = get_speculator().take(draft_key(record, messages), timeout=DRAFT_WAIT_SECONDS)
+    if response is None:
+        return None
+    record_usage(response.usage)
+    return response.content[0].text
 
-Report Generated: [timestamp]
-Status: AWAITING STAFF APPROVAL"""
+class ReportError(str):
+    """An error message returned in place of report text, so callers can tell the two apart."""
 
-        user_message = f"Please generate the incident report based on this conversation:\n\n{conversation_text}"
+def complete_report(system_blocks, report_messages, max_tokens):
+    """Run a report request on Claude and return its text, or a ReportError."""
+    import anthropic
+    try:
+        client = get_client()
+        admission = get_admission()
 
-        response = client.messages.create(
-            model=MODEL_NAME,
-            max_tokens=2048,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_message}]
-        )
+        tokens = estimate_tokens(system_blocks, report_messages, max_tokens)
+
+        response = get_service().submit(get_session_id(), lambda: admission.run_async(
+            lambda: complete_claude(
+                client,
+                model=MODEL_NAME,
+                max_tokens=max_tokens,
+                system=system_blocks,
+                messages=report_messages
+            ),
+            tokens,
+            PRIORITY_REPORT
+        )).result()
+        record_usage(response.usage)
         
         return response.content[0].text
         
+    except ServiceBusy:
+        trace_error("busy")
+        return ReportError(BUSY_MESSAGE)
     except anthropic.RateLimitError:
-        return "⚠️ PocketPA is currently busy (Rate Limit Reached). Please wait a moment and try again."
+        trace_error("rate_limited")
+        return ReportError(RATE_LIMITED_MESSAGE)
     except anthropic.APIError as e:
-        return f"⚠️ Connection Error: {str(e)}"
+        trace_error(type(e).__name__)
+        return ReportError(f"⚠️ Connection Error: {str(e)}")
     except Exception as e:
-        return f"⚠️ Error generating report: {str(e)}"
+        trace_error(type(e).__name__)
+        return ReportError(f"⚠️ Error generating report: {str(e)}")
 
-def get_claude_response(messages, agents_context, skill_context):
-    """Generate response from Claude API with robustness."""
-    try:
-        client = anthropic.Anthropic(api_key=API_KEY)
-        
-        history_to_send = []
-        recent_messages = messages[-5:] if len(messages) > 5 else messages
-        
-        for msg in recent_messages:
-            history_to_send.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-            
-        system_prompt = f"""You are PocketPA, an AI assistant for care home staff.
+def check_report_gaps(report_text):
+    """
+    Check a generated report for missing, contradictory or vague details.
+    Returns the findings as dicts, to be stored with the report message.
+    """
+    with get_app_tracer().span("gap_detection") as span:
+        result = check_report(report_text, get_registry().skill_text("incident-report"))
+        gaps = result.definite
+        span.set(gaps=len(result.gaps), ambiguous=len(result.ambiguous))
+        if result.ambiguous and GAP_CHECK_WITH_CLAUDE:
+            reply = complete_report(*build_gap_check_request(report_text, result.ambiguous), max_tokens=200)
+            confirmed = parse_gap_check(reply, result.ambiguous)
+            # An unreadable reply leaves the ambiguous findings for the staff member to check
+            gaps = gaps + (result.ambiguous if confirmed is None else confirmed)
+        else:
+            gaps = gaps + result.ambiguous
+        return [gap.as_dict() for gap in gaps]
 
-{agents_context}
+def show_gaps(gaps):
+    """Show the gap check's findings under a report."""
+    findings = [Gap(**gap) for gap in gaps]
+    if findings:
+        st.warning(format_gaps(findings))
+    else:
+        st.success(format_gaps(findings))
 
-SKILL INSTRUCTIONS:
-{skill_context}
+def stream_report(system_blocks, report_messages, max_tokens):
+    """Stream a report request from Claude, yielding text chunks (a ReportError on failure)."""
+    import anthropic
+    try:
+        client = get_client()
+        admission = get_admission()
+        usage = {}
 
-Respond naturally and empathetically. Guide them through incident reporting by asking ONE question at a time. Be warm and patient.
+        tokens = estimate_tokens(system_blocks, report_messages, max_tokens)
 
-Make responses feel human:
-- "Take your time, I'm here to help"
-- "I understand this can be stressful"
-- "Let me make sure I have everything..."
-- Use staff member's language and tone
-- Be concise but thorough.
-- If the user is stressed, reassure them first.
+        yield from get_service().stream(get_session_id(), lambda: admission.stream_async(
+            lambda: stream_claude(
+                client,
+                usage,
+                model=MODEL_NAME,
+                max_tokens=max_tokens,
+                system=system_blocks,
+                messages=report_messages
+            ),
+            tokens,
+            PRIORITY_REPORT,
+            usage
+        ))
+        record_usage(usage.get("usage"))
 
-IMPORTANT: When you have gathered ALL required information (Date, Time, Location, Child, Staff, Description, People, Actions, Injuries) according to the skill instructions, YES/NO for specific details is fine if covered, output the tag <GENERATE_REPORT> at the very end of your response."""
+    except ServiceBusy:
+        trace_error("busy")
+        yield ReportError(BUSY_MESSAGE)
+    except anthropic.RateLimitError:
+        trace_error("rate_limited")
+        yield ReportError(RATE_LIMITED_MESSAGE)
+    except anthropic.APIError as e:
+        trace_error(type(e).__name__)
+        yield ReportError(f"⚠️ Connection Error: {str(e)}")
+    except Exception as e:
+        trace_error(type(e).__name__)
+        yield ReportError(f"⚠️ Error generating report: {str(e)}")
 
-        response = client.messages.create(
-            model=MODEL_NAME,
-            max_tokens=2048,
-            system=system_prompt,
-            messages=history_to_send
+def get_conversation_context(skill_context):
+    """Rolling summary of this session's older turns, kept in session state."""
+    if st.session_state.get("conversation_context_skill") != skill_context:
+        # First turn, or the skill file was edited: rebuild from its REQUIRED FIELDS table
+        st.session_state.conversation_context = ConversationContext.from_skill(
+            skill_context, recent_messages=CONTEXT_RECENT_MESSAGES
         )
+        st.session_state.conversation_context_skill = skill_context
+    return st.session_state.conversation_context
+
+def build_chat_request(messages, agents_context, skill_context):
+    """
+    Build the system blocks and recent history for a chat turn.
+    The static system prompt is cached as one prefix; the summary of older
+    turns changes every few turns, so it goes after the cache breakpoint.
+    """
+    summary, recent_messages = get_conversation_context(skill_context).build(messages)
+    history_to_send = []
+    
+    for msg in recent_messages:
+        history_to_send.append({
+            "role": msg["role"],
+            "content": msg["content"]
+        })
         
-        return response.content[0].text
+    system_blocks = build_system_blocks([
+        f"You are PocketPA, an AI assistant for care home staff.\n\n{agents_context}",
+        f"SKILL INSTRUCTIONS:\n{skill_context}",
+        CHAT_GUIDANCE
+    ], [summary] if summary else [])
+
+    return system_blocks, history_to_send
+
+def get_claude_response(messages, agents_context, skill_context):
+    """Generate response from Claude API with robustness."""
+    import anthropic
+    with get_app_tracer().span("get_claude_response", stream=False):
+        try:
+            client = get_client()
+            admission = get_admission()
+            system_blocks, history_to_send = build_chat_request(messages, agents_context, skill_context)
+
+            tokens = estimate_tokens(system_blocks, history_to_send, 2048)
+
+            response = get_service().submit(get_session_id(), lambda: admission.run_async(
+                lambda: complete_claude(
+                    client,
+                    model=MODEL_NAME,
+                    max_tokens=2048,
+                    system=system_blocks,
+                    messages=history_to_send
+                ),
+                tokens,
+                PRIORITY_CHAT
+            )).result()
+            record_usage(response.usage)
         
-    except anthropic.RateLimitError:
-        return "⚠️ PocketPA is thinking too hard! (Rate Limit). Please wait a few seconds."
-    except anthropic.APIError as e:
-        return f"⚠️ I'm having trouble connecting to the network right now. ({str(e)})"
-    except Exception as e:
-        return f"⚠️ Something went wrong: {str(e)}"
+            return response.content[0].text
+        
+        except ServiceBusy:
+            trace_error("busy")
+            return BUSY_MESSAGE
+        except anthropic.RateLimitError:
+            trace_error("rate_limited")
+            return RATE_LIMITED_MESSAGE
+        except anthropic.APIError as e:
+            trace_error(type(e).__name__)
+            return f"⚠️ I'm having trouble connecting to the network right now. ({str(e)})"
+        except Exception as e:
+            trace_error(type(e).__name__)
+            return f"⚠️ Something went wrong: {str(e)}"
+
+def stream_claude_response(messages, agents_context, skill_context):
+    """Stream a response from Claude via the conversation service, yielding text chunks as they arrive."""
+    import anthropic
+    with get_app_tracer().span("get_claude_response", stream=True):
+        try:
+            client = get_client()
+            admission = get_admission()
+            system_blocks, history_to_send = build_chat_request(messages, agents_context, skill_context)
+            usage = {}
+
+            tokens = estimate_tokens(system_blocks, history_to_send, 2048)
+
+            yield from get_service().stream(get_session_id(), lambda: admission.stream_async(
+                lambda: stream_claude(
+                    client,
+                    usage,
+                    model=MODEL_NAME,
+                    max_tokens=2048,
+                    system=system_blocks,
+                    messages=history_to_send
+                ),
+                tokens,
+                PRIORITY_CHAT,
+                usage
+            ))
+            record_usage(usage.get("usage"))
+
+        except ServiceBusy:
+            trace_error("busy")
+            yield BUSY_MESSAGE
+        except anthropic.RateLimitError:
+            trace_error("rate_limited")
+            yield RATE_LIMITED_MESSAGE
+        except anthropic.APIError as e:
+            trace_error(type(e).__name__)
+            yield f"⚠️ I'm having trouble connecting to the network right now. ({str(e)})"
+        except Exception as e:
+            trace_error(type(e).__name__)
+            yield f"⚠️ Something went wrong: {str(e)}"
+
+def render_stream(chunks, css_class, filters=()):
+    """
+    Render streamed chunks into a single bubble as they arrive, passing them
+    through `filters` (tag / hidden-block filters) in order.
+    Returns the final text and the StreamTimer for the reply.
+    """
+    placeholder = st.empty()
+    placeholder.markdown(f'<div class="{css_class}">…</div>', unsafe_allow_html=True)
+    timer = StreamTimer()
+    shown = ""
+    
+    for chunk in chunks:
+        if not chunk:
+            continue
+        timer.mark_token()
+        for stream_filter in filters:
+            chunk = stream_filter.feed(chunk)
+        shown += chunk
+        placeholder.markdown(f'<div class="{css_class}">{shown}▌</div>', unsafe_allow_html=True)
+    
+    tail = ""
+    for stream_filter in filters:
+        tail = stream_filter.feed(tail) + stream_filter.flush()
+    shown += tail
+    shown = shown.strip()
+    placeholder.markdown(f'<div class="{css_class}">{shown}</div>', unsafe_allow_html=True)
+    timer.finish()
+    return shown, timer
 
 # --- Main App Logic ---
 
@@ -457,11 +861,12 @@ with st.sidebar:
     with col1:
         if st.button("New Report", type="primary", use_container_width=True):
             if st.session_state.messages:
-                full_log = "\n\n".join([f"[{m['role'].upper()}] {m['content']}" for m in st.session_state.messages])
-                save_report_to_file(full_log)
+                save_report_to_file(format_conversation_log(st.session_state.messages))
             st.session_state.messages = []
-            if os.path.exists(DRAFT_FILE):
-                os.remove(DRAFT_FILE)
+            get_journal().discard()
+            del st.session_state["draft_journal"]
+            st.session_state.pop("history_shown", None)
+            st.query_params["session"] = uuid.uuid4().hex
             st.rerun()
             
     with col2:
@@ -475,20 +880,41 @@ with st.sidebar:
 
     # Past Reports
     with st.expander("📂 Past Reports"):
-        reports = sorted(glob.glob(os.path.join(MEMORY_DIR, "*.txt")), reverse=True)[:5]
+        report_index = get_report_index()
+        search_text = st.text_input("Search", placeholder="Words in the report...")
+        col_kind, col_child = st.columns(2)
+        with col_kind:
+            kind_label = st.selectbox("Type", list(REPORT_KINDS))
+        with col_child:
+            child_filter = st.text_input("Child")
+        staff_filter = st.text_input("Staff")
+        
+        filters = dict(query=search_text, kind=REPORT_KINDS[kind_label], child=child_filter, staff=staff_filter)
+        total_reports = report_index.count(**filters)
+        page_count = max(1, -(-total_reports // REPORTS_PER_PAGE))
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+        reports = report_index.search(limit=REPORTS_PER_PAGE, offset=(page - 1) * REPORTS_PER_PAGE, **filters)
+        
         if reports:
-            selected_report = st.selectbox("Select report:", reports, format_func=lambda x: os.path.basename(x))
+            st.caption(f"{total_reports} report(s) - page {page} of {page_count}")
+            selected = st.selectbox("Select report:", reports, format_func=lambda r: r["filename"])
+            selected_report = selected["path"]
+            
+            try:
+                with open(selected_report, "r", encoding="utf-8") as f:
+                    txt_content = f.read()
+            except OSError:
+                # File was removed outside the app - drop it from the index.
+                report_index.remove(selected["filename"])
+                st.warning("That report is no longer on disk.")
+                txt_content = ""
             
             col_a, col_b = st.columns(2)
             with col_a:
                 if st.button("View"):
-                    with open(selected_report, "r", encoding="utf-8") as f:
-                        st.session_state['view_report_content'] = f.read()
+                    st.session_state['view_report_content'] = txt_content
             with col_b:
-                with open(selected_report, "r", encoding="utf-8") as f:
-                    txt_content = f.read()
-                    pdf_bytes = create_pdf_report(txt_content)
-                    st.download_button("PDF", pdf_bytes, file_name=os.path.basename(selected_report).replace('.txt', '.pdf'), mime='application/pdf')
+                pdf_download(txt_content, os.path.basename(selected_report).replace('.txt', '.pdf'), key="past_report_pdf", label="PDF")
             
             if 'view_report_content' in st.session_state:
                 st.text_area("Content", st.session_state['view_report_content'], height=200)
@@ -496,6 +922,33 @@ with st.sidebar:
         else:
             st.write("No reports found.")
 
+    # Bulk Export
+    with st.expander("📦 Bulk Export"):
+        col_from, col_to = st.columns(2)
+        with col_from:
+            export_from = st.date_input("From", value=None, key="export_from")
+        with col_to:
+            export_to = st.date_input("To", value=None, key="export_to")
+        export_child = st.text_input("Child", key="export_child")
+        export_staff = st.text_input("Staff", key="export_staff")
+        export_format = st.radio("Format", list(EXPORT_FORMATS), key="export_format")
+        
+        export_filters = dict(kind=KIND_FORMAL, child=export_child, staff=export_staff, date_from=export_from, date_to=export_to)
+        export_count = report_index.count(**export_filters)
+        st.caption(f"{export_count} formal report(s) selected")
+        if export_count and st.button("Build export"):
+            # Oldest first reads better in an export
+            rows = report_index.search(limit=export_count, **export_filters)[::-1]
+            st.session_state.bulk_export = build_export(rows, export_format)
+        
+        export_path = st.session_state.get("bulk_export")
+        if export_path and os.path.exists(export_path):
+            with open(export_path, "rb") as f:
+                st.download_button(
+                    "⬇️ Download export", f, file_name=os.path.basename(export_path),
+                    mime="application/zip" if export_path.endswith(".zip") else "application/pdf"
+                )
+
     with st.expander("❓ Need Help?"):
         st.markdown("""
         **How to use:**
@@ -506,6 +959,29 @@ with st.sidebar:
         """)
     
     st.divider()
+    if st.session_state.get("last_ttft") is not None:
+        st.caption(f"Last reply started in {st.session_state.last_ttft:.1f}s")
+    if "cache_stats" in st.session_state:
+        stats = st.session_state.cache_stats
+        st.caption(f"Prompt cache: {stats.hits} hits / {stats.misses} misses")
+    speculation = get_speculation_stats()
+    if speculation.hits or speculation.misses:
+        st.caption(f"Pre-drafted reports: {speculation.hit_rate:.0%} ({speculation.hits}/{speculation.hits + speculation.misses})")
+    if ADMIN_PANEL:
+        with st.expander("⏱️ Stage timings"):
+            tracer = get_app_tracer()
+            stages = tracer.summary()
+            if stages:
+                st.dataframe(
+                    [{"stage": name, "count": row["count"], "p50 ms": row["p50_ms"], "p95 ms": row["p95_ms"],
+                      "errors": row["errors"], "cache hits": row["cache_hits"],
+                      "tokens in/out": f"{row['input_tokens']}/{row['output_tokens']}"} for name, row in stages.items()],
+                    hide_index=True,
+                    use_container_width=True
+                )
+                st.download_button("Prometheus metrics", tracer.prometheus_text(), file_name="pocketpa-metrics.txt", mime="text/plain")
+            else:
+                st.write("No turns timed yet.")
     st.caption("v1.1.0 | Claude Opus")
 
 # Main Chat Area
@@ -520,19 +996,32 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Display chat messages
-for message in st.session_state.messages:
-    if message["role"] == "user":
-        with st.chat_message("user", avatar="👤"):
-             st.markdown(f'<div class="user-bubble">{message["content"]}</div>', unsafe_allow_html=True)
-    else:
-        with st.chat_message("assistant", avatar="🛡️"):
-            if "INCIDENT REPORT" in message["content"] and "BASIC INFORMATION" in message["content"]:
-                st.markdown(f'<div class="report-box">{message["content"]}</div>', unsafe_allow_html=True)
-                # Add PDF download for generated report in chat flow
-                pdf_data = create_pdf_report(message["content"])
-                st.download_button("📄 Download PDF", pdf_data, file_name="incident_report.pdf", mime="application/pdf", key=f"pdf_{len(message['content'])}")
-            else:
-                st.markdown(f'<div class="assistant-bubble">{message["content"]}</div>', unsafe_allow_html=True)
+def show_earlier():
+    st.session_state.history_shown = st.session_state.get("history_shown", HISTORY_PAGE) + HISTORY_PAGE
+
+@st.fragment
+def show_history():
+    """
+    Draw the latest messages of the chat. Each message's HTML is rendered
+    once and cached; the buttons in here rerun only this fragment.
+    """
+    messages = st.session_state.messages
+    start = max(0, len(messages) - st.session_state.get("history_shown", HISTORY_PAGE))
+    if start:
+        st.button(f"⬆️ Show earlier messages ({start})", key="show_earlier", on_click=show_earlier)
+    with get_app_tracer().span("render_history", messages=len(messages) - start):
+        for index in range(start, len(messages)):
+            message = messages[index]
+            rendered = render_message(message["role"], message["content"])
+            with st.chat_message(message["role"], avatar=AVATARS.get(message["role"], "🛡️")):
+                st.markdown(rendered.html, unsafe_allow_html=True)
+                if rendered.report:
+                    # Add PDF download for generated report in chat flow
+                    pdf_download(message["content"], "incident_report.pdf", key=f"pdf_{index}_{rendered.key}")
+                    if "gaps" in message:
+                        show_gaps(message["gaps"])
+
+show_history()
 
 # Chat input
 if prompt := st.chat_input("Type your message here..."):
@@ -543,37 +1032,77 @@ if prompt := st.chat_input("Type your message here..."):
         st.session_state.messages.append({"role": "user", "content": prompt})
         save_draft(st.session_state.messages)
         
+        # Drafted alongside the reply, ready if this turn asks for the report
+        if calculate_progress(st.session_state.messages)[0] >= SPECULATE_AT_PROGRESS:
+            start_report_draft(st.session_state.messages)
+        
         with st.chat_message("user", avatar="👤"):
             st.markdown(f'<div class="user-bubble">{prompt}</div>', unsafe_allow_html=True)
 
         with st.chat_message("assistant", avatar="🛡️"):
-            with st.spinner("PocketPA is thinking..."):
-                agents_ctx, skill_ctx = load_system_context()
-                response_text = get_claude_response(st.session_state.messages, agents_ctx, skill_ctx)
+            agents_ctx, skill_ctx = load_system_context()
+            
+            if STREAM_RESPONSES:
+                fields_filter = BlockStreamFilter(FIELDS_OPEN, FIELDS_CLOSE)
+                tag_filter = TagStreamFilter(REPORT_TAG)
+                clean_response, timer = render_stream(
+                    stream_claude_response(st.session_state.messages, agents_ctx, skill_ctx),
+                    "assistant-bubble",
+                    [fields_filter, tag_filter]
+                )
+                report_requested = tag_filter.found
+                turn_fields = parse_fields(fields_filter.payload)
+                st.session_state.last_ttft = timer.ttft
+            else:
+                with st.spinner("PocketPA is thinking..."):
+                    response_text = get_claude_response(st.session_state.messages, agents_ctx, skill_ctx)
+                response_text, turn_fields = split_fields_block(response_text)
+                report_requested = REPORT_TAG in response_text
+                clean_response = response_text.replace(REPORT_TAG, "").strip()
+                st.markdown(f'<div class="assistant-bubble">{clean_response}</div>', unsafe_allow_html=True)
+            
+            assistant_msg = {"role": "assistant", "content": clean_response}
+            if turn_fields:
+                assistant_msg["fields"] = turn_fields
+            st.session_state.messages.append(assistant_msg)
+            save_draft(st.session_state.messages)
+            
+            if not report_requested and calculate_progress(st.session_state.messages)[0] >= SPECULATE_AT_PROGRESS:
+                start_report_draft(st.session_state.messages)
+            
+            if report_requested:
+                st.markdown("---")
+                st.markdown("### 📝 Generated Incident Report")
                 
-                if "<GENERATE_REPORT>" in response_text:
-                    clean_response = response_text.replace("<GENERATE_REPORT>", "").strip()
-                    st.markdown(f'<div class="assistant-bubble">{clean_response}</div>', unsafe_allow_html=True)
-                    
-                    st.session_state.messages.append({"role": "assistant", "content": clean_response})
-                    
+                report_box = st.empty()
+                if STREAM_RESPONSES:
+                    outcome = {}
+                    with report_box.container():
+                        report_content, _ = render_stream(stream_formal_report(st.session_state.messages, outcome), "report-box")
+                    report_error = outcome.get("error")
+                else:
                     with st.spinner("Generating formal report..."):
                         report_content = generate_formal_report(st.session_state.messages)
-                        
-                        st.markdown("---")
-                        st.markdown("### 📝 Generated Incident Report")
-                        st.markdown(f'<div class="report-box">{report_content}</div>', unsafe_allow_html=True)
-                        
-                        # PDF Download Trigger
-                        pdf_data = create_pdf_report(report_content)
-                        st.download_button("📄 Download PDF", pdf_data, file_name="incident_report.pdf", mime="application/pdf")
-                        
-                        st.markdown(f'<div class="assistant-bubble">I\'ve prepared your incident report. Please review it carefully.</div>', unsafe_allow_html=True)
-                        
-                        combined_report_msg = f"{report_content}\n\nI've prepared your incident report. Please review it carefully."
-                        st.session_state.messages.append({"role": "assistant", "content": combined_report_msg})
-                else:
-                    st.markdown(f'<div class="assistant-bubble">{response_text}</div>', unsafe_allow_html=True)
-                    st.session_state.messages.append({"role": "assistant", "content": response_text})
+                    report_error = report_content if isinstance(report_content, ReportError) else None
+                    if report_error is None:
+                        report_box.markdown(f'<div class="report-box">{report_content}</div>', unsafe_allow_html=True)
                 
-                save_draft(st.session_state.messages)
+                if report_error is not None:
+                    # Show and keep the bare error: it is not a report, so no PDF or gap check
+                    report_box.markdown(f'<div class="assistant-bubble">{report_error}</div>', unsafe_allow_html=True)
+                    st.session_state.messages.append({"role": "assistant", "content": str(report_error)})
+                    save_draft(st.session_state.messages)
+                else:
+                    gaps = check_report_gaps(report_content)
+                    report_msg = {"role": "assistant", "content": f"{report_content}\n\nI've prepared your incident report. Please review it carefully.", "gaps": gaps}
+                    st.session_state.messages.append(report_msg)
+                    compact_draft(st.session_state.messages)
+                    
+                    # Same key as the history draws this report with, so a "Prepare PDF"
+                    # click here is picked up there on the rerun it triggers
+                    index = len(st.session_state.messages) - 1
+                    rendered = render_message("assistant", report_msg["content"])
+                    pdf_download(report_msg["content"], "incident_report.pdf", key=f"pdf_{index}_{rendered.key}")
+                    show_gaps(gaps)
+                    
+                    st.markdown(f'<div class="assistant-bubble">I\'ve prepared your incident report. Please review it carefully.</div>', unsafe_allow_html=True)
@@ -0,0 +1,6 @@
+"""
+Shared building blocks for PocketPA.
+
+Used by both the Streamlit front end (`app.py`) and the Chief of Staff
+engine (`scripts/main.py`).
+"""
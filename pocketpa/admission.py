@@ -0,0 +1,248 @@
+"""
+Rate-limit-aware admission control and retry.
+
+Instead of firing every request at the provider and turning 429s into error
+messages, requests pass through an AdmissionController first:
+
+- two token buckets, one for requests/minute and one for tokens/minute,
+  so we stay just under the provider's limits;
+- priorities, so formal report generation is admitted ahead of chat turns,
+  and background (speculative) work only when nothing else is waiting;
+- retry with jittered exponential backoff on rate-limit / overload errors,
+  honouring the provider's `retry-after` header. A 429 also pauses all
+  admissions until the retry-after time, so one throttled request doesn't
+  trigger a stampede.
+
+Controllers are shared per provider via `get_admission_controller()` and can
+be used from threads (`run`) or from the conversation service's event loop
+(`run_async` / `stream_async`).
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+
+PRIORITY_REPORT = 0
+PRIORITY_CHAT = 1
+PRIORITY_BACKGROUND = 2  # speculative work that nobody is waiting for yet
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+RETRYABLE_NAMES = {"ResourceExhausted", "ServiceUnavailable", "TooManyRequests", "DeadlineExceeded"}
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount, now):
+        """Seconds until `amount` is available (0 if it is now)."""
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class AdmissionController:
+    """Admits requests under request/token budgets, by priority, and retries throttled calls."""
+
+    def __init__(self, requests_per_minute=50, tokens_per_minute=40000, max_retries=4,
+                 base_delay=1.0, max_delay=30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"admitted": 0, "retried": 0, "throttled": 0, "waited_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._waiting = {PRIORITY_REPORT: 0, PRIORITY_CHAT: 0, PRIORITY_BACKGROUND: 0}
+        self._paused_until = 0.0
+
+    # --- Admission ---
+
+    def _try_admit(self, tokens, priority):
+        """Admit now and return 0, or return how long to wait before asking again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if any(count for p, count in self._waiting.items() if p < priority):
+                return 0.05  # higher-priority work is waiting - let it go first
+            wait = max(self.requests.time_until(1, now), self.tokens.time_until(tokens, now))
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.stats["admitted"] += 1
+            return 0.0
+
+    def acquire(self, tokens, priority=PRIORITY_CHAT):
+        """Block the calling thread until the request is admitted."""
+        started = time.monotonic()
+        self._set_waiting(priority, 1)
+        try:
+            while True:
+                wait = self._try_admit(tokens, priority)
+                if not wait:
+                    break
+                time.sleep(min(wait, 1.0))
+        finally:
+            self._set_waiting(priority, -1)
+            self.stats["waited_seconds"] += time.monotonic() - started
+
+    async def acquire_async(self, tokens, priority=PRIORITY_CHAT):
+        """Wait (without blocking the event loop) until the request is admitted."""
+        started = time.monotonic()
+        self._set_waiting(priority, 1)
+        try:
+            while True:
+                wait = self._try_admit(tokens, priority)
+                if not wait:
+                    break
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            self._set_waiting(priority, -1)
+            self.stats["waited_seconds"] += time.monotonic() - started
+
+    def settle(self, estimated, usage):
+        """Correct the token bucket once the real usage of a request is known."""
+        if usage is None:
+            return
+        actual = (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "output_tokens", 0) or 0)
+        # Gemini reports usage_metadata with different field names
+        actual += (getattr(usage, "prompt_token_count", 0) or 0) + (getattr(usage, "candidates_token_count", 0) or 0)
+        with self._lock:
+            if actual < estimated:
+                self.tokens.give_back(estimated - actual)
+            else:
+                self.tokens.take(actual - estimated)
+
+    def _set_waiting(self, priority, delta):
+        with self._lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + delta
+
+    # --- Retry ---
+
+    def should_retry(self, error, attempt):
+        if attempt >= self.max_retries:
+            return False
+        status = getattr(error, "status_code", None)
+        return status in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_NAMES
+
+    def retry_delay(self, error, attempt):
+        """Jittered exponential backoff, never shorter than the provider's retry-after."""
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(backoff / 2, backoff)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if getattr(error, "status_code", None) == 429 or retry_after is not None:
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self.stats["throttled"] += 1
+        self.stats["retried"] += 1
+        return delay
+
+    def run(self, call, tokens, priority=PRIORITY_CHAT):
+        """Admit, then call `call()` with retries. Blocking; for use from threads."""
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            try:
+                result = call()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                time.sleep(self.retry_delay(e, attempt))
+                attempt += 1
+                continue
+            self.settle(tokens, getattr(result, "usage", None) or getattr(result, "usage_metadata", None))
+            return result
+
+    async def run_async(self, factory, tokens, priority=PRIORITY_CHAT):
+        """Admit, then await `factory()` with retries."""
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens, priority)
+            try:
+                result = await factory()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self.retry_delay(e, attempt))
+                attempt += 1
+                continue
+            self.settle(tokens, getattr(result, "usage", None) or getattr(result, "usage_metadata", None))
+            return result
+
+    async def stream_async(self, factory, tokens, priority=PRIORITY_CHAT, usage_holder=None):
+        """
+        Admit, then relay chunks from the async generator `factory()`.
+        Retries only if the failure happens before the first chunk was sent.
+        """
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens, priority)
+            started = False
+            try:
+                async for chunk in factory():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or not self.should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self.retry_delay(e, attempt))
+                attempt += 1
+                continue
+            self.settle(tokens, (usage_holder or {}).get("usage"))
+            return
+
+
+def retry_after_seconds(error):
+    """Read `retry-after` (seconds) from an API error's response headers, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def estimate_tokens(system, messages, max_tokens):
+    """Rough token estimate for admission: ~4 characters per token plus the output budget."""
+    chars = len(json.dumps(system)) + len(json.dumps(messages))
+    return chars // 4 + max_tokens
+
+
+def get_admission_controller(name, requests_per_minute=50, tokens_per_minute=40000, **kwargs):
+    """Process-wide controller per provider name, created on first use."""
+    with _registry_lock:
+        controller = _registry.get(name)
+        if controller is None:
+            controller = AdmissionController(requests_per_minute, tokens_per_minute, **kwargs)
+            _registry[name] = controller
+        return controller
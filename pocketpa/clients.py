@@ -0,0 +1,118 @@
+"""
+Process-wide LLM clients.
+
+Building a client per call throws away its HTTP connection pool (and TLS
+session), so every turn pays a fresh handshake. These helpers keep one client
+per configuration for the lifetime of the process. The Streamlit app wraps
+them in `st.cache_resource`; the Chief of Staff engine calls them directly, so
+both share the same objects when they run in one process.
+"""
+import os
+import threading
+
+DEFAULT_POOL_SIZE = int(os.environ.get("POCKETPA_POOL_SIZE", "20"))
+DEFAULT_KEEPALIVE_SECONDS = float(os.environ.get("POCKETPA_KEEPALIVE_SECONDS", "60"))
+DEFAULT_TIMEOUT_SECONDS = float(os.environ.get("POCKETPA_TIMEOUT_SECONDS", "60"))
+DEFAULT_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("POCKETPA_CONNECT_TIMEOUT_SECONDS", "5"))
+
+_lock = threading.Lock()
+_anthropic_clients = {}
+_gemini_models = {}
+_gemini_configured_key = None
+
+
+def build_anthropic_client(api_key, pool_size=DEFAULT_POOL_SIZE, keepalive=DEFAULT_KEEPALIVE_SECONDS,
+                           timeout=DEFAULT_TIMEOUT_SECONDS, connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                           base_url=None):
+    """Create a new Anthropic client with an explicitly sized connection pool."""
+    import anthropic
+    import httpx
+
+    http_client = anthropic.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+    return anthropic.Anthropic(api_key=api_key, base_url=base_url, http_client=http_client)
+
+
+def get_anthropic_client(api_key, pool_size=DEFAULT_POOL_SIZE, keepalive=DEFAULT_KEEPALIVE_SECONDS,
+                         timeout=DEFAULT_TIMEOUT_SECONDS, connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                         base_url=None):
+    """Return the shared Anthropic client for this configuration, creating it on first use."""
+    key = (api_key, pool_size, keepalive, timeout, connect_timeout, base_url)
+    with _lock:
+        client = _anthropic_clients.get(key)
+        if client is None:
+            client = build_anthropic_client(api_key, pool_size, keepalive, timeout, connect_timeout, base_url)
+            _anthropic_clients[key] = client
+        return client
+
+
+def build_async_anthropic_client(api_key, pool_size=DEFAULT_POOL_SIZE, keepalive=DEFAULT_KEEPALIVE_SECONDS,
+                                 timeout=DEFAULT_TIMEOUT_SECONDS, connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                                 base_url=None):
+    """Async counterpart of build_anthropic_client, for use on a single event loop."""
+    import anthropic
+    import httpx
+
+    http_client = anthropic.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+    return anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url, http_client=http_client)
+
+
+def get_async_anthropic_client(api_key, pool_size=DEFAULT_POOL_SIZE, keepalive=DEFAULT_KEEPALIVE_SECONDS,
+                               timeout=DEFAULT_TIMEOUT_SECONDS, connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                               base_url=None):
+    """
+    Return the shared async Anthropic client for this configuration.
+    It must only be used from one event loop (the ConversationService loop).
+    """
+    key = ("async", api_key, pool_size, keepalive, timeout, connect_timeout, base_url)
+    with _lock:
+        client = _anthropic_clients.get(key)
+        if client is None:
+            client = build_async_anthropic_client(api_key, pool_size, keepalive, timeout, connect_timeout, base_url)
+            _anthropic_clients[key] = client
+        return client
+
+
+def get_gemini_model(model_name, api_key=None):
+    """Return the shared Gemini model handle, configuring the SDK once per process."""
+    global _gemini_configured_key
+    import google.generativeai as genai
+
+    if api_key is None:
+        api_key = os.environ.get("GOOGLE_API_KEY", "")
+
+    with _lock:
+        if _gemini_configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _gemini_configured_key = api_key
+            _gemini_models.clear()
+        model = _gemini_models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _gemini_models[model_name] = model
+        return model
+
+
+def close_all():
+    """Close every pooled sync client (async clients are closed by the loop that owns them)."""
+    import anthropic
+
+    with _lock:
+        for client in _anthropic_clients.values():
+            if isinstance(client, anthropic.Anthropic):
+                client.close()
+        _anthropic_clients.clear()
+        _gemini_models.clear()
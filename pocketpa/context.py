@@ -0,0 +1,148 @@
+"""
+Bounded conversation context: a rolling structured summary plus recent turns.
+
+The chat used to send only the last five messages (so by turn 8 the model had
+forgotten the child and location and asked again), while the Chief of Staff
+engine sent the whole history as indented JSON with timestamps every turn.
+
+ConversationContext keeps the last few raw messages and folds everything older
+into notes filed under the required fields of the incident-report skill
+(section 2 of skills/incident-report.md). A user's answer is filed under the
+field the preceding assistant question asked about, or under the field its own
+wording points at; anything else is kept as part of the description. Staff
+answers are kept verbatim, so no facts are lost - only assistant turns,
+timestamps and repeats are dropped - and the prompt grows with the facts
+given rather than with the number of turns. Folding is incremental: each
+message is classified once, when it leaves the recent window.
+"""
+import re
+
+# Field names as they appear in the skill's REQUIRED FIELDS table, with the
+# words that tell us a question or an answer is about them.
+FIELD_KEYWORDS = {
+    "Date": r"date|day|today|yesterday|last night|monday|tuesday|wednesday|thursday|friday|saturday|sunday",
+    "Time": r"time|when|o'?clock|morning|afternoon|evening|night|ago|\d{1,2}[:.]\d{2}|\d{1,2} ?[ap]m",
+    "Location": r"where|location|room|lounge|garden|bedroom|kitchen|dining|bathroom|hallway|corridor|outside",
+    "Child/YP Name": r"child|young person|resident|who was involved|name|initials",
+    "Staff Present": r"staff|colleague|on shift|who else was|who was there|present",
+    "Witnesses": r"witness|visitor|saw it|other residents|other children",
+    "Immediate Action": r"action|intervention|de-?escalat|restrain|first aid|separated|what did you do|respond",
+    "Emotional State": r"emotion|feeling|mood|upset|calm|angry|crying|distressed|anxious",
+    "Injuries/Damage": r"injur|hurt|bruise|cut|scratch|wound|damage|broken|broke",
+    "Follow-up": r"follow.?up|next steps|next time|monitor|gp|plan|going forward|tomorrow",
+}
+
+# Unclassified staff statements are almost always part of the narrative.
+DEFAULT_FIELD = "Description"
+
+_TABLE_ROW = re.compile(r"^\|\s*\*\*(?P<field>[^*]+)\*\*\s*\|\s*(?P<necessity>[^|]+?)\s*\|")
+_COMPILED = {name: re.compile(rf"\b(?:{pattern})", re.IGNORECASE) for name, pattern in FIELD_KEYWORDS.items()}
+
+
+def parse_required_fields(skill_text):
+    """Return [(field, necessity)] from the skill's REQUIRED FIELDS table, in order."""
+    fields = []
+    for line in skill_text.splitlines():
+        match = _TABLE_ROW.match(line.strip())
+        if match:
+            fields.append((match.group("field").strip(), match.group("necessity").strip()))
+    return fields
+
+
+def _fingerprint(msg):
+    return (msg["role"], len(msg["content"]), hash(msg["content"]))
+
+
+def _prefix_fingerprint(messages):
+    """One hash over every message, so a rewrite anywhere in them (or another conversation) is noticed."""
+    return hash(tuple(_fingerprint(msg) for msg in messages))
+
+
+def _question(text):
+    """The part of an assistant message that asks something (its last question), if any."""
+    questions = [s for s in re.split(r"(?<=[.!?])\s+", text) if s.rstrip().endswith("?")]
+    return questions[-1] if questions else ""
+
+
+def _classify(text, fields):
+    for name in fields:
+        pattern = _COMPILED.get(name)
+        if pattern and pattern.search(text):
+            return name
+    return None
+
+
+class ConversationContext:
+    """Rolling field-by-field summary of older turns plus the most recent raw messages."""
+
+    def __init__(self, fields, recent_messages=6):
+        # Fields the staff member supplies; "Auto" ones (Reporting Staff) come from the login.
+        self.fields = [name for name, necessity in fields if necessity.lower() != "auto"] or [DEFAULT_FIELD]
+        self.critical = [name for name, necessity in fields if necessity.lower() == "critical"]
+        self.recent_messages = recent_messages
+        self.reset()
+
+    @classmethod
+    def from_skill(cls, skill_text, recent_messages=6):
+        return cls(parse_required_fields(skill_text), recent_messages)
+
+    def reset(self):
+        self.folded = 0
+        self.notes = {name: [] for name in self.fields}
+        self._last_question = ""
+        self._last_fingerprint = None
+
+    def _fold(self, msg):
+        if msg["role"] == "assistant":
+            self._last_question = _question(msg["content"])
+            return
+        text = " ".join(msg["content"].split())
+        if not text:
+            return
+        field = (_classify(self._last_question, self.fields)
+                 or _classify(text, self.fields)
+                 or (DEFAULT_FIELD if DEFAULT_FIELD in self.notes else self.fields[0]))
+        if text not in self.notes[field]:
+            self.notes[field].append(text)
+        self._last_question = ""
+
+    def window_start(self, messages):
+        """Index of the first raw message to send; the window always starts on a user turn."""
+        start = max(0, len(messages) - self.recent_messages)
+        while start < len(messages) - 1 and messages[start]["role"] != "user":
+            start += 1
+        return start
+
+    def update(self, messages):
+        """Fold messages that have left the recent window into the summary. Returns the recent messages."""
+        if len(messages) < self.folded or (
+            self.folded and _prefix_fingerprint(messages[:self.folded]) != self._last_fingerprint
+        ):
+            # History was rewritten (undo / new report) or is another conversation - rebuild from scratch.
+            self.reset()
+
+        start = self.window_start(messages)
+        for msg in messages[self.folded:start]:
+            self._fold(msg)
+        self.folded = max(self.folded, start)
+        if self.folded:
+            self._last_fingerprint = _prefix_fingerprint(messages[:self.folded])
+        return messages[self.folded:]
+
+    def summary(self):
+        """Text summary of the folded turns, or "" if nothing has been folded yet."""
+        if not any(self.notes.values()):
+            return ""
+        lines = ["FACTS ALREADY GIVEN EARLIER IN THIS CONVERSATION (do not ask for these again):"]
+        for name in self.fields:
+            if self.notes[name]:
+                lines.append(f"- {name}: " + " | ".join(self.notes[name]))
+        missing = [name for name in self.critical if name in self.notes and not self.notes[name]]
+        if missing:
+            lines.append("Not covered in the earlier turns (check the recent messages): " + ", ".join(missing))
+        return "\n".join(lines)
+
+    def build(self, messages):
+        """Return (summary, recent) for `messages` in one call."""
+        recent = self.update(messages)
+        return self.summary(), recent
@@ -0,0 +1,132 @@
+"""
+Append-only, per-session draft journal.
+
+Each browser session gets its own JSONL file under `memory/drafts/`. Every
+message is one appended record, so autosave costs O(message) rather than
+rewriting the whole history, and content is stored verbatim. Undo is recorded
+as a `truncate` record. Writes are flushed immediately and fsync'd in batches;
+on load, a torn trailing record from a crash is discarded and cut off.
+"""
+import json
+import os
+import re
+import time
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class DraftJournal:
+    """Journal of one session's messages, replayable with `load()`."""
+
+    def __init__(self, session_id, directory, fsync_every=8, fsync_interval=2.0):
+        if not SESSION_ID_RE.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        os.makedirs(directory, exist_ok=True)
+        self.session_id = session_id
+        self.path = os.path.join(directory, f"{session_id}.jsonl")
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.length = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def load(self):
+        """Replay the journal and return the recovered messages."""
+        self.close()
+        messages = []
+        if not os.path.exists(self.path):
+            self.length = 0
+            return messages
+
+        good_offset = 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn write from a crash
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    break
+                if record.get("op") == "add":
+                    msg = {"role": record["role"], "content": record["content"]}
+                    if "fields" in record:
+                        msg["fields"] = record["fields"]
+                    messages.append(msg)
+                elif record.get("op") == "truncate":
+                    del messages[record["length"]:]
+                good_offset += len(raw)
+
+        if good_offset < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_offset)
+
+        self.length = len(messages)
+        return messages
+
+    def sync(self, messages):
+        """
+        Bring the journal in line with `messages`, which may have grown
+        (new turns) or shrunk (undo) since the last call.
+        """
+        if len(messages) < self.length:
+            self._write({"op": "truncate", "length": len(messages)})
+            self.length = len(messages)
+        for msg in messages[self.length:]:
+            self._write(_add_record(msg))
+            self.length += 1
+        self._maybe_fsync()
+
+    def compact(self, messages):
+        """Atomically rewrite the journal with just the live messages (e.g. once a report is final)."""
+        self.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for msg in messages:
+                f.write(_encode(_add_record(msg)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.length = len(messages)
+
+    def discard(self):
+        """Delete the journal (the conversation has been archived elsewhere)."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.length = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._unsynced = 0
+
+    def _write(self, record):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(_encode(record))
+        self._file.flush()
+        self._unsynced += 1
+
+    def _maybe_fsync(self):
+        if self._file is None or not self._unsynced:
+            return
+        now = time.monotonic()
+        if self._unsynced >= self.fsync_every or now - self._last_sync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = now
+
+
+def _add_record(msg):
+    record = {"op": "add", "role": msg["role"], "content": msg["content"]}
+    if msg.get("fields"):
+        record["fields"] = msg["fields"]  # structured incident fields extracted on this turn
+    return record
+
+
+def _encode(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
@@ -0,0 +1,111 @@
+"""
+Bulk export of saved reports.
+
+Inspectors ask for every report for a child, or over a quarter, at once.
+export_zip renders the PDFs across a process pool (fpdf is pure Python, so
+threads would just take turns on the GIL) and writes each into the archive as
+soon as it and the ones before it are done. Only a bounded window of renders
+is in flight, so memory use does not grow with the number of reports. Reports
+already in the PDF cache are not rendered again.
+
+export_merged_pdf builds one PDF with a linked table of contents instead.
+fpdf builds a document in memory, so that is for moderate selections; the
+ZIP is the one to use for large exports.
+"""
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from pocketpa.pdf import create_merged_pdf, create_pdf_report
+
+# Renders queued per worker; enough to keep every core busy while the archive is written
+IN_FLIGHT_PER_WORKER = 2
+# A report renders in about 1-5 ms and a spawned worker takes a few hundred to
+# start, so a worker is only added for every this many reports
+MIN_REPORTS_PER_WORKER = 200
+
+
+def default_workers(count):
+    return max(1, min(os.cpu_count() or 1, count // MIN_REPORTS_PER_WORKER))
+
+
+def read_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def pdf_name(path):
+    return os.path.splitext(os.path.basename(path))[0] + ".pdf"
+
+
+def export_zip(paths, out, workers=None, cache=None, progress=None):
+    """
+    Render the reports at `paths` and write them as PDFs into a ZIP at `out`
+    (a path or a writable binary file). Entries keep the order of `paths`.
+    `cache` is an optional PDFCache to reuse; `progress(done, total)` is called
+    after each entry. Returns the number of PDFs written.
+    """
+    paths = list(paths)
+    workers = workers or default_workers(len(paths))
+    # PDFs are already compressed, so the archive just stores them
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as archive:
+        if workers == 1:
+            for done, path in enumerate(paths, 1):
+                archive.writestr(pdf_name(path), _render(read_report(path), cache))
+                if progress:
+                    progress(done, len(paths))
+            return len(paths)
+
+        # spawn, not fork: the app process has live threads (Streamlit, the conversation service)
+        with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+            window = []
+            done = 0
+            for path in paths:
+                text = read_report(path)
+                if cache is not None and cache.contains(text):
+                    window.append((path, cache.get(text)))
+                else:
+                    window.append((path, pool.submit(create_pdf_report, text)))
+                while len(window) >= workers * IN_FLIGHT_PER_WORKER:
+                    done = _write_next(archive, window, done, len(paths), progress)
+            while window:
+                done = _write_next(archive, window, done, len(paths), progress)
+    return len(paths)
+
+
+def _render(text, cache):
+    return cache.get(text) if cache is not None else create_pdf_report(text)
+
+
+def _write_next(archive, window, done, total, progress):
+    path, result = window.pop(0)
+    archive.writestr(pdf_name(path), result if isinstance(result, bytes) else result.result())
+    done += 1
+    if progress:
+        progress(done, total)
+    return done
+
+
+def export_merged_pdf(reports, out):
+    """
+    Write one PDF of the given reports, with a table of contents, to `out`.
+    `reports` is a list of (heading, path). Returns the number of reports.
+    """
+    data = create_merged_pdf([(heading, read_report(path)) for heading, path in reports])
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, "wb") as f:
+            f.write(data)
+    else:
+        out.write(data)
+    return len(reports)
+
+
+def report_heading(row):
+    """Contents line for a ReportIndex row."""
+    parts = [row["created_at"].replace("T", " ")[:16]]
+    if row.get("child_id"):
+        parts.append(row["child_id"])
+    if row.get("staff"):
+        parts.append(f"by {row['staff']}")
+    return " - ".join(parts)
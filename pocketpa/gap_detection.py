@@ -0,0 +1,465 @@
+"""
+Local gap detection for generated incident reports.
+
+check_report() parses a report in the format the formal-report template
+produces (pocketpa.reports.REPORT_SYSTEM_PROMPT) and checks it against the
+required-fields table in skills/incident-report.md (section 2):
+
+- missing: a critical field is absent, empty, "Not recorded", "Unknown" or
+  still a template placeholder such as "[names]";
+- invalid: a date or time that can't be read as DD/MM/YYYY or HH:MM, or an
+  incident date later than the report itself;
+- contradiction: sections that disagree, e.g. "INJURIES / DAMAGE: None"
+  under a description of a bruise, or "no physical intervention" beside a
+  restraint;
+- vague: a time given only as "lunchtime", an action like "we handled it";
+- subjective: judgemental wording in the narrative ("naughty",
+  "attention-seeking") that the skill says must be made objective.
+
+A check takes well under a millisecond. Findings the rules can't settle (a
+possible contradiction that depends on reading the narrative) are marked
+`ambiguous`; only those are worth sending to the model, with
+build_gap_check_request(). scripts/bench_gap_detection.py measures precision
+and recall against a labelled corpus.
+"""
+import json
+import re
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from pocketpa.incident import NARRATIVE_SECTIONS
+from pocketpa.prompts import build_system_blocks
+
+KINDS = ("missing", "invalid", "contradiction", "vague", "subjective")
+
+# Headings of the formal-report template, in order
+SECTIONS = ("BASIC INFORMATION", NARRATIVE_SECTIONS[0], "PEOPLE INVOLVED") + NARRATIVE_SECTIONS[1:]
+
+# Labels of "Label: value" lines -> field name (the IncidentRecord keys)
+LINE_FIELDS = {
+    "date": "date",
+    "time": "time",
+    "location": "location",
+    "child": "child_name",
+    "reporting staff": "reporting_staff",
+    "report id": "report_id",
+    "staff present": "staff_present",
+    "witnesses": "witnesses",
+    "before": "emotional_state.before",
+    "during": "emotional_state.during",
+    "after": "emotional_state.after",
+    "report generated": "generated",
+    "status": "status",
+}
+SECTION_FIELDS = {
+    "INCIDENT DESCRIPTION": "description",
+    "IMMEDIATE ACTION TAKEN": "immediate_action",
+    "INJURIES / DAMAGE": "injuries_damage",
+    "FOLLOW-UP REQUIRED": "follow_up",
+    "COMPLIANCE NOTES": "compliance_notes",
+}
+
+# Field names in the skill's table -> report fields
+TABLE_FIELDS = {
+    "date": ["date"],
+    "time": ["time"],
+    "location": ["location"],
+    "child/yp name": ["child_name"],
+    "description": ["description"],
+    "staff present": ["staff_present"],
+    "witnesses": ["witnesses"],
+    "immediate action": ["immediate_action"],
+    "emotional state": ["emotional_state.before", "emotional_state.during", "emotional_state.after"],
+    "injuries/damage": ["injuries_damage"],
+    "follow-up": ["follow_up"],
+    "reporting staff": ["reporting_staff"],
+}
+# Used when the skill file has no readable table
+DEFAULT_CRITICAL = ("date", "time", "location", "child_name", "description", "staff_present",
+                    "immediate_action", "emotional_state.before", "emotional_state.during",
+                    "emotional_state.after", "injuries_damage", "follow_up")
+
+FIELD_LABELS = {
+    "date": "Date", "time": "Time", "location": "Location", "child_name": "Child",
+    "description": "Incident description", "staff_present": "Staff present", "witnesses": "Witnesses",
+    "immediate_action": "Immediate action", "emotional_state.before": "Emotional state (before)",
+    "emotional_state.during": "Emotional state (during)", "emotional_state.after": "Emotional state (after)",
+    "injuries_damage": "Injuries / damage", "follow_up": "Follow-up", "reporting_staff": "Reporting staff",
+}
+
+DESCRIPTION_MIN_WORDS = 12
+
+TABLE_ROW_RE = re.compile(r"^\|\s*\**([^|*]+?)\**\s*\|\s*\**([^|*]+?)\**\s*\|")
+LINE_RE = re.compile(r"^[-*\s]*\**([A-Za-z][A-Za-z /']*?)\**\s*:\s*\**\s*(.*)$")
+MARKUP_RE = re.compile(r"[*_`#]+")
+EMPTY_RE = re.compile(
+    r"^(?:not (?:recorded|specified|provided|stated|known|given|mentioned|documented)|unknown|unclear|"
+    r"n/?a|tbc|tbd|pending|to be confirmed|none given|-+|\?+|\[[^\]]*\])\.?$", re.IGNORECASE
+)
+NONE_RE = re.compile(r"^(?:none|nil|no\b|nothing\b)", re.IGNORECASE)
+DATE_RE = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})\b")
+WORD_DATE_RE = re.compile(
+    r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{4})\b",
+    re.IGNORECASE
+)
+CLOCK_RE = re.compile(r"\b([01]?\d|2[0-3])[:.]([0-5]\d)\s*(am|pm)?\b|\b(1[0-2]|0?[1-9])\s*(am|pm)\b", re.IGNORECASE)
+VAGUE_TIME_RE = re.compile(
+    r"\b(morning|afternoon|evening|night|lunch(?:time)?|dinner(?:time)?|tea ?time|breakfast|"
+    r"earlier|later|today|just now|recently)\b", re.IGNORECASE
+)
+RELATIVE_DATE_RE = re.compile(r"\b(today|yesterday|last night|this morning)\b", re.IGNORECASE)
+VAGUE_ACTION_RE = re.compile(
+    r"\b(handled it|dealt with it|sorted it|sorted out|managed it|took care of it|the usual|as usual|"
+    r"as normal|followed procedure)\b", re.IGNORECASE
+)
+SUBJECTIVE_RE = re.compile(
+    r"\b(naughty|brat|spoilt|spoiled|attention[- ]seeking|manipulative|lazy|evil|nasty|"
+    r"kicked off|kicking off|bad behaviou?r|being difficult|being silly|being a pain|little madam|drama queen|vile)\b", re.IGNORECASE
+)
+NEGATION_RE = re.compile(r"\b(no|not|without|nobody|none|never|neither|nor|wasn't|weren't|didn't|no-one)\b",
+                         re.IGNORECASE)
+# Words before a term that a negation has to fall within ("no sign of a bruise")
+NEGATION_WINDOW = 4
+
+# (pattern, ambiguous): words that mean someone was hurt or something damaged
+INJURY_TERMS = [
+    (re.compile(r"\b(bruis\w*|bleed\w*|blood|graze[ds]?|cuts?\b|lacerat\w*|swelling|swollen|sprain\w*|"
+                r"fractur\w*|first aid|injur\w*|smashed|damaged)", re.IGNORECASE), False),
+    (re.compile(r"\b(hurt|marks?\b|(?<!a )pain|sore|broke(?:n)?)", re.IGNORECASE), True),
+]
+RESTRAINT_TERMS = [
+    (re.compile(r"\b(restrain\w*|physical intervention|physically intervened|team[- ]teach|"
+                r"safe hold|two[- ]person hold|held (?:him|her|them) (?:down|back))", re.IGNORECASE), False),
+    (re.compile(r"\b(held|holding|hold)\b", re.IGNORECASE), True),
+]
+NO_PHYSICAL_RE = re.compile(
+    r"\b(no (?:physical|restraint|hands[- ]on|physical intervention)|not physical|verbal[\w -]{0,20}? only|"
+    r"only verbal|just verbal|purely verbal|non[- ]physical|without (?:physical|restraint))", re.IGNORECASE
+)
+DISTRESS_RE = re.compile(r"\b(scream\w*|shout\w*|hit|hitting|kick\w*|punch\w*|threw|throwing|bit|biting|"
+                         r"spat|swor[en]|swearing|aggressive|agitated|furious|crying|sobbing)\b", re.IGNORECASE)
+CALM_RE = re.compile(r"^(?:calm|settled|relaxed|content|happy|fine|ok|okay)\b", re.IGNORECASE)
+ESCALATION_RE = re.compile(r"\b(safeguarding|dsl|police|hospital|a&e|ambulance|gp\b|doctor|allegation|missing from care)",
+                           re.IGNORECASE)
+NO_FOLLOW_UP_RE = re.compile(r"^(?:no|none|n/a|nil)\b(?!\s*-?\s*\w*\s*(?:but|however))", re.IGNORECASE)
+# A list of people: "Dave Smith, Sarah (keyworker) and Jo"
+PERSON_SPLIT_RE = re.compile(r"\s*(?:[,;/&]|\band\b)\s*", re.IGNORECASE)
+PARENTHESES_RE = re.compile(r"\([^)]*\)")
+
+GAP_CHECK_PROMPT = """You check UK care home incident reports for problems a rule-based checker could not settle.
+You are given a report and numbered findings. For each finding decide whether it is a real problem in the report.
+Reply with JSON only, in this form: {"confirmed": [numbers of the findings that are real problems]}"""
+
+
+class Gap:
+    """One finding: `field` has a problem of `kind` (see KINDS)."""
+
+    def __init__(self, field, kind, detail, ambiguous=False):
+        self.field = field
+        self.kind = kind
+        self.detail = detail
+        self.ambiguous = ambiguous
+
+    def label(self):
+        return FIELD_LABELS.get(self.field, self.field)
+
+    def as_dict(self):
+        return {"field": self.field, "kind": self.kind, "detail": self.detail, "ambiguous": self.ambiguous}
+
+    def __repr__(self):
+        flag = "?" if self.ambiguous else ""
+        return f"Gap({self.field}, {self.kind}{flag}: {self.detail})"
+
+
+class GapReport:
+    """The findings for one report."""
+
+    def __init__(self, fields, gaps, elapsed):
+        self.fields = fields
+        self.gaps = gaps
+        self.elapsed = elapsed
+
+    @property
+    def definite(self):
+        return [gap for gap in self.gaps if not gap.ambiguous]
+
+    @property
+    def ambiguous(self):
+        return [gap for gap in self.gaps if gap.ambiguous]
+
+    @property
+    def complete(self):
+        return not self.gaps
+
+    def missing(self):
+        return [gap.field for gap in self.gaps if gap.kind == "missing"]
+
+    def as_dict(self):
+        return {"gaps": [gap.as_dict() for gap in self.gaps], "elapsed_ms": round(self.elapsed * 1000, 3)}
+
+
+# --- Parsing ---
+
+def parse_report(text):
+    """{field: value} from a report in the template's format. Missing fields are left out."""
+    fields = {}
+    section = None
+    body = []
+
+    def close_section():
+        if section in SECTION_FIELDS and body:
+            fields.setdefault(SECTION_FIELDS[section], " ".join(" ".join(body).split()))
+
+    for raw in text.splitlines():
+        line = MARKUP_RE.sub("", raw).strip()
+        if not line:
+            continue
+        heading = _heading(line)
+        if heading:
+            close_section()
+            section, body = heading, []
+            continue
+        match = LINE_RE.match(line)
+        label = match.group(1).strip().lower() if match else None
+        if label in LINE_FIELDS and (section not in SECTION_FIELDS or label in ("report generated", "status")):
+            if label in ("report generated", "status"):
+                close_section()
+                section, body = None, []
+            fields.setdefault(LINE_FIELDS[label], match.group(2).strip())
+        elif section in SECTION_FIELDS:
+            body.append(line)
+    close_section()
+    return fields
+
+
+def _heading(line):
+    normalised = re.sub(r"\s*/\s*", " / ", line.rstrip(":").strip()).upper().replace("\u2019", "'")
+    for heading in SECTIONS:
+        if normalised == heading or normalised.replace("CHILD'S", "CHILDS") == heading.replace("CHILD'S", "CHILDS"):
+            return heading
+    if normalised.startswith("INJURIES") and "DAMAGE" in normalised:
+        return "INJURIES / DAMAGE"
+    if normalised in ("FOLLOW UP REQUIRED", "FOLLOW-UP", "FOLLOW UP"):
+        return "FOLLOW-UP REQUIRED"
+    return None
+
+
+@lru_cache(maxsize=8)
+def critical_fields(skill_text):
+    """Report fields marked Critical in the skill file's required-fields table."""
+    critical = []
+    for line in (skill_text or "").splitlines():
+        match = TABLE_ROW_RE.match(line.strip())
+        if not match:
+            continue
+        name, necessity = match.group(1).strip().lower(), match.group(2).strip().lower()
+        if necessity == "critical" and name in TABLE_FIELDS:
+            critical.extend(TABLE_FIELDS[name])
+    return tuple(critical) or DEFAULT_CRITICAL
+
+
+# --- Checking ---
+
+def check_report(text, skill_text=None, today=None):
+    """Check a generated report; returns a GapReport. `skill_text` is skills/incident-report.md."""
+    started = time.perf_counter()
+    fields = parse_report(text)
+    required = critical_fields(skill_text)
+    gaps = []
+
+    for field in required:
+        value = fields.get(field, "")
+        if not value:
+            gaps.append(Gap(field, "missing", "not in the report"))
+        elif _is_empty(value, field):
+            gaps.append(Gap(field, "missing", f'given as "{value}"'))
+
+    present = {field: value for field, value in fields.items() if not _is_empty(value, field)}
+    gaps += _check_date(present, today)
+    gaps += _check_time(present)
+    gaps += _check_narrative(present)
+    gaps += _check_contradictions(present)
+    return GapReport(fields, gaps, time.perf_counter() - started)
+
+
+def _is_empty(value, field):
+    value = value.strip()
+    if not value or EMPTY_RE.match(value):
+        return True
+    # "None" is a valid answer for these; for anything else it means nothing was recorded
+    if field in ("injuries_damage", "follow_up", "witnesses"):
+        return False
+    return bool(re.match(r"^(?:none|nil|nobody|no one)\.?$", value, re.IGNORECASE))
+
+
+def _check_date(fields, today):
+    value = fields.get("date")
+    if not value:
+        return []
+    parsed = _parse_date(value)
+    if parsed is None:
+        if RELATIVE_DATE_RE.search(value):
+            return [Gap("date", "vague", f'"{value}" is not a calendar date', ambiguous=True)]
+        return [Gap("date", "invalid", f'"{value}" is not a DD/MM/YYYY date')]
+    reference = _parse_date(fields.get("generated", "")) or (today or datetime.now()).date()
+    if parsed > reference:
+        return [Gap("date", "contradiction", f"{value} is after the report was written")]
+    return []
+
+
+def _parse_date(value):
+    match = DATE_RE.search(value)
+    if match:
+        day, month, year = (int(part) for part in match.groups())
+        year += 2000 if year < 100 else 0
+        try:
+            return datetime(year, month, day).date()
+        except ValueError:
+            return None
+    match = WORD_DATE_RE.search(value)
+    if match:
+        try:
+            return datetime.strptime(f"{match.group(1)} {match.group(2)[:3].title()} {match.group(3)}", "%d %b %Y").date()
+        except ValueError:
+            return None
+    return None
+
+
+def _check_time(fields):
+    value = fields.get("time")
+    if not value or CLOCK_RE.search(value):
+        return []
+    if VAGUE_TIME_RE.search(value) or re.search(r"\b(about|around|approx\w*)\b", value, re.IGNORECASE):
+        return [Gap("time", "vague", f'"{value}" is not a clock time (HH:MM)', ambiguous=True)]
+    return [Gap("time", "invalid", f'"{value}" is not a time (HH:MM)')]
+
+
+def _check_narrative(fields):
+    gaps = []
+    description = fields.get("description", "")
+    if description and len(description.split()) < DESCRIPTION_MIN_WORDS:
+        gaps.append(Gap("description", "vague", f"only {len(description.split())} words", ambiguous=True))
+    action = fields.get("immediate_action", "")
+    match = VAGUE_ACTION_RE.search(action)
+    if match and len(action.split()) < 12:
+        gaps.append(Gap("immediate_action", "vague", f'"{match.group(0)}" does not say what was done'))
+    for field in ("description", "immediate_action", "emotional_state.before",
+                  "emotional_state.during", "emotional_state.after"):
+        match = SUBJECTIVE_RE.search(fields.get(field, ""))
+        if match:
+            gaps.append(Gap(field, "subjective", f'"{match.group(0)}" is a judgement, not an observation'))
+    return gaps
+
+
+def _check_contradictions(fields):
+    gaps = []
+    narrative = " ".join(fields.get(field, "") for field in ("description", "immediate_action"))
+
+    injuries = fields.get("injuries_damage", "")
+    if injuries and NONE_RE.match(injuries):
+        term, ambiguous = _mentioned(INJURY_TERMS, narrative)
+        if term:
+            gaps.append(Gap("injuries_damage", "contradiction",
+                            f'says "{injuries}" but the narrative mentions "{term}"', ambiguous))
+
+    action = fields.get("immediate_action", "")
+    if NO_PHYSICAL_RE.search(action) or NO_PHYSICAL_RE.search(fields.get("description", "")):
+        cleaned = NO_PHYSICAL_RE.sub("", narrative)
+        term, ambiguous = _mentioned(RESTRAINT_TERMS, cleaned)
+        if term:
+            gaps.append(Gap("immediate_action", "contradiction",
+                            f'says there was no physical intervention but mentions "{term}"', ambiguous))
+
+    during = fields.get("emotional_state.during", "")
+    if during and CALM_RE.match(during):
+        match = DISTRESS_RE.search(fields.get("description", ""))
+        if match:
+            gaps.append(Gap("emotional_state.during", "contradiction",
+                            f'"{during}" during the incident, but the description says "{match.group(0)}"', True))
+
+    child = fields.get("child_name", "").strip()
+    staff = fields.get("staff_present", "")
+    if child and staff:
+        gaps += _check_child_as_staff(child, staff)
+
+    follow_up = fields.get("follow_up", "")
+    if follow_up and NO_FOLLOW_UP_RE.match(follow_up):
+        match = ESCALATION_RE.search(" ".join((narrative, fields.get("injuries_damage", ""))))
+        if match:
+            gaps.append(Gap("follow_up", "contradiction",
+                            f'no follow-up, but the report mentions "{match.group(0)}"', ambiguous=True))
+    return gaps
+
+
+def _check_child_as_staff(child, staff):
+    """
+    The child's full name among the staff is a contradiction; a staff member
+    who only shares the child's first name may be someone else, so that is ambiguous.
+    """
+    child_key = _person_key(child)
+    if not child_key:
+        return []  # recorded by ID only ("Name or ID"), so there is no name to compare
+    for name in PERSON_SPLIT_RE.split(PARENTHESES_RE.sub(" ", staff)):
+        key = _person_key(name)
+        if not key:
+            continue
+        if key == child_key:
+            return [Gap("staff_present", "contradiction", f"lists the child ({child}) as a member of staff")]
+        if key[0] == child_key[0]:
+            return [Gap("staff_present", "contradiction",
+                        f'"{name.strip()}" shares a name with the child ({child}); check they are staff', ambiguous=True)]
+    return []
+
+
+def _person_key(name):
+    return tuple(re.findall(r"[a-z]+(?:['-][a-z]+)*", name.lower()))
+
+
+def _mentioned(terms, text):
+    """The first term from `terms` used without a negation before it; returns (term, ambiguous)."""
+    found = None
+    for pattern, ambiguous in terms:
+        for match in pattern.finditer(text):
+            sentence_start = max(text.rfind(".", 0, match.start()), text.rfind(";", 0, match.start())) + 1
+            before = text[sentence_start:match.start()].split()[-NEGATION_WINDOW:]
+            if NEGATION_RE.search(" ".join(before)):
+                continue
+            if not ambiguous:
+                return match.group(0), False
+            found = found or match.group(0)
+    return (found, True) if found else (None, False)
+
+
+# --- Model fallback for ambiguous findings ---
+
+def build_gap_check_request(report_text, gaps):
+    """System blocks and messages asking the model to settle `gaps` (the ambiguous findings)."""
+    numbered = "\n".join(f"{number}. {gap.label()}: {gap.kind} - {gap.detail}" for number, gap in enumerate(gaps, 1))
+    user_message = f"REPORT:\n{report_text}\n\nFINDINGS:\n{numbered}"
+    return build_system_blocks([GAP_CHECK_PROMPT]), [{"role": "user", "content": user_message}]
+
+
+def parse_gap_check(reply, gaps):
+    """
+    The findings the model confirmed, or None if its reply can't be read (the
+    caller should then show them to the staff member to check).
+    """
+    match = re.search(r"\{.*\}", reply or "", re.DOTALL)
+    if not match:
+        return None
+    try:
+        confirmed = json.loads(match.group(0)).get("confirmed")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(confirmed, list):
+        return None
+    return [gap for number, gap in enumerate(gaps, 1) if number in confirmed]
+
+
+def format_gaps(gaps):
+    """Staff-facing summary of findings, one line each."""
+    if not gaps:
+        return "✅ The report has every critical field and nothing in it contradicts itself."
+    lines = [f"- **{gap.label()}** ({gap.kind}): {gap.detail}" for gap in gaps]
+    return "Before this report is filed, please check:\n" + "\n".join(lines)
@@ -0,0 +1,195 @@
+"""
+Structured incident record, filled in turn by turn.
+
+Each chat reply ends with a hidden <FIELDS>{...}</FIELDS> block holding the
+report fields the staff member's latest message gave or corrected (the keys
+follow the IncidentReport model in skills/incident-report.md, section 2/6).
+The app strips the block from what it shows, stores the parsed fields on the
+assistant message, and folds them into an IncidentRecord. Because the record
+is rebuilt from the messages, undo and draft recovery need no extra state.
+
+When the report is requested, the deterministic sections (BASIC INFORMATION,
+PEOPLE INVOLVED, Report ID, timestamp and status) are rendered locally and
+shown at once; only the narrative sections are written by the model.
+"""
+import json
+import uuid
+from datetime import datetime
+
+FIELDS_OPEN = "<FIELDS>"
+FIELDS_CLOSE = "</FIELDS>"
+
+TEXT_FIELDS = ("date", "time", "location", "child_name", "description",
+               "immediate_action", "injuries_damage", "follow_up", "reporting_staff")
+LIST_FIELDS = ("staff_present", "witnesses")
+EMOTIONAL_PHASES = ("before", "during", "after")
+
+# The locally rendered header needs at least these; otherwise the whole report
+# goes to the model as before.
+HEADER_REQUIRED = ("location", "child_name")
+
+NOT_RECORDED = "Not recorded"
+
+# Narrative sections in report order. PEOPLE INVOLVED (rendered locally) sits
+# between the first and second of these.
+NARRATIVE_SECTIONS = (
+    "INCIDENT DESCRIPTION",
+    "CHILD'S EMOTIONAL STATE",
+    "IMMEDIATE ACTION TAKEN",
+    "INJURIES / DAMAGE",
+    "FOLLOW-UP REQUIRED",
+    "COMPLIANCE NOTES",
+)
+
+
+def parse_fields(payload):
+    """Parse the JSON inside a <FIELDS> block; returns {} if it is missing or malformed."""
+    payload = (payload or "").strip()
+    if payload.startswith("```"):
+        payload = payload.strip("`").removeprefix("json").strip()
+    try:
+        fields = json.loads(payload)
+    except ValueError:
+        return {}
+    return fields if isinstance(fields, dict) else {}
+
+
+def split_fields_block(text):
+    """Return (text without the <FIELDS> block, parsed fields) for a complete reply."""
+    start = text.find(FIELDS_OPEN)
+    if start < 0:
+        return text, {}
+    end = text.find(FIELDS_CLOSE, start)
+    if end < 0:
+        return text[:start], parse_fields(text[start + len(FIELDS_OPEN):])
+    return text[:start] + text[end + len(FIELDS_CLOSE):], parse_fields(text[start + len(FIELDS_OPEN):end])
+
+
+def _clean(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_clean(v) for v in value if _clean(v))
+    return " ".join(str(value).split())
+
+
+class IncidentRecord:
+    """The report fields from skills/incident-report.md, merged from each turn's extraction."""
+
+    def __init__(self, reporting_staff="", report_id=None, created_at=None):
+        self.created_at = created_at or datetime.now()
+        self.id = report_id or self.generate_report_id(self.created_at)
+        self.data = {name: "" for name in TEXT_FIELDS}
+        self.data.update({name: [] for name in LIST_FIELDS})
+        self.data["emotional_state"] = {phase: "" for phase in EMOTIONAL_PHASES}
+        self.data["reporting_staff"] = reporting_staff
+
+    @staticmethod
+    def generate_report_id(when):
+        return f"INC-{when.strftime('%Y%m%d')}-{uuid.uuid4().hex[:4].upper()}"
+
+    @classmethod
+    def from_messages(cls, messages, **kwargs):
+        record = cls(**kwargs)
+        for msg in messages:
+            if msg.get("fields"):
+                record.update(msg["fields"])
+        return record
+
+    def update(self, fields):
+        """Merge one turn's extracted fields; later values win, lists accumulate."""
+        for name in TEXT_FIELDS:
+            value = _clean(fields.get(name))
+            if value:
+                self.data[name] = value
+        for name in LIST_FIELDS:
+            value = fields.get(name)
+            if isinstance(value, str):
+                value = [part.strip() for part in value.split(",")]
+            for item in value or []:
+                item = _clean(item)
+                if item and item.lower() not in ("none", "n/a") and item not in self.data[name]:
+                    self.data[name].append(item)
+        emotional = fields.get("emotional_state")
+        if isinstance(emotional, dict):
+            for phase in EMOTIONAL_PHASES:
+                value = _clean(emotional.get(phase))
+                if value:
+                    self.data["emotional_state"][phase] = value
+
+    def missing(self):
+        """Required fields still empty, as in IncidentReport.validate()."""
+        required = ["date", "time", "location", "child_name", "description",
+                    "immediate_action", "injuries_damage", "follow_up"]
+        missing = [name for name in required if not self.data[name]]
+        if not self.data["emotional_state"]["during"]:
+            missing.append("emotional_state.during")
+        return missing
+
+    def can_render_header(self):
+        return all(self.data[name] for name in HEADER_REQUIRED)
+
+    def to_json(self):
+        return json.dumps(self.data, ensure_ascii=False, indent=1)
+
+    # --- Locally rendered sections ---
+
+    def render_header(self):
+        d = self.data
+        return (
+            "INCIDENT REPORT\n"
+            "BASIC INFORMATION\n"
+            f"Date: {d['date'] or self.created_at.strftime('%d/%m/%Y')}\n"
+            f"Time: {d['time'] or NOT_RECORDED}\n"
+            f"Location: {d['location'] or NOT_RECORDED}\n"
+            f"Child: {d['child_name'] or NOT_RECORDED}\n"
+            f"Reporting Staff: {d['reporting_staff'] or NOT_RECORDED}\n"
+            f"Report ID: {self.id}\n\n"
+        )
+
+    def render_people(self):
+        d = self.data
+        return (
+            "PEOPLE INVOLVED\n"
+            f"Staff Present: {', '.join(d['staff_present']) or NOT_RECORDED}\n"
+            f"Witnesses: {', '.join(d['witnesses']) or 'None'}\n\n"
+        )
+
+    def render_footer(self):
+        return (
+            f"\n\nReport Generated: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n"
+            "Status: AWAITING STAFF APPROVAL"
+        )
+
+
+def insert_before_heading(chunks, heading, block):
+    """
+    Relay text chunks, inserting `block` just before the first line that is
+    `heading`. The heading may arrive split across chunks, so a possible
+    partial match at the end of each chunk is held back. If the heading never
+    appears, the block is appended at the end.
+    """
+    pending = ""
+    inserted = False
+    for chunk in chunks:
+        if inserted:
+            yield chunk
+            continue
+        text = pending + chunk
+        pending = ""
+        at = text.find(heading)
+        if at >= 0:
+            inserted = True
+            yield text[:at] + block + text[at:]
+            continue
+        for size in range(min(len(heading) - 1, len(text)), 0, -1):
+            if heading.startswith(text[-size:]):
+                pending = text[-size:]
+                text = text[:-size]
+                break
+        if text:
+            yield text
+    if not inserted:
+        yield pending + "\n\n" + block.rstrip()
+    elif pending:
+        yield pending
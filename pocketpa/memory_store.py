@@ -0,0 +1,310 @@
+"""
+Append-only, per-staff conversation memory.
+
+Each staff member's messages are appended as compact JSON lines to segment
+files under `<staff dir>/turns/`. A new segment is started once the current one
+reaches `segment_bytes`. Beside the segments are fixed-width binary indexes:
+
+- messages.idx: one (segment, offset, length) entry per message, so message
+  i is found with one read at i * entry size;
+- skill-<name>.idx: the numbers of the assistant messages produced by that skill
+  (names that are not safe as file names are stored hex-encoded, as ~<hex>).
+
+"Last N messages" and "last N exchanges for skill X" therefore cost the same
+whether a staff member has a day or several years of history. Segment reads
+go through memory maps, so a lookup only touches the pages it returns.
+
+A message is written to its segment before its index entry. On open, index
+entries that point past the end of a segment are dropped, and segment bytes
+that no entry points to (a torn write from a crash) are cut off. Writes are
+flushed immediately and fsync'd in batches, like the draft journal.
+
+Older staff folders have a whole-history `conversation.json`. migrate_json()
+imports one into an empty store and leaves the file in place.
+"""
+import glob
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+STORE_DIR = "turns"
+INDEX_NAME = "messages.idx"
+LEGACY_NAME = "conversation.json"
+DEFAULT_SEGMENT_BYTES = 8 * 1024 * 1024
+# Memory maps kept open for sealed segments (the active one is always open)
+MAX_OPEN_SEGMENTS = 8
+
+ENTRY = struct.Struct("<IQI")  # segment number, byte offset, byte length
+SKILL_ENTRY = struct.Struct("<Q")  # message number
+SEGMENT_RE = re.compile(r"^(\d{6})\.jsonl$")
+SKILL_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class StaffMemory:
+    """One staff member's message history. Safe to share between threads."""
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES, fsync_every=8, fsync_interval=2.0):
+        self.directory = directory
+        self.path = os.path.join(directory, STORE_DIR)
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._maps = OrderedDict()
+        self._skill_files = {}
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._index = open(os.path.join(self.path, INDEX_NAME), "a+b")
+        self._recover()
+
+    def __len__(self):
+        return self.count
+
+    # --- Writing ---
+
+    def append(self, message):
+        """Append one message dict; returns its message number."""
+        data = _encode(message)
+        with self._lock:
+            if self._size and self._size + len(data) > self.segment_bytes:
+                self._rotate()
+            offset = self._size
+            self._segment.write(data)
+            self._segment.flush()
+            self._size += len(data)
+            self._index.write(ENTRY.pack(self._active, offset, len(data)))
+            self._index.flush()
+            number = self.count
+            self.count += 1
+            skill = message.get("skill_used")
+            if skill and message.get("role") == "assistant":
+                skill_file = self._skill_file(skill)
+                skill_file.write(SKILL_ENTRY.pack(number))
+                skill_file.flush()
+            self._unsynced += 1
+            self._maybe_fsync()
+            return number
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    # --- Reading ---
+
+    def get(self, number):
+        with self._lock:
+            return self._read(self._entries(number, number + 1)[0])
+
+    def recent(self, n):
+        """The last `n` messages, oldest first."""
+        with self._lock:
+            start = max(0, self.count - n)
+            return [self._read(entry) for entry in self._entries(start, self.count)]
+
+    def for_skill(self, skill, n):
+        """
+        The last `n` exchanges handled by `skill`, oldest first, as a flat list
+        of messages: each assistant reply preceded by the user message it answered.
+        """
+        with self._lock:
+            path = self._skill_path(skill)
+            if not os.path.exists(path):
+                return []
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                keep = min(n, size // SKILL_ENTRY.size)
+                raw = _read_at(f, size - keep * SKILL_ENTRY.size, keep * SKILL_ENTRY.size)
+            messages = []
+            for (number,) in SKILL_ENTRY.iter_unpack(raw):
+                if number >= self.count:
+                    continue
+                if number > 0:
+                    previous = self._read(self._entries(number - 1, number)[0])
+                    if previous.get("role") == "user":
+                        messages.append(previous)
+                messages.append(self._read(self._entries(number, number + 1)[0]))
+            return messages
+
+    def iter_messages(self, start=0, stop=None):
+        """Messages start..stop in order, read a page of the index at a time."""
+        stop = self.count if stop is None else min(stop, self.count)
+        for page in range(start, stop, 256):
+            with self._lock:
+                messages = [self._read(entry) for entry in self._entries(page, min(page + 256, stop))]
+            yield from messages
+
+    def skills(self):
+        """Skill names with at least one indexed exchange."""
+        names = []
+        for path in glob.glob(os.path.join(self.path, "skill-*.idx")):
+            name = _skill_name(os.path.basename(path)[len("skill-"):-len(".idx")])
+            if name is not None and os.path.getsize(path):
+                names.append(name)
+        return sorted(names)
+
+    def close(self):
+        with self._lock:
+            for f in (self._segment, self._index, *self._skill_files.values()):
+                if not f.closed:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+            self._skill_files.clear()
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
+            self._unsynced = 0
+
+    # --- Internals ---
+
+    def _entries(self, start, stop):
+        if start >= stop:
+            return []
+        raw = _read_at(self._index, start * ENTRY.size, (stop - start) * ENTRY.size)
+        return list(ENTRY.iter_unpack(raw))
+
+    def _read(self, entry):
+        segment, offset, length = entry
+        return json.loads(self._view(segment, offset + length)[offset:offset + length])
+
+    def _view(self, segment, needed):
+        view = self._maps.get(segment)
+        if view is not None and len(view) >= needed:
+            self._maps.move_to_end(segment)
+            return view
+        if view is not None:
+            view.close()  # the active segment has grown since it was mapped
+        with open(self._segment_path(segment), "rb") as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = view
+        self._maps.move_to_end(segment)
+        while len(self._maps) > MAX_OPEN_SEGMENTS:
+            old_segment, old = next(iter(self._maps.items()))
+            if old_segment == self._active:
+                self._maps.move_to_end(old_segment)
+                continue
+            del self._maps[old_segment]
+            old.close()
+        return view
+
+    def _rotate(self):
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._segment.close()
+        self._active += 1
+        self._segment = open(self._segment_path(self._active), "ab")
+        self._size = 0
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f"{segment:06d}.jsonl")
+
+    def _skill_path(self, skill):
+        name = skill if SKILL_NAME_RE.match(skill) else "~" + skill.encode("utf-8").hex()
+        return os.path.join(self.path, f"skill-{name}.idx")
+
+    def _skill_file(self, skill):
+        f = self._skill_files.get(skill)
+        if f is None:
+            f = self._skill_files[skill] = open(self._skill_path(skill), "ab")
+        return f
+
+    def _maybe_fsync(self):
+        now = time.monotonic()
+        if self._unsynced >= self.fsync_every or now - self._last_sync >= self.fsync_interval:
+            for f in (self._segment, self._index, *self._skill_files.values()):
+                os.fsync(f.fileno())
+            self._unsynced = 0
+            self._last_sync = now
+
+    def _recover(self):
+        """Drop whatever a crash left half-written, then open the active segment."""
+        count = os.fstat(self._index.fileno()).st_size // ENTRY.size
+        segments = sorted(int(m.group(1)) for m in map(SEGMENT_RE.match, os.listdir(self.path)) if m)
+        sizes = {segment: os.path.getsize(self._segment_path(segment)) for segment in segments}
+        while count:
+            segment, offset, length = ENTRY.unpack(_read_at(self._index, (count - 1) * ENTRY.size, ENTRY.size))
+            if offset + length <= sizes.get(segment, -1):
+                break
+            count -= 1
+        os.truncate(self._index.name, count * ENTRY.size)
+        self.count = count
+
+        if count:
+            self._active, offset, length = ENTRY.unpack(_read_at(self._index, (count - 1) * ENTRY.size, ENTRY.size))
+            self._size = offset + length
+        else:
+            self._active, self._size = 1, 0
+        for segment in segments:
+            if segment > self._active:
+                os.remove(self._segment_path(segment))
+        if sizes.get(self._active, 0) > self._size:
+            os.truncate(self._segment_path(self._active), self._size)
+        self._segment = open(self._segment_path(self._active), "ab")
+
+        for path in glob.glob(os.path.join(self.path, "skill-*.idx")):
+            keep = os.path.getsize(path) // SKILL_ENTRY.size
+            with open(path, "rb") as f:
+                while keep and SKILL_ENTRY.unpack(
+                        _read_at(f, (keep - 1) * SKILL_ENTRY.size, SKILL_ENTRY.size))[0] >= count:
+                    keep -= 1
+            os.truncate(path, keep * SKILL_ENTRY.size)
+
+
+def migrate_json(staff_dir, store=None):
+    """
+    Import `<staff_dir>/conversation.json` into the staff member's store if the
+    store is still empty. Returns the number of messages imported.
+    """
+    legacy = os.path.join(staff_dir, LEGACY_NAME)
+    if not os.path.exists(legacy):
+        return 0
+    store = store or get_staff_memory(staff_dir)
+    if len(store):
+        return 0
+    with open(legacy, encoding="utf-8") as f:
+        data = json.load(f)
+    messages = data["messages"] if isinstance(data, dict) else data
+    store.extend(messages)
+    return len(messages)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_staff_memory(staff_dir):
+    """The process-wide store for one staff member's folder."""
+    key = os.path.abspath(staff_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None or store._index.closed:
+            store = _stores[key] = StaffMemory(staff_dir)
+        return store
+
+
+def _read_at(f, offset, size):
+    """`size` bytes of `f` from `offset`. Callers hold the store's lock, so the seek is safe (os.pread is Unix-only)."""
+    f.seek(offset)
+    return f.read(size)
+
+
+def _skill_name(stem):
+    """The skill name a skill-<stem>.idx file was written for, or None if it is not one of ours."""
+    if SKILL_NAME_RE.match(stem):
+        return stem
+    if stem.startswith("~"):
+        try:
+            return bytes.fromhex(stem[1:]).decode("utf-8")
+        except ValueError:
+            return None
+    return None
+
+
+def _encode(message):
+    return (json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
@@ -0,0 +1,82 @@
+"""PDF rendering for incident reports."""
+from fpdf import FPDF
+
+# Contents lines per page in a merged export
+TOC_ENTRIES_PER_PAGE = 32
+
+
+class PDFReport(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, 'PocketPA Incident Report', 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+
+def latin1(text):
+    # Replace unsupported characters if any
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+
+def write_report(pdf, report_text):
+    """Lay out one report from the current position."""
+    pdf.set_font("Arial", size=11)
+    
+    # Handle simple markdown-like headers in report
+    for line in report_text.split('\n'):
+        if line.isupper() and len(line) > 5 and ":" not in line:
+            pdf.set_font("Arial", 'B', 12)
+            pdf.cell(0, 10, latin1(line), 0, 1)
+            pdf.set_font("Arial", size=11)
+        else:
+            pdf.multi_cell(0, 7, latin1(line))
+
+
+def create_pdf_report(report_text):
+    pdf = PDFReport()
+    pdf.add_page()
+    write_report(pdf, report_text)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def create_merged_pdf(reports):
+    """
+    One PDF holding several reports, each starting on a new page, behind a
+    linked table of contents. `reports` is a list of (heading, report text).
+    The contents pages are reserved first and filled in once every report's
+    first page is known.
+    """
+    pdf = PDFReport()
+    toc_pages = max(1, -(-len(reports) // TOC_ENTRIES_PER_PAGE))
+    for _ in range(toc_pages):
+        pdf.add_page()
+
+    entries = []
+    for heading, report_text in reports:
+        pdf.add_page()
+        link = pdf.add_link()
+        pdf.set_link(link)
+        entries.append((heading, pdf.page_no(), link))
+        write_report(pdf, report_text)
+
+    last_page = pdf.page
+    pdf.set_auto_page_break(False)
+    number_width = 20
+    heading_width = pdf.w - pdf.l_margin - pdf.r_margin - number_width
+    for index, (heading, page, link) in enumerate(entries):
+        if index % TOC_ENTRIES_PER_PAGE == 0:
+            pdf.page = 1 + index // TOC_ENTRIES_PER_PAGE
+            pdf.font_family = ''  # force set_font to write into this page's content
+            pdf.set_font("Arial", 'B', 12)
+            pdf.set_xy(pdf.l_margin, 30)
+            pdf.cell(0, 10, 'Contents' if index == 0 else 'Contents (continued)', 0, 1)
+            pdf.set_font("Arial", size=10)
+        pdf.cell(heading_width, 7, latin1(heading), 0, 0, '', 0, link)
+        pdf.cell(number_width, 7, str(page), 0, 1, 'R', 0, link)
+    pdf.page = last_page
+    pdf.set_auto_page_break(True, 20)
+    return pdf.output(dest='S').encode('latin-1')
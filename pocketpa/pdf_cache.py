@@ -0,0 +1,105 @@
+"""
+Content-addressed cache for rendered report PDFs.
+
+Keys are the SHA-256 of the report text, so identical reports are rendered
+once no matter where they are shown. Entries live in an in-memory LRU and,
+optionally, in an on-disk tier that survives restarts.
+"""
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def content_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PDFCache:
+    """LRU of rendered PDFs with an optional disk tier. Safe to share across sessions."""
+
+    def __init__(self, render, max_entries=64, disk_dir=None, max_disk_files=2000):
+        self.render = render
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_files = max_disk_files
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def contains(self, text):
+        """True if the PDF for `text` is already rendered (memory or disk)."""
+        key = content_key(text)
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.disk_dir is not None and os.path.exists(self._disk_path(key))
+
+    def get(self, text):
+        """Return PDF bytes for `text`, rendering only on a miss."""
+        key = content_key(text)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+        if data is None:
+            data = self.render(text)
+            self._write_disk(key, data)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pdf")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError:
+            # The disk tier is best-effort; the memory tier still has the bytes.
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _prune_disk(self):
+        files = glob.glob(os.path.join(self.disk_dir, "*.pdf"))
+        if len(files) <= self.max_disk_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,431 @@
+"""
+Offline policy retrieval for the policy-query skill.
+
+Policy documents under policies/ are split into sections at their markdown
+headings and indexed with BM25, so only the few sections relevant to a
+question go into the prompt instead of whole documents.
+
+The index is persisted as two files in the index directory:
+
+- policy-index.json: vocabulary (term -> postings offset, document frequency),
+  per-section metadata, a fingerprint of the source files and the name of
+  the data file;
+- policy-index.<generation>.bin: postings as packed native uint32 (section id, term
+  frequency) pairs, then the section texts, then (optionally) float32 embedding vectors.
+  It is memory-mapped, so a query touches only the postings of its own terms
+  and the text of the sections it returns.
+
+Each rebuild writes a new data file and then swaps in the JSON that names it,
+so a data file is never replaced while an older index still has it mapped
+(Windows refuses that). Replaced data files are deleted once closed.
+
+The index is rebuilt automatically when any policy file is added, removed or
+modified. Embeddings are optional: pass an `embedder` (a callable mapping a
+list of texts to a list of equal-length vectors, e.g. from
+`load_embedder()`), and BM25 candidates are re-ranked by a mix of BM25 and
+cosine similarity.
+"""
+import array
+import glob
+import importlib.util
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+
+INDEX_VERSION = 2
+JSON_NAME = "policy-index.json"
+BIN_PATTERN = "policy-index.*.bin"
+# The single data file of version 1 indexes, removed on the first rebuild
+LEGACY_BIN_NAME = "policy-index.bin"
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "our", "should", "that",
+    "the", "their", "then", "there", "this", "to", "was", "we", "what", "when", "where", "which",
+    "who", "will", "with", "you", "your",
+}
+
+# Sections longer than this are split further at paragraph boundaries.
+MAX_SECTION_WORDS = 350
+
+
+def tokenize(text):
+    tokens = []
+    for word in WORD_RE.findall(text.lower()):
+        word = word.strip("'-")
+        if word.endswith("'s"):
+            word = word[:-2]
+        # Light stemming so "recorded" / "records" / "recording" meet "record"
+        if len(word) > 5 and word.endswith("ing"):
+            word = word[:-3]
+        elif len(word) > 4 and word.endswith("ed"):
+            word = word[:-2]
+        elif len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if word and word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+def chunk_markdown(text, source):
+    """
+    Split a markdown document into sections at its headings.
+    Returns [{"source", "heading", "text"}]; `heading` is the heading path
+    (e.g. "Safeguarding Policy > Reporting a concern").
+    """
+    sections = []
+    path = []
+    lines = []
+
+    def emit():
+        body = "\n".join(lines).strip()
+        if not body:
+            return
+        heading = " > ".join(title for _, title in path) or os.path.splitext(os.path.basename(source))[0]
+        for part in _split_long(body):
+            sections.append({"source": source, "heading": heading, "text": part})
+
+    for line in text.splitlines():
+        match = HEADING_RE.match(line)
+        if match:
+            emit()
+            lines = []
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+        else:
+            lines.append(line)
+    emit()
+    return sections
+
+
+def _split_long(body):
+    if len(body.split()) <= MAX_SECTION_WORDS:
+        return [body]
+    parts, current, words = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", body):
+        count = len(paragraph.split())
+        if current and words + count > MAX_SECTION_WORDS:
+            parts.append("\n\n".join(current))
+            current, words = [], 0
+        current.append(paragraph)
+        words += count
+    if current:
+        parts.append("\n\n".join(current))
+    return parts
+
+
+def source_fingerprint(paths):
+    """Names, sizes and mtimes of the source files - changes whenever one is edited."""
+    entries = []
+    for path in sorted(paths):
+        stat = os.stat(path)
+        entries.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return entries
+
+
+def load_embedder(model_name):
+    """
+    Return an embedder backed by sentence-transformers, or None if it isn't
+    installed. Embeddings are optional; BM25 works without them.
+
+    The model is loaded on the first call, which is the first policy question
+    or index build, so startup does not pay for importing torch.
+    """
+    if importlib.util.find_spec("sentence_transformers") is None:
+        return None
+    model = None
+    lock = threading.Lock()
+
+    def embed(texts):
+        nonlocal model
+        with lock:
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_name)
+        return [list(vector) for vector in model.encode(list(texts), normalize_embeddings=True)]
+
+    return embed
+
+
+class PolicyIndex:
+    """BM25 index over policy sections, backed by a memory-mapped file."""
+
+    def __init__(self, meta, bin_path, embedder=None):
+        self.meta = meta
+        self.bin_path = bin_path
+        self.vocab = meta["vocab"]
+        self.sections = meta["sections"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.embedder = embedder
+        self._file = open(bin_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._view = memoryview(self._map)
+
+    # --- Building ---
+
+    @classmethod
+    def build(cls, policies_dir, index_dir, embedder=None, k1=1.5, b=0.75):
+        """Chunk, index and persist every policies/*.md file, then open the result."""
+        paths = glob.glob(os.path.join(policies_dir, "*.md"))
+        sections = []
+        for path in sorted(paths):
+            with open(path, "r", encoding="utf-8") as f:
+                sections.extend(chunk_markdown(f.read(), os.path.basename(path)))
+
+        postings = {}
+        lengths = []
+        for section_id, section in enumerate(sections):
+            counts = {}
+            for token in tokenize(f"{section['heading']} {section['text']}"):
+                counts[token] = counts.get(token, 0) + 1
+            lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((section_id, tf))
+
+        packed = array.array("I")
+        vocab = {}
+        for token in sorted(postings):
+            vocab[token] = [len(packed) // 2, len(postings[token])]
+            for section_id, tf in postings[token]:
+                packed.append(section_id)
+                packed.append(tf)
+
+        blob = bytearray(packed.tobytes())
+        section_meta = []
+        for section, length in zip(sections, lengths):
+            data = section["text"].encode("utf-8")
+            section_meta.append([section["source"], section["heading"], len(blob), len(data), length])
+            blob.extend(data)
+
+        dims = 0
+        vectors_offset = None
+        if embedder is not None and sections:
+            vectors = embedder([f"{s['heading']}\n{s['text']}" for s in sections])
+            dims = len(vectors[0])
+            floats = array.array("f", [value for vector in vectors for value in _normalise(vector)])
+            blob.extend(b"\0" * (-len(blob) % 4))
+            vectors_offset = len(blob)
+            blob.extend(floats.tobytes())
+
+        meta = {
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "sources": source_fingerprint(paths),
+            "k1": k1,
+            "b": b,
+            "avgdl": sum(lengths) / len(lengths) if lengths else 0.0,
+            "vocab": vocab,
+            "sections": section_meta,
+            "dims": dims,
+            "vectors_offset": vectors_offset,
+        }
+
+        os.makedirs(index_dir, exist_ok=True)
+        # A new data file per build (never one an older index has mapped), then
+        # the JSON naming it swapped in. Names are per process, so workers
+        # rebuilding at once don't interleave.
+        meta["data"] = BIN_PATTERN.replace("*", f"{time.time_ns():x}-{os.getpid()}")
+        bin_path = os.path.join(index_dir, meta["data"])
+        json_path = os.path.join(index_dir, JSON_NAME)
+        with open(bin_path, "wb") as f:
+            f.write(blob)
+        with open(json_path + f".{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, separators=(",", ":"))
+        os.replace(json_path + f".{os.getpid()}.tmp", json_path)
+        _remove_stale(index_dir, keep=bin_path)
+        return cls(meta, bin_path, embedder)
+
+    @classmethod
+    def open(cls, policies_dir, index_dir, embedder=None):
+        """Open the persisted index, rebuilding it first if the policies changed."""
+        json_path = os.path.join(index_dir, JSON_NAME)
+        paths = glob.glob(os.path.join(policies_dir, "*.md"))
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+        bin_path = os.path.join(index_dir, meta.get("data") or "") if meta else None
+        if (meta is None or meta.get("version") != INDEX_VERSION
+                or meta.get("byteorder") != sys.byteorder or not os.path.isfile(bin_path)
+                or meta.get("sources") != source_fingerprint(paths)
+                or (embedder is not None and not meta.get("dims"))):
+            return cls.build(policies_dir, index_dir, embedder)
+        return cls(meta, bin_path, embedder)
+
+    def is_stale(self, policies_dir):
+        return self.meta["sources"] != source_fingerprint(glob.glob(os.path.join(policies_dir, "*.md")))
+
+    # --- Querying ---
+
+    def _postings(self, token):
+        entry = self.vocab.get(token)
+        if entry is None:
+            return None, 0
+        offset, df = entry
+        return self._view[offset * 8:(offset + df) * 8].cast("I"), df
+
+    def bm25(self, query):
+        """{section_id: BM25 score} for the sections matching any query term."""
+        n = len(self.sections)
+        scores = {}
+        for token in set(tokenize(query)):
+            postings, df = self._postings(token)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for i in range(0, len(postings), 2):
+                section_id, tf = postings[i], postings[i + 1]
+                length = self.sections[section_id][4]
+                norm = tf + self.k1 * (1 - self.b + self.b * length / self.avgdl)
+                scores[section_id] = scores.get(section_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return scores
+
+    def search(self, query, k=4, candidates=50, semantic_weight=0.5):
+        """Top-k sections for `query` as [{"source", "heading", "text", "score"}]."""
+        scores = self.bm25(query)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+        if self.embedder is not None and self.meta.get("dims") and ranked:
+            ranked = self._rerank(query, ranked[:candidates], semantic_weight)
+
+        return [self._hit(section_id, score) for section_id, score in ranked[:k]]
+
+    def _rerank(self, query, ranked, weight):
+        query_vector = _normalise(self.embedder([query])[0])
+        top = ranked[0][1] or 1.0
+        combined = []
+        for section_id, score in ranked:
+            cosine = sum(a * b for a, b in zip(query_vector, self._vector(section_id)))
+            combined.append((section_id, (1 - weight) * score / top + weight * cosine))
+        combined.sort(key=lambda item: item[1], reverse=True)
+        return combined
+
+    def _vector(self, section_id):
+        dims = self.meta["dims"]
+        start = self.meta["vectors_offset"] + section_id * dims * 4
+        return self._view[start:start + dims * 4].cast("f")
+
+    def _hit(self, section_id, score):
+        source, heading, offset, length, _ = self.sections[section_id]
+        text = bytes(self._view[offset:offset + length]).decode("utf-8")
+        return {"source": source, "heading": heading, "text": text, "score": round(score, 4)}
+
+    def close(self):
+        try:
+            self._view.release()
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+        except BufferError:
+            pass  # a caller still holds a view; the mapping goes when it is collected
+        self._file.close()
+
+    def discard(self):
+        """Close a replaced index and delete its data file."""
+        self.close()
+        try:
+            os.remove(self.bin_path)
+        except OSError:
+            pass  # still mapped elsewhere (Windows); the next build removes it
+
+
+def _remove_stale(index_dir, keep):
+    """Delete data files from earlier builds, except any still open somewhere that won't allow it."""
+    for path in glob.glob(os.path.join(index_dir, BIN_PATTERN)) + [os.path.join(index_dir, LEGACY_BIN_NAME)]:
+        if os.path.abspath(path) != os.path.abspath(keep):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def format_hits(hits):
+    """Render search hits for the prompt, citing each section's source."""
+    return "\n\n".join(f"[{hit['source']} - {hit['heading']}]\n{hit['text']}" for hit in hits)
+
+
+def _normalise(vector):
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class PolicyLibrary:
+    """
+    The shared policy index for a policies/ directory. Re-checks the source
+    files at most every `check_interval` seconds and rebuilds when they change.
+    A replaced index is closed once the last search still using it returns.
+    """
+
+    def __init__(self, policies_dir, index_dir, embedder=None, check_interval=30.0):
+        self.policies_dir = policies_dir
+        self.index_dir = index_dir
+        self.embedder = embedder
+        self.check_interval = check_interval
+        self._index = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        # Searches in flight per index; replaced indexes wait here until theirs finish
+        self._readers = {}
+        self._retired = set()
+
+    def index(self):
+        """The current index (only searched through `search`, which keeps it open)."""
+        with self._lock:
+            return self._current()
+
+    def search(self, query, k=4):
+        with self._lock:
+            index = self._current()
+            self._readers[index] = self._readers.get(index, 0) + 1
+        try:
+            return index.search(query, k=k)
+        finally:
+            with self._lock:
+                self._readers[index] -= 1
+                if not self._readers[index]:
+                    del self._readers[index]
+                    if index in self._retired:
+                        self._retired.discard(index)
+                        index.discard()
+
+    def _current(self):
+        now = time.monotonic()
+        if self._index is None:
+            self._index = PolicyIndex.open(self.policies_dir, self.index_dir, self.embedder)
+            self._checked_at = now
+        elif now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            if self._index.is_stale(self.policies_dir):
+                old, self._index = self._index, PolicyIndex.build(self.policies_dir, self.index_dir, self.embedder)
+                if old in self._readers:
+                    self._retired.add(old)
+                else:
+                    old.discard()
+        return self._index
+
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+
+def get_policy_library(policies_dir, index_dir, embedder=None):
+    """Process-wide PolicyLibrary per policies directory, created on first use."""
+    key = os.path.abspath(policies_dir)
+    with _libraries_lock:
+        library = _libraries.get(key)
+        if library is None:
+            library = PolicyLibrary(policies_dir, index_dir, embedder)
+            _libraries[key] = library
+        return library
@@ -0,0 +1,96 @@
+"""
+Incremental report-progress extraction.
+
+`calculate_progress` used to join and lower-case the whole history and run
+eight regexes over it on every Streamlit rerun. ProgressTracker keeps the
+per-field state between calls and only scans messages it has not seen, using
+a single precompiled alternation of all field patterns.
+"""
+import re
+
+# Same keyword patterns as the original per-field regexes, in display order.
+FIELD_PATTERNS = [
+    ("Date/Time", r"date|time|happened at|when"),
+    ("Location", r"where|location|room|lounge|garden|bedroom"),
+    ("Child ID", r"child|resident|who|initials|name|him|her"),
+    ("Staff Present", r"staff|witness|present|saw|colleague"),
+    ("Description", None),  # complete once the conversation has more than 4 messages
+    ("Emotional State", r"emotion|feeling|upset|calm|angry|crying|distressed|happy"),
+    ("Action Taken", r"did|action|intervention|called|helped|comforted|administered"),
+    ("Injuries", r"hurt|injury|mark|bruise|cut|scratch|wound|no injur"),
+]
+
+DESCRIPTION_MIN_MESSAGES = 5
+
+_GROUPS = {f"f{i}": name for i, (name, pattern) in enumerate(FIELD_PATTERNS) if pattern}
+COMBINED_PATTERN = re.compile("|".join(
+    rf"\b(?P<f{i}>{pattern})\b" for i, (name, pattern) in enumerate(FIELD_PATTERNS) if pattern
+))
+
+# Enough trailing context to keep multi-word keywords ("happened at") and
+# word boundaries intact across message boundaries.
+_TAIL_CHARS = 16
+_LEADING_WORD = re.compile(r"^\w+")
+
+
+def _word_tail(chunk):
+    """The last _TAIL_CHARS of `chunk`, less any word cut in half at the start."""
+    start = len(chunk) - _TAIL_CHARS
+    if start <= 0:
+        return chunk
+    tail = chunk[start:]
+    # A fragment ("her" from "other") would match where the full text does not
+    if _LEADING_WORD.match(chunk[start - 1]):
+        tail = _LEADING_WORD.sub("", tail)
+    return tail
+
+
+def _fingerprint(msg):
+    return (msg["role"], len(msg["content"]), hash(msg["content"]))
+
+
+class ProgressTracker:
+    """Keeps field-completion state and scans only new messages on each update."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seen = 0
+        self._found = set()
+        self._tail = ""
+        self._last_fingerprint = None
+
+    def update(self, messages):
+        """Return (progress, fields) for `messages`, scanning only what's new."""
+        if len(messages) < self.seen or (
+            self.seen and _fingerprint(messages[self.seen - 1]) != self._last_fingerprint
+        ):
+            # History was rewritten (undo / new report) - start over.
+            self.reset()
+
+        for msg in messages[self.seen:]:
+            text = msg["content"].lower()
+            chunk = f"{self._tail} {text}" if self.seen else text
+            for match in COMBINED_PATTERN.finditer(chunk):
+                self._found.add(_GROUPS[match.lastgroup])
+            self._tail = _word_tail(chunk)
+            self.seen += 1
+
+        if self.seen:
+            self._last_fingerprint = _fingerprint(messages[self.seen - 1])
+
+        fields = {}
+        for name, pattern in FIELD_PATTERNS:
+            if pattern is None:
+                fields[name] = len(messages) >= DESCRIPTION_MIN_MESSAGES
+            else:
+                fields[name] = name in self._found
+
+        completed = sum(fields.values())
+        return completed / len(fields), fields
+
+
+def calculate_progress(messages):
+    """One-shot progress estimate (no state kept between calls)."""
+    return ProgressTracker().update(messages)
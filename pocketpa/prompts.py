@@ -0,0 +1,92 @@
+"""
+Prompt assembly with provider-side prompt caching in mind.
+
+System prompts are built as ordered blocks: the unchanging prefix (AGENTS.md,
+skill instructions, fixed guidance) always comes first and in the same order,
+and only then anything that varies per turn. For Anthropic the last static
+block carries a cache breakpoint so the whole prefix is served from the prompt
+cache; for Gemini the same ordering lets implicit prefix caching kick in.
+"""
+
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+
+
+def build_system_blocks(static_sections, dynamic_sections=()):
+    """
+    Build Anthropic `system` content blocks.
+    Empty sections are dropped; a cache breakpoint is placed on the last static block.
+    """
+    blocks = [{"type": "text", "text": text} for text in static_sections if text]
+    if blocks:
+        blocks[-1]["cache_control"] = dict(CACHE_BREAKPOINT)
+    blocks.extend({"type": "text", "text": text} for text in dynamic_sections if text)
+    return blocks
+
+
+def blocks_to_text(blocks):
+    """Flatten system blocks back to a single prompt string."""
+    return "\n\n".join(block["text"] for block in blocks)
+
+
+class CacheStats:
+    """Running prompt-cache hit/miss counts, fed from response usage objects."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.cached_tokens = 0
+        self.written_tokens = 0
+        self.uncached_tokens = 0
+        self.last_turn = None
+
+    def record(self, usage):
+        """
+        Record one response's usage. Understands both Anthropic `usage`
+        (cache_read_input_tokens / cache_creation_input_tokens) and Gemini
+        `usage_metadata` (cached_content_token_count / prompt_token_count).
+        Returns the per-turn breakdown.
+        """
+        if usage is None:
+            return None
+
+        if hasattr(usage, "prompt_token_count"):
+            read = getattr(usage, "cached_content_token_count", 0) or 0
+            written = 0
+            uncached = (getattr(usage, "prompt_token_count", 0) or 0) - read
+        else:
+            read = getattr(usage, "cache_read_input_tokens", 0) or 0
+            written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+            uncached = getattr(usage, "input_tokens", 0) or 0
+
+        hit = read > 0
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.cached_tokens += read
+        self.written_tokens += written
+        self.uncached_tokens += uncached
+
+        self.last_turn = {
+            "hit": hit,
+            "cache_read_tokens": read,
+            "cache_write_tokens": written,
+            "uncached_input_tokens": uncached,
+        }
+        return self.last_turn
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "cached_tokens": self.cached_tokens,
+            "written_tokens": self.written_tokens,
+            "uncached_tokens": self.uncached_tokens,
+            "last_turn": self.last_turn,
+        }
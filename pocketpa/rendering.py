@@ -0,0 +1,41 @@
+"""
+Rendered chat messages, cached by content.
+
+Streamlit reruns the whole script on every interaction and drops any element
+a rerun does not draw again, so the chat history is redrawn every time. What
+can be saved is the work per message: the HTML, the report check and the PDF
+button key are computed once per distinct message and reused, process-wide,
+on later reruns. The strings in session state are the same objects each
+rerun, so a cache lookup costs one (cached) string hash.
+"""
+import functools
+
+from pocketpa.pdf_cache import content_key
+
+REPORT_MARKERS = ("INCIDENT REPORT", "BASIC INFORMATION")
+
+
+def is_report(content):
+    return all(marker in content for marker in REPORT_MARKERS)
+
+
+class RenderedMessage:
+    """One message ready to draw: its HTML, whether it is a report, and a stable widget key."""
+
+    __slots__ = ("html", "report", "key")
+
+    def __init__(self, html, report, key):
+        self.html = html
+        self.report = report
+        self.key = key
+
+
+@functools.lru_cache(maxsize=4096)
+def render_message(role, content):
+    """The RenderedMessage for one chat message, computed once per distinct (role, content)."""
+    if role == "user":
+        return RenderedMessage(f'<div class="user-bubble">{content}</div>', False, None)
+    if is_report(content):
+        return RenderedMessage(f'<div class="report-box">{content}</div>', True, content_key(content)[:12])
+    return RenderedMessage(f'<div class="assistant-bubble">{content}</div>', False, None)
+
@@ -0,0 +1,192 @@
+"""
+Persistent index of saved reports.
+
+The "Past Reports" browser used to glob and sort the whole reports directory
+on every rerun. ReportIndex keeps one SQLite row per report file (filename,
+timestamp, kind, child, staff) plus a full-text table over the content, and
+is updated whenever a report is written. The directory is only scanned once,
+to backfill an empty index.
+"""
+import glob
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+FORMAL_PREFIX = "FORMAL_INCIDENT_REPORT"
+CONVERSATION_PREFIX = "conversation_log"
+KIND_FORMAL = "formal"
+KIND_CONVERSATION = "conversation"
+
+FILENAME_RE = re.compile(r"^(?P<prefix>[A-Za-z_]+?)_(?P<stamp>\d{8}_\d{6})\.txt$")
+CHILD_RE = re.compile(r"^\s*Child:\s*(.+?)\s*$", re.MULTILINE)
+STAFF_RE = re.compile(r"^\s*Reporting Staff:\s*(.+?)\s*$", re.MULTILINE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    filename   TEXT PRIMARY KEY,
+    path       TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    child_id   TEXT NOT NULL DEFAULT '',
+    staff      TEXT NOT NULL DEFAULT '',
+    size       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS reports_created ON reports (created_at DESC);
+CREATE INDEX IF NOT EXISTS reports_child ON reports (child_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS reports_staff ON reports (staff, created_at DESC);
+CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def parse_report_metadata(path, content):
+    """Extract (created_at, kind, child_id, staff) from a report's filename and text."""
+    filename = os.path.basename(path)
+    match = FILENAME_RE.match(filename)
+    if match:
+        created_at = datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S")
+        prefix = match.group("prefix")
+    else:
+        created_at = datetime.fromtimestamp(os.path.getmtime(path))
+        prefix = filename
+    kind = KIND_FORMAL if prefix.startswith(FORMAL_PREFIX) else KIND_CONVERSATION
+
+    child = CHILD_RE.search(content)
+    staff = STAFF_RE.search(content)
+    return (
+        created_at.isoformat(timespec="seconds"),
+        kind,
+        child.group(1) if child else "",
+        staff.group(1) if staff else "",
+    )
+
+
+class ReportIndex:
+    """SQLite-backed report index with filtered, paginated listing and full-text search."""
+
+    def __init__(self, db_path, reports_dir):
+        self.db_path = db_path
+        self.reports_dir = reports_dir
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self.has_fts = self._create_fts()
+
+    def _create_fts(self):
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(filename UNINDEXED, body)"
+            )
+            return True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 - fall back to LIKE over a plain table.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reports_text (filename TEXT PRIMARY KEY, body TEXT)"
+            )
+            return False
+
+    def add(self, path, content):
+        """Insert or update the entry for a report file that has just been written."""
+        created_at, kind, child_id, staff = parse_report_metadata(path, content)
+        filename = os.path.basename(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (filename, path, created_at, kind, child_id, staff, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (filename, path, created_at, kind, child_id, staff, len(content)),
+            )
+            if self.has_fts:
+                self._conn.execute("DELETE FROM reports_fts WHERE filename = ?", (filename,))
+                self._conn.execute("INSERT INTO reports_fts (filename, body) VALUES (?, ?)", (filename, content))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO reports_text (filename, body) VALUES (?, ?)", (filename, content)
+                )
+
+    def remove(self, filename):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reports WHERE filename = ?", (filename,))
+            table = "reports_fts" if self.has_fts else "reports_text"
+            self._conn.execute(f"DELETE FROM {table} WHERE filename = ?", (filename,))
+
+    def ensure_built(self):
+        """Backfill from the reports directory the first time the index is used."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM index_meta WHERE key = 'built'").fetchone()
+        if row is None:
+            self.rebuild()
+
+    def rebuild(self):
+        """Re-scan the reports directory. Only needed once, or after files change outside the app."""
+        for path in glob.glob(os.path.join(self.reports_dir, "*.txt")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.add(path, f.read())
+            except (OSError, UnicodeDecodeError):
+                continue
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('built', ?)",
+                (datetime.now().isoformat(timespec="seconds"),),
+            )
+
+    def count(self, query="", kind=None, child=None, staff=None, date_from=None, date_to=None):
+        """Number of reports matching the filters."""
+        clause, params = self._where(query, kind, child, staff, date_from, date_to)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM reports r {clause}", params).fetchone()[0]
+
+    def search(self, query="", kind=None, child=None, staff=None, date_from=None, date_to=None,
+               limit=20, offset=0):
+        """
+        Return one page of reports matching the filters, newest first.
+        `date_from` / `date_to` are inclusive dates or ISO strings.
+        """
+        clause, params = self._where(query, kind, child, staff, date_from, date_to)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT r.* FROM reports r {clause} ORDER BY r.created_at DESC, r.filename DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _where(self, query, kind, child, staff, date_from, date_to):
+        where, params = [], []
+        if kind:
+            where.append("r.kind = ?")
+            params.append(kind)
+        if child:
+            where.append("r.child_id LIKE ?")
+            params.append(f"%{child}%")
+        if staff:
+            where.append("r.staff LIKE ?")
+            params.append(f"%{staff}%")
+        if date_from:
+            where.append("r.created_at >= ?")
+            params.append(str(date_from))
+        if date_to:
+            where.append("r.created_at < ?")
+            params.append(f"{date_to}T99")  # inclusive of the whole end day
+        if query:
+            if self.has_fts:
+                where.append("r.filename IN (SELECT filename FROM reports_fts WHERE reports_fts MATCH ?)")
+                params.append(_fts_query(query))
+            else:
+                where.append("r.filename IN (SELECT filename FROM reports_text WHERE body LIKE ?)")
+                params.append(f"%{query}%")
+        return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query of quoted prefix terms (no syntax errors on user input)."""
+    terms = re.findall(r"\w+", text)
+    return " ".join(f'"{term}"*' for term in terms) or '""'
@@ -0,0 +1,97 @@
+"""
+Formal report requests and conversation logs.
+
+The report template lives here rather than in app.py so that
+scripts/regenerate_reports.py rebuilds archived reports with exactly the
+prompt the app uses. Conversation logs are the conversation_log_*.txt files
+the app saves on "New Report": one "[ROLE] content" entry per message.
+"""
+import hashlib
+import os
+import re
+
+from pocketpa.prompts import build_system_blocks
+from pocketpa.report_index import CONVERSATION_PREFIX, FILENAME_RE, FORMAL_PREFIX
+
+LOG_ENTRY_RE = re.compile(r"^\[(USER|ASSISTANT)\] ", re.MULTILINE)
+
+# Kept byte-identical across calls so it is served from the prompt cache
+REPORT_SYSTEM_PROMPT = """You are generating a formal incident report for a UK care home. Use the information provided to create a comprehensive, compliant report. Be professional and thorough.
+
+Report format:
+INCIDENT REPORT
+BASIC INFORMATION
+Date: [date]
+Time: [time]
+Location: [location]
+Child: [name/ID]
+Reporting Staff: [staff name]
+Report ID: [auto-generated]
+
+INCIDENT DESCRIPTION
+[Full narrative of what happened - expand on raw notes to be comprehensive]
+
+PEOPLE INVOLVED
+Staff Present: [names]
+Witnesses: [names or "None"]
+
+CHILD'S EMOTIONAL STATE
+Before: [description]
+During: [description]
+After: [description]
+
+IMMEDIATE ACTION TAKEN
+[Actions and interventions]
+
+INJURIES / DAMAGE
+[Description or "None reported"]
+
+FOLLOW-UP REQUIRED
+[Yes/No and details]
+
+COMPLIANCE NOTES
+[Assess if anything is missing or needs attention]
+
+Report Generated: [timestamp]
+Status: AWAITING STAFF APPROVAL"""
+
+
+def build_report_request(messages):
+    """Build the system blocks and user message for formal report generation."""
+    conversation_text = ""
+    for msg in messages:
+        role = msg["role"].upper()
+        content = msg["content"]
+        conversation_text += f"{role}: {content}\n\n"
+
+    system_blocks = build_system_blocks([REPORT_SYSTEM_PROMPT])
+
+    user_message = f"Please generate the incident report based on this conversation:\n\n{conversation_text}"
+    return system_blocks, [{"role": "user", "content": user_message}]
+
+
+def format_conversation_log(messages):
+    """The text of a conversation_log_*.txt file."""
+    return "\n\n".join(f"[{msg['role'].upper()}] {msg['content']}" for msg in messages)
+
+
+def parse_conversation_log(text):
+    """Messages from a conversation log written by format_conversation_log."""
+    parts = LOG_ENTRY_RE.split(text)
+    return [
+        {"role": role.lower(), "content": content.strip()}
+        for role, content in zip(parts[1::2], parts[2::2])
+    ]
+
+
+def report_filename(log_filename):
+    """FORMAL_INCIDENT_REPORT_<stamp>.txt for conversation_log_<stamp>.txt."""
+    name = os.path.basename(log_filename)
+    match = FILENAME_RE.match(name)
+    stamp = match.group("stamp") if match else os.path.splitext(name)[0].removeprefix(CONVERSATION_PREFIX + "_")
+    return f"{FORMAL_PREFIX}_{stamp}.txt"
+
+
+def template_fingerprint(model, max_tokens):
+    """Changes whenever the report template, model or output budget does."""
+    return hashlib.sha256(f"{model}\n{max_tokens}\n{REPORT_SYSTEM_PROMPT}".encode("utf-8")).hexdigest()[:16]
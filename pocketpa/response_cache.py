@@ -0,0 +1,171 @@
+"""
+Cache of skill replies to repeated, near-identical questions.
+
+Staff across a home ask the same policy and training questions ("what's the
+restraint reporting rule?") and each one used to cost a model round-trip.
+Replies are cached per skill, keyed on the normalised question: lowercased,
+stemmed, stopwords dropped and sorted, so "What is the rule for reporting
+restraint?" and "what's the restraint reporting rule" share a key.
+
+A lookup that misses the exact key falls back to similarity against the
+skill's other entries: cosine of embeddings when an embedder is given (see
+`policy_index.load_embedder`), otherwise Jaccard overlap of the normalised
+words. Only matches at or above `threshold` are served.
+
+Every entry carries the `version` it was answered under (the caller passes
+e.g. the skill file's mtime and the policy fingerprint); an entry whose
+version no longer matches is dropped, so editing a skill or policy takes its
+cached replies with it. Entries also expire after `ttl` seconds, and the
+least recently used are evicted beyond `max_entries`.
+
+Only skills in CACHEABLE_SKILLS are ever stored. Incident reports hold
+personal data about children and are never cached.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from pocketpa.policy_index import tokenize
+
+CACHEABLE_SKILLS = ("policy-query", "micro-training")
+
+# Questions shorter than this (after normalising) are too generic to share a reply
+MIN_QUERY_WORDS = 2
+
+
+def normalise(query):
+    """Sorted, de-duplicated stems of the question's content words."""
+    return tuple(sorted(set(tokenize(query))))
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class CacheEntry:
+    def __init__(self, skill, words, vector, reply, version, created_at):
+        self.skill = skill
+        self.words = words
+        self.vector = vector
+        self.reply = reply
+        self.version = version
+        self.created_at = created_at
+
+
+class ResponseCache:
+    """LRU of skill replies with similarity lookup, TTL and version checks. Safe to share across sessions."""
+
+    def __init__(self, max_entries=512, ttl=24 * 3600, threshold=0.9, embedder=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embedder = embedder
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (skill, words) -> CacheEntry
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cacheable(self, skill, query):
+        return skill in CACHEABLE_SKILLS and len(normalise(query)) >= MIN_QUERY_WORDS
+
+    def get(self, skill, query, version):
+        """The cached reply to `query` (or a close enough question) under `version`, or None."""
+        if not self.cacheable(skill, query):
+            return None
+        words = normalise(query)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get((skill, words))
+            if entry is not None and not self._fresh(entry, version, now):
+                del self._entries[(skill, words)]
+                entry = None
+            if entry is None and self.embedder is None:
+                entry = self._similar(skill, words, None, version, now)
+            if entry is not None or self.embedder is None:
+                return self._result(entry)
+        # Embedding can take a while, so it happens outside the lock
+        vector = self._embed(query)
+        with self._lock:
+            return self._result(self._similar(skill, words, vector, version, now))
+
+    def put(self, skill, query, version, reply):
+        """Store `reply` as the answer to `query`. Ignored for skills that must not be cached."""
+        if not self.cacheable(skill, query):
+            return
+        words = normalise(query)
+        vector = self._embed(query)
+        with self._lock:
+            self._entries[(skill, words)] = CacheEntry(skill, words, vector, reply, version, self.clock())
+            self._entries.move_to_end((skill, words))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _fresh(self, entry, version, now):
+        return entry.version == version and now - entry.created_at < self.ttl
+
+    def _result(self, entry):
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((entry.skill, entry.words))
+        self.hits += 1
+        return entry.reply
+
+    def _similar(self, skill, words, vector, version, now):
+        """Best entry for `skill` at or above the threshold. Drops stale entries on the way."""
+        best, best_score, stale = None, self.threshold, []
+        for key, entry in self._entries.items():
+            if entry.skill != skill:
+                continue
+            if not self._fresh(entry, version, now):
+                stale.append(key)
+                continue
+            if vector is not None and entry.vector is not None:
+                score = cosine(vector, entry.vector)
+            else:
+                score = jaccard(words, entry.words)
+            if score >= best_score:
+                best, best_score = entry, score
+        for key in stale:
+            del self._entries[key]
+        return best
+
+    def _embed(self, query):
+        if self.embedder is None:
+            return None
+        return self.embedder([query])[0]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(name, **kwargs):
+    """Process-wide ResponseCache per name, created on first use."""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = ResponseCache(**kwargs)
+            _caches[name] = cache
+        return cache
@@ -0,0 +1,146 @@
+"""
+Local, deterministic intent routing.
+
+Most turns can be routed without asking the LLM: inside an ongoing incident
+report the answer is almost always "same skill as last turn", and many
+opening messages contain a skill's declared trigger phrase. The LocalRouter
+combines three signals:
+
+1. Sticky-session affinity - stay on the previous turn's `skill_used`
+   unless there is strong evidence for another skill.
+2. Trigger phrases from each skill file's header (`**Trigger**: "..."`).
+3. A small lexical classifier over per-skill keyword lists.
+
+When none of these is confident, the caller escalates to the LLM router.
+"""
+import re
+
+from pocketpa.skills import discover_skills
+
+DEFAULT_SKILL = "incident-report"
+
+# Seed vocabulary per skill. Trigger phrases from the skill headers are added on top.
+SKILL_KEYWORDS = {
+    "incident-report": [
+        "incident", "happened", "report", "log", "threw", "hit", "kicked", "punched",
+        "bit", "ran", "absconded", "missing", "fight", "fell", "injured", "hurt",
+        "broke", "damage", "restrained", "restraint", "shouting", "screaming", "upset",
+        "angry", "self-harm", "bruise", "behaviour", "behavior",
+    ],
+    "policy-query": [
+        "policy", "policies", "procedure", "procedures", "rule", "rules", "allowed",
+        "guidance", "regulation", "regulations", "legal", "ofsted", "cqc", "requirement",
+        "requirements", "permitted", "supposed", "safeguarding",
+    ],
+    "micro-training": [
+        "training", "train", "teach", "learn", "practice", "practise", "role-play",
+        "roleplay", "scenario", "quiz", "refresher", "course",
+    ],
+    "gap-detection": [
+        "completeness", "validate", "validation", "gaps",
+    ],
+}
+
+STOPWORDS = {"a", "an", "the", "to", "of", "i", "me", "my", "is", "it"}
+
+WORD_RE = re.compile(r"[a-z][a-z'\-]*")
+
+
+def tokenize(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+def last_skill_used(conversation_history):
+    """Return the skill used on the most recent assistant turn, if any."""
+    for msg in reversed(conversation_history or []):
+        if msg.get("role") == "assistant" and msg.get("skill_used"):
+            return msg["skill_used"]
+    return None
+
+
+class RouteDecision:
+    """Outcome of a routing step. `source` is "local" or "llm"."""
+
+    def __init__(self, skill, source, confidence, reason):
+        self.skill = skill
+        self.source = source
+        self.confidence = confidence
+        self.reason = reason
+
+    def __repr__(self):
+        return f"RouteDecision({self.skill!r}, source={self.source!r}, confidence={self.confidence:.2f}, reason={self.reason!r})"
+
+
+class LocalRouter:
+    """
+    Resolves routing locally when confident, otherwise signals escalation.
+
+    `triggers` maps skill name -> list of trigger phrases (see discover_skills).
+    """
+
+    TRIGGER_WEIGHT = 1.0
+    KEYWORD_WEIGHT = 0.34
+
+    def __init__(self, triggers, threshold=0.6, switch_score=1.0):
+        self.threshold = threshold
+        self.switch_score = switch_score
+        self.skills = sorted(triggers)
+        self.triggers = {
+            skill: [set(tokenize(phrase)) for phrase in phrases if tokenize(phrase)]
+            for skill, phrases in triggers.items()
+        }
+        self.keywords = {
+            skill: set(SKILL_KEYWORDS.get(skill, []))
+            for skill in self.skills
+        }
+        self.stats = {"local": 0, "llm": 0}
+
+    @classmethod
+    def from_skills_dir(cls, skills_dir, **kwargs):
+        metadata = discover_skills(skills_dir)
+        return cls({name: meta.get("trigger", []) for name, meta in metadata.items()}, **kwargs)
+
+    def score(self, user_input):
+        """Return {skill: score} from trigger phrases and keyword hits."""
+        words = set(tokenize(user_input))
+        scores = {}
+        for skill in self.skills:
+            score = 0.0
+            for phrase in self.triggers.get(skill, []):
+                if phrase <= words:
+                    score += self.TRIGGER_WEIGHT
+            score += min(1.0, self.KEYWORD_WEIGHT * len(words & self.keywords[skill]))
+            scores[skill] = score
+        return scores
+
+    def route(self, user_input, conversation_history=None):
+        """
+        Decide a route locally. Returns a RouteDecision; if its confidence is below
+        `threshold` the caller should escalate to the LLM router.
+        """
+        scores = self.score(user_input)
+        if not scores:
+            return RouteDecision(DEFAULT_SKILL, "local", 0.0, "no skills available")
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        top_skill, top_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        margin = top_score - runner_up
+
+        previous = last_skill_used(conversation_history)
+        if previous in scores:
+            if top_skill == previous or top_score == 0:
+                return RouteDecision(previous, "local", 0.9, "sticky session")
+            if top_score >= self.switch_score and margin >= 0.5:
+                return RouteDecision(top_skill, "local", 0.7, "trigger overrides session")
+            # Another skill is hinted at but not clearly asked for.
+            return RouteDecision(previous, "local", 0.5, "conflicting signal")
+
+        if top_score > 0 and margin > 0:
+            confidence = min(1.0, 0.4 + margin / 2)
+            return RouteDecision(top_skill, "local", confidence, "lexical match")
+
+        return RouteDecision(top_skill if top_score else DEFAULT_SKILL, "local", 0.0, "no clear signal")
+
+    def record(self, decision):
+        self.stats[decision.source] = self.stats.get(decision.source, 0) + 1
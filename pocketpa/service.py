@@ -0,0 +1,169 @@
+"""
+Asyncio conversation service shared by every Streamlit session.
+
+Streamlit runs each session's script in its own thread. When those threads
+make blocking LLM calls directly, a burst of staff reporting at once (e.g.
+after a shift change) ties up every thread. ConversationService instead runs
+all LLM turns as coroutines on one background event loop:
+
+- bounded concurrency (at most `max_concurrency` turns in flight),
+- per-user fairness (round-robin across users, `per_user_limit` each),
+- a bounded request queue (`max_queue`); beyond it `ServiceBusy` is raised.
+
+Script threads call `submit()` for a single result or `stream()` to iterate
+over text chunks as the coroutine produces them.
+"""
+import asyncio
+import concurrent.futures
+import queue
+import threading
+from collections import deque
+
+
+class ServiceBusy(Exception):
+    """The request queue is full; the caller should ask the user to retry."""
+
+
+_DONE = object()
+
+
+class _Job:
+    __slots__ = ("factory", "future")
+
+    def __init__(self, factory, future):
+        self.factory = factory
+        self.future = future
+
+
+class ConversationService:
+    """Runs LLM turns for many users on one event loop with fair, bounded scheduling."""
+
+    def __init__(self, max_concurrency=8, per_user_limit=1, max_queue=256):
+        self.max_concurrency = max_concurrency
+        self.per_user_limit = per_user_limit
+        self.max_queue = max_queue
+
+        self._queues = {}
+        self._ready = deque()
+        self._active = 0
+        self._active_per_user = {}
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="pocketpa-service", daemon=True)
+        self._thread.start()
+
+    # --- Public API (called from script threads) ---
+
+    def submit(self, user_id, factory):
+        """
+        Schedule `factory()` (a coroutine function) for `user_id`.
+        Returns a concurrent.futures.Future with its result.
+        """
+        with self._pending_lock:
+            if self._pending >= self.max_queue:
+                raise ServiceBusy(f"{self._pending} requests already queued")
+            self._pending += 1
+        future = concurrent.futures.Future()
+        self.loop.call_soon_threadsafe(self._enqueue, user_id, _Job(factory, future))
+        return future
+
+    def stream(self, user_id, factory, timeout=None):
+        """
+        Schedule `factory()` (an async generator function) and yield its chunks
+        in the calling thread as they are produced. Exceptions are re-raised here.
+        """
+        chunks = queue.Queue()
+
+        async def pump():
+            try:
+                async for chunk in factory():
+                    chunks.put(chunk)
+            except BaseException as e:
+                chunks.put(e)
+                raise
+            finally:
+                chunks.put(_DONE)
+
+        future = self.submit(user_id, pump)
+        while True:
+            item = chunks.get(timeout=timeout)
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        future.result()
+
+    def stats(self):
+        return {
+            "active": self._active,
+            "queued": self._pending - self._active,
+            "users_waiting": len(self._ready),
+        }
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+    # --- Event loop side ---
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _enqueue(self, user_id, job):
+        self._queues.setdefault(user_id, deque()).append(job)
+        if user_id not in self._ready and self._active_per_user.get(user_id, 0) < self.per_user_limit:
+            self._ready.append(user_id)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._active < self.max_concurrency and self._ready:
+            user_id = self._ready.popleft()
+            jobs = self._queues[user_id]
+            job = jobs.popleft()
+            if not jobs:
+                del self._queues[user_id]
+
+            self._active += 1
+            self._active_per_user[user_id] = self._active_per_user.get(user_id, 0) + 1
+            if user_id in self._queues and self._active_per_user[user_id] < self.per_user_limit:
+                self._ready.append(user_id)  # back of the line: round-robin across users
+            self.loop.create_task(self._run(user_id, job))
+
+    async def _run(self, user_id, job):
+        try:
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(await job.factory())
+                except BaseException as e:
+                    job.future.set_exception(e)
+        finally:
+            self._active -= 1
+            self._active_per_user[user_id] -= 1
+            if not self._active_per_user[user_id]:
+                del self._active_per_user[user_id]
+            with self._pending_lock:
+                self._pending -= 1
+            if user_id in self._queues and user_id not in self._ready:
+                self._ready.append(user_id)
+            self._dispatch()
+
+
+async def stream_claude(client, usage_holder=None, **request):
+    """
+    Async generator over the text of a streamed Claude reply.
+    The final `usage` is stored in `usage_holder["usage"]` if given.
+    """
+    async with client.messages.stream(**request) as stream:
+        async for text in stream.text_stream:
+            yield text
+        if usage_holder is not None:
+            usage_holder["usage"] = (await stream.get_final_message()).usage
+
+
+async def complete_claude(client, **request):
+    """Return the full (non-streamed) Claude response message."""
+    return await client.messages.create(**request)
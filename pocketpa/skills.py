@@ -0,0 +1,248 @@
+"""Skill file helpers: header metadata parsing, discovery and the shared in-memory registry."""
+import glob
+import os
+import re
+import threading
+import time
+
+# > **Status**: ACTIVE | **Version**: 1.2.0 | **Owner**: Compliance Team
+HEADER_FIELD_RE = re.compile(r"\*\*(\w[\w ]*)\*\*:\s*([^|]+)")
+QUOTED_RE = re.compile(r'"([^"]+)"')
+
+
+def parse_skill_header(text):
+    """
+    Parse the `> **Key**: value | **Key**: value` lines at the top of a skill file.
+    Keys are lower-cased; `trigger` is returned as a list of phrases.
+    """
+    metadata = {}
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("## "):
+            break  # header block ends at the first section
+        if not stripped.startswith(">"):
+            continue
+        for key, value in HEADER_FIELD_RE.findall(stripped):
+            key = key.strip().lower()
+            value = value.strip()
+            if key == "trigger":
+                metadata[key] = [phrase.strip().lower() for phrase in QUOTED_RE.findall(value)]
+            else:
+                metadata[key] = value
+    metadata.setdefault("trigger", [])
+    return metadata
+
+
+def discover_skills(skills_dir):
+    """Return {skill_name: header metadata} for every skills/*.md file."""
+    skills = {}
+    for path in sorted(glob.glob(os.path.join(skills_dir, "*.md"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            skills[name] = parse_skill_header(f.read())
+    return skills
+
+
+class Skill:
+    """One parsed skill file."""
+
+    def __init__(self, name, path, text, mtime):
+        self.name = name
+        self.path = path
+        self.text = text
+        self.mtime = mtime
+        self.metadata = parse_skill_header(text)
+
+
+class SkillRegistry:
+    """
+    In-memory skills (every skills/*.md, with parsed header metadata) and other
+    context documents (AGENTS.md, TABLE-OF-CONTENTS.md, policies), reloaded per
+    file when they change on disk.
+
+    With watchdog installed, filesystem events mark the registry dirty and a
+    turn that finds nothing changed does no file I/O at all. Without it, file
+    mtimes are checked at most every `check_interval` seconds.
+    `version` increases whenever anything was (re)loaded, so callers can
+    rebuild state derived from the files.
+    """
+
+    def __init__(self, base_dir, check_interval=2.0, watch=True):
+        self.base_dir = os.path.abspath(base_dir)
+        self.skills_dir = os.path.join(self.base_dir, "skills")
+        self.check_interval = check_interval
+        self.version = 0
+        self.errors = {}
+        self._skills = {}
+        self._documents = {}  # relative path -> (mtime, text)
+        self._lock = threading.RLock()
+        self._dirty = True
+        self._last_check = 0.0
+        self._observer = None
+        self._watched = set()
+        if watch:
+            self._start_watching()
+
+    # --- Public API ---
+
+    def refresh(self, force=False):
+        """Reload anything that changed on disk. Returns True if something did."""
+        with self._lock:
+            now = time.monotonic()
+            if not force:
+                if self._observer is not None and not self._dirty:
+                    return False
+                if self._observer is None and now - self._last_check < self.check_interval:
+                    return False
+            self._dirty = False
+            self._last_check = now
+            changed = self._scan_skills()
+            for relpath in list(self._documents):
+                changed |= self._load_document(relpath)
+            if changed:
+                self.version += 1
+            return changed
+
+    def skill(self, name):
+        """The Skill called `name`, or None."""
+        self.refresh()
+        return self._skills.get(name)
+
+    def skill_text(self, name):
+        skill = self.skill(name)
+        return skill.text if skill else ""
+
+    def names(self):
+        self.refresh()
+        return sorted(self._skills)
+
+    def metadata(self):
+        """{skill_name: header metadata}, like discover_skills()."""
+        self.refresh()
+        return {name: skill.metadata for name, skill in sorted(self._skills.items())}
+
+    def triggers(self):
+        return {name: meta.get("trigger", []) for name, meta in self.metadata().items()}
+
+    def document(self, relpath, required=False):
+        """Text of a file under base_dir ("" if missing, or FileNotFoundError if required)."""
+        with self._lock:
+            if relpath not in self._documents:
+                self._documents[relpath] = (None, "")
+                self._load_document(relpath)
+                self._watch(os.path.dirname(os.path.join(self.base_dir, relpath)))
+            else:
+                self.refresh()
+            mtime, text = self._documents[relpath]
+        if mtime is None and required:
+            raise FileNotFoundError(os.path.join(self.base_dir, relpath))
+        return text
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+    # --- Loading ---
+
+    def _read(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self.errors.pop(path, None)
+            return None, ""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            self.errors[path] = str(e)
+            return mtime, ""
+        self.errors.pop(path, None)
+        return mtime, text
+
+    def _scan_skills(self):
+        changed = False
+        paths = {
+            os.path.splitext(os.path.basename(path))[0]: path
+            for path in glob.glob(os.path.join(self.skills_dir, "*.md"))
+        }
+        for name in set(self._skills) - set(paths):
+            del self._skills[name]
+            changed = True
+        for name, path in paths.items():
+            current = self._skills.get(name)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if current is not None and current.mtime == mtime:
+                continue
+            mtime, text = self._read(path)
+            if mtime is not None:
+                self._skills[name] = Skill(name, path, text, mtime)
+                changed = True
+        return changed
+
+    def _load_document(self, relpath):
+        path = os.path.join(self.base_dir, relpath)
+        old_mtime, _ = self._documents[relpath]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == old_mtime and mtime is not None:
+            return False
+        self._documents[relpath] = self._read(path)
+        return mtime != old_mtime
+
+    # --- Watching (optional) ---
+
+    def _start_watching(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        registry = self
+
+        class _MarkDirty(FileSystemEventHandler):
+            def on_any_event(self, event):
+                registry._dirty = True
+
+        self._handler = _MarkDirty()
+        self._observer = Observer()
+        self._observer.daemon = True
+        try:
+            self._observer.start()
+        except Exception:
+            self._observer = None
+            return
+        self._watch(self.skills_dir)
+
+    def _watch(self, directory):
+        if self._observer is None or directory in self._watched or not os.path.isdir(directory):
+            return
+        try:
+            self._observer.schedule(self._handler, directory, recursive=False)
+        except Exception:
+            # Can't watch (e.g. out of inotify watches): fall back to mtime polling.
+            self.close()
+            return
+        self._watched.add(directory)
+        self._dirty = True
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_skill_registry(base_dir, **kwargs):
+    """Process-wide registry per base directory, created on first use."""
+    key = os.path.abspath(base_dir)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = SkillRegistry(key, **kwargs)
+            _registries[key] = registry
+        return registry
@@ -0,0 +1,117 @@
+"""
+Speculative pre-generation of the report narrative.
+
+By the time most report fields are filled in, the report is largely decided,
+but the model used to be asked for it only after <GENERATE_REPORT>. A
+ReportSpeculator starts drafting the narrative in the background once progress
+crosses a threshold, keyed on the incident record and staff messages it was
+drafted from. If a later turn changes either, the draft is discarded (or
+cancelled while still queued) and a new one started. The header, people and footer are rendered
+locally at delivery time, so they are always current.
+
+SpeculationStats is shared across sessions so the threshold can be tuned from
+the hit rate: a hit is a report served from a matching draft, a miss is a
+report that had to be generated live.
+"""
+import concurrent.futures
+import hashlib
+import threading
+
+
+def draft_key(record, messages):
+    """Key a narrative draft on everything the model is given: the record and the staff's own words."""
+    digest = hashlib.sha256(record.to_json().encode("utf-8"))
+    for msg in messages:
+        if msg["role"] == "user":
+            digest.update(b"\0" + msg["content"].encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SpeculationStats:
+    """Process-wide counters for speculative drafts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.invalidated = 0
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+
+    def add(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    @property
+    def hit_rate(self):
+        served = self.hits + self.misses
+        return self.hits / served if served else 0.0
+
+    def as_dict(self):
+        return {
+            "started": self.started,
+            "invalidated": self.invalidated,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failed": self.failed,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+
+class ReportSpeculator:
+    """Holds at most one in-flight narrative draft for a session."""
+
+    def __init__(self, stats=None):
+        self.stats = stats or SpeculationStats()
+        self.key = None
+        self.future = None
+
+    def prepare(self, key, submit):
+        """
+        Make sure a draft for `key` exists. `submit()` starts the work and
+        returns a concurrent.futures.Future; it is only called when needed.
+        """
+        if key == self.key and self.future is not None:
+            return False
+        self.invalidate()
+        self.key = key
+        self.future = submit()
+        self.stats.add("started")
+        return True
+
+    def invalidate(self):
+        """Drop the current draft; cancel it if it has not started yet."""
+        if self.future is not None:
+            self.future.cancel()
+            self.stats.add("invalidated")
+        self.key = None
+        self.future = None
+
+    def take(self, key, timeout=None):
+        """
+        Return the finished draft for `key`, waiting up to `timeout` seconds
+        for it if it is still running, or None if there is no matching draft
+        (or it failed, or is not done in time - it is then cancelled).
+        """
+        future, matched = self.future, key == self.key and self.future is not None
+        self.key = None
+        self.future = None
+        if not matched:
+            if future is not None:
+                future.cancel()
+                self.stats.add("invalidated")
+            self.stats.add("misses")
+            return None
+        try:
+            result = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.stats.add("invalidated")
+            self.stats.add("misses")
+            return None
+        except Exception:
+            self.stats.add("failed")
+            self.stats.add("misses")
+            return None
+        self.stats.add("hits")
+        return result
@@ -0,0 +1,127 @@
+"""Helpers for rendering streamed model output as it arrives."""
+import time
+
+REPORT_TAG = "<GENERATE_REPORT>"
+
+
+class TagStreamFilter:
+    """
+    Removes a control tag (e.g. <GENERATE_REPORT>) from a stream of text chunks.
+
+    The tag may be split across chunk boundaries, so any trailing text that could
+    be the start of the tag is held back until the next chunk decides it.
+    """
+
+    def __init__(self, tag=REPORT_TAG):
+        self.tag = tag
+        self.found = False
+        self._pending = ""
+
+    def feed(self, chunk):
+        """Return the part of `chunk` that is safe to display."""
+        text = self._pending + chunk
+        self._pending = ""
+
+        if self.tag in text:
+            self.found = True
+            text = text.replace(self.tag, "")
+
+        for size in range(min(len(self.tag) - 1, len(text)), 0, -1):
+            if self.tag.startswith(text[-size:]):
+                self._pending = text[-size:]
+                return text[:-size]
+        return text
+
+    def flush(self):
+        """Release any held-back text once the stream has ended."""
+        text, self._pending = self._pending, ""
+        return text
+
+
+class BlockStreamFilter:
+    """
+    Removes a hidden block (e.g. <FIELDS>{...}</FIELDS>) from a stream of text
+    chunks and keeps its contents in `payload`. Like TagStreamFilter, text that
+    could be the start of the opening tag is held back until it is decided.
+    """
+
+    def __init__(self, open_tag, close_tag):
+        self.open_tag = open_tag
+        self.close_tag = close_tag
+        self.found = False
+        self.payload = ""
+        self._inside = False
+        self._pending = ""
+
+    def feed(self, chunk):
+        """Return the part of `chunk` that is safe to display."""
+        text = self._pending + chunk
+        self._pending = ""
+        shown = ""
+
+        while text:
+            if self._inside:
+                # Search the payload too, in case the closing tag was split across chunks.
+                text = self.payload + text
+                end = text.find(self.close_tag)
+                if end < 0:
+                    self.payload = text
+                    return shown
+                self.payload = text[:end]
+                text = text[end + len(self.close_tag):]
+                self._inside = False
+                self.found = True
+                continue
+            start = text.find(self.open_tag)
+            if start < 0:
+                break
+            shown += text[:start]
+            text = text[start + len(self.open_tag):]
+            self._inside = True
+
+        for size in range(min(len(self.open_tag) - 1, len(text)), 0, -1):
+            if self.open_tag.startswith(text[-size:]):
+                self._pending = text[-size:]
+                return shown + text[:-size]
+        return shown + text
+
+    def flush(self):
+        """Release any held-back text once the stream has ended."""
+        if self._inside:
+            # Unterminated block: keep what arrived, minus any partial closing tag.
+            for size in range(len(self.close_tag) - 1, 0, -1):
+                if self.payload.endswith(self.close_tag[:size]):
+                    self.payload = self.payload[:-size]
+                    break
+            self._inside = False
+            self.found = True
+        text, self._pending = self._pending, ""
+        return text
+
+
+class StreamTimer:
+    """Tracks time-to-first-token and total duration of a streamed reply."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+
+    def mark_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def ttft(self):
+        """Seconds until the first token arrived (None if nothing arrived)."""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total(self):
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
@@ -0,0 +1,72 @@
+"""
+Per-home storage layout.
+
+Everything a care home writes lives under its own directory, so several homes
+(and several worker processes) can share one box without reading or writing
+each other's files:
+
+    memory/                          the "default" home (the original layout)
+        staff-contexts/              saved reports, and one folder per staff member
+            <staff>/turns/           that staff member's memory store
+        drafts/<session>.jsonl       one draft journal per browser session
+        pdf-cache/  exports/  report-index.sqlite3
+    memory/homes/<home>/             any other home, with the same layout
+
+Home and staff ids are validated before they become path components (session
+ids are checked by DraftJournal), so an id from a URL or header can never
+point outside its home.
+"""
+import os
+import re
+
+DEFAULT_HOME = "default"
+HOME_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+STAFF_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# Set on the requests scripts/serve.py forwards to a worker
+HOME_HEADER = "X-PocketPA-Home"
+
+
+def valid_home(home):
+    return bool(home) and HOME_ID_RE.match(home) is not None
+
+
+class HomeStorage:
+    """Paths for one home's data under `root` (normally "memory")."""
+
+    def __init__(self, root, home=DEFAULT_HOME):
+        home = home or DEFAULT_HOME
+        if not valid_home(home):
+            raise ValueError(f"Invalid home id: {home!r}")
+        self.root = root
+        self.home = home
+        self.base = root if home == DEFAULT_HOME else os.path.join(root, "homes", home)
+
+    def __repr__(self):
+        return f"HomeStorage({self.home!r}, {self.base!r})"
+
+    @property
+    def reports_dir(self):
+        return os.path.join(self.base, "staff-contexts")
+
+    @property
+    def drafts_dir(self):
+        return os.path.join(self.base, "drafts")
+
+    @property
+    def pdf_cache_dir(self):
+        return os.path.join(self.base, "pdf-cache")
+
+    @property
+    def exports_dir(self):
+        return os.path.join(self.base, "exports")
+
+    @property
+    def report_index_path(self):
+        return os.path.join(self.base, "report-index.sqlite3")
+
+    def staff_dir(self, staff_id):
+        """One staff member's folder (conversation memory store)."""
+        if not STAFF_ID_RE.match(staff_id or ""):
+            raise ValueError(f"Invalid staff id: {staff_id!r}")
+        return os.path.join(self.reports_dir, staff_id)
@@ -0,0 +1,267 @@
+"""
+Lightweight turn-level tracing.
+
+Spans time the stages of a turn (routing, skill loading, the LLM call, report
+generation, PDF rendering, draft saving) and carry token usage from the
+response: input/output tokens and prompt-cache reads/writes. The Tracer keeps
+a bounded window of recent durations per stage for p50/p95, and can export:
+
+- a JSONL trace file, one span per line (POCKETPA_TRACE_FILE);
+- Prometheus text, via `prometheus_text()` or a small /metrics HTTP server
+  (POCKETPA_METRICS_PORT).
+
+Tracing is always on and costs a couple of perf_counter calls per span;
+exporting is opt-in.
+"""
+import collections
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DEFAULT_TRACE_FILE = os.environ.get("POCKETPA_TRACE_FILE", "")
+DEFAULT_METRICS_PORT = int(os.environ.get("POCKETPA_METRICS_PORT", "0"))
+
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+_current_span = contextvars.ContextVar("pocketpa_current_span", default=None)
+
+
+def current_span():
+    """The innermost open span in this context, or None."""
+    return _current_span.get()
+
+
+class Span:
+    """One timed stage. Attributes are free-form; token counts are summed per stage."""
+
+    def __init__(self, name, attrs=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record_usage(self, usage):
+        """Add token counts from an Anthropic `usage` or Gemini `usage_metadata` object."""
+        if usage is None:
+            return
+        counts = {
+            "input_tokens": getattr(usage, "input_tokens", None) or getattr(usage, "prompt_token_count", None),
+            "output_tokens": getattr(usage, "output_tokens", None) or getattr(usage, "candidates_token_count", None),
+            "cache_read_tokens": (getattr(usage, "cache_read_input_tokens", None)
+                                  or getattr(usage, "cached_content_token_count", None)),
+            "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", None),
+        }
+        for key, value in counts.items():
+            if value:
+                self.attrs[key] = self.attrs.get(key, 0) + value
+        self.attrs["cache_hit"] = bool(self.attrs.get("cache_read_tokens"))
+
+    def as_dict(self):
+        return {
+            "span_id": self.id,
+            "name": self.name,
+            "start": round(self.started_at, 6),
+            "duration_ms": round((self.duration or 0) * 1000, 3),
+            **self.attrs,
+        }
+
+
+class _StageStats:
+    def __init__(self, window):
+        self.durations = collections.deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.cache_hits = 0
+        self.tokens = dict.fromkeys(TOKEN_FIELDS, 0)
+
+
+class Tracer:
+    """Collects spans, keeps per-stage statistics and exports them."""
+
+    def __init__(self, trace_file=DEFAULT_TRACE_FILE, window=1024):
+        self.trace_file = trace_file
+        self.window = window
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._trace = None
+        self._server = None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block as stage `name`. Exceptions are recorded and re-raised."""
+        span = Span(name, attrs)
+        parent = _current_span.get()
+        if parent is not None:
+            span.attrs.setdefault("parent", parent.id)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._start
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                _current_span.set(parent)  # closed from another context (e.g. a generator moved threads)
+            self.finish(span)
+
+    def traced(self, name):
+        """Decorator form of span() for plain functions."""
+        def decorate(func):
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorate
+
+    def finish(self, span):
+        with self._lock:
+            stats = self._stages.get(span.name)
+            if stats is None:
+                stats = self._stages[span.name] = _StageStats(self.window)
+            stats.durations.append(span.duration)
+            stats.count += 1
+            stats.total_seconds += span.duration
+            if span.attrs.get("error"):
+                stats.errors += 1
+            if span.attrs.get("cache_hit"):
+                stats.cache_hits += 1
+            for key in TOKEN_FIELDS:
+                stats.tokens[key] += span.attrs.get(key, 0)
+            if self.trace_file:
+                self._write(span)
+
+    def _write(self, span):
+        if self._trace is None:
+            directory = os.path.dirname(self.trace_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._trace = open(self.trace_file, "a", encoding="utf-8", buffering=1)
+        self._trace.write(json.dumps(span.as_dict(), default=str) + "\n")
+
+    # --- Reading ---
+
+    def summary(self):
+        """{stage: {count, errors, p50_ms, p95_ms, mean_ms, cache_hits, tokens...}} over the recent window."""
+        with self._lock:
+            result = {}
+            for name, stats in sorted(self._stages.items()):
+                ordered = sorted(stats.durations)
+                result[name] = {
+                    "count": stats.count,
+                    "errors": stats.errors,
+                    "p50_ms": round(_quantile(ordered, 0.5) * 1000, 1),
+                    "p95_ms": round(_quantile(ordered, 0.95) * 1000, 1),
+                    "mean_ms": round(stats.total_seconds / stats.count * 1000, 1),
+                    "cache_hits": stats.cache_hits,
+                    **stats.tokens,
+                }
+            return result
+
+    def prometheus_text(self):
+        """Per-stage metrics in the Prometheus text exposition format."""
+        with self._lock:
+            stages = [(name, stats, sorted(stats.durations)) for name, stats in sorted(self._stages.items())]
+        lines = [
+            "# HELP pocketpa_stage_duration_seconds Duration of each turn stage (recent window).",
+            "# TYPE pocketpa_stage_duration_seconds summary",
+        ]
+        for name, stats, ordered in stages:
+            for q in (0.5, 0.95):
+                lines.append(f'pocketpa_stage_duration_seconds{{stage="{name}",quantile="{q}"}} {_quantile(ordered, q):.6f}')
+            lines.append(f'pocketpa_stage_duration_seconds_sum{{stage="{name}"}} {stats.total_seconds:.6f}')
+            lines.append(f'pocketpa_stage_duration_seconds_count{{stage="{name}"}} {stats.count}')
+        lines += ["# HELP pocketpa_stage_errors_total Spans that ended in an error.",
+                  "# TYPE pocketpa_stage_errors_total counter"]
+        lines += [f'pocketpa_stage_errors_total{{stage="{name}"}} {stats.errors}' for name, stats, _ in stages]
+        lines += ["# HELP pocketpa_tokens_total Tokens reported by the model provider.",
+                  "# TYPE pocketpa_tokens_total counter"]
+        for name, stats, _ in stages:
+            for key in TOKEN_FIELDS:
+                if stats.tokens[key]:
+                    lines.append(f'pocketpa_tokens_total{{stage="{name}",kind="{key[:-7]}"}} {stats.tokens[key]}')
+        lines += ["# HELP pocketpa_prompt_cache_hits_total Calls that read from the prompt cache.",
+                  "# TYPE pocketpa_prompt_cache_hits_total counter"]
+        lines += [f'pocketpa_prompt_cache_hits_total{{stage="{name}"}} {stats.cache_hits}'
+                  for name, stats, _ in stages if stats.cache_hits]
+        return "\n".join(lines) + "\n"
+
+    # --- Metrics endpoint ---
+
+    def serve_metrics(self, port, host="127.0.0.1"):
+        """Serve prometheus_text() at http://host:port/metrics from a daemon thread."""
+        if self._server is not None:
+            return self._server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="pocketpa-metrics", daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer(trace_file=None, metrics_port=None):
+    """
+    The process-wide tracer. Settings are taken from the first call (falling
+    back to POCKETPA_TRACE_FILE / POCKETPA_METRICS_PORT).
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(trace_file if trace_file is not None else DEFAULT_TRACE_FILE)
+            port = metrics_port if metrics_port is not None else DEFAULT_METRICS_PORT
+            if port:
+                try:
+                    _tracer.serve_metrics(port)
+                except OSError as e:
+                    print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+        return _tracer
@@ -0,0 +1,151 @@
+"""
+Worker and session directory shared by the processes on one host.
+
+scripts/serve.py runs several Streamlit workers behind a small router. Each
+browser session must keep talking to the same worker, because its
+conversation lives in that worker's memory. The routers and the launcher
+coordinate only through this SQLite database in WAL mode:
+
+- workers: id, address and a heartbeat, written by the launcher;
+- sessions: which worker each (affinity id, home) pair is pinned to.
+
+Looking up a pinned session is a plain read, which never blocks in WAL mode,
+so routers only take the write lock when a session is first assigned (to the
+live worker with the fewest recent sessions), when its worker has died, or
+when its `last_seen` is refreshed (at most every `touch_interval` seconds).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    address   TEXT NOT NULL,
+    pid       INTEGER NOT NULL DEFAULT 0,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    affinity_id TEXT NOT NULL,
+    home        TEXT NOT NULL,
+    worker_id   TEXT NOT NULL,
+    last_seen   REAL NOT NULL,
+    PRIMARY KEY (affinity_id, home)
+);
+CREATE INDEX IF NOT EXISTS sessions_worker ON sessions (worker_id, last_seen);
+"""
+
+
+class WorkerDirectory:
+    """SQLite-backed registry of live workers and sticky session assignments."""
+
+    def __init__(self, db_path, heartbeat_timeout=15.0, session_ttl=12 * 3600, touch_interval=60.0):
+        self.db_path = db_path
+        self.heartbeat_timeout = heartbeat_timeout
+        self.session_ttl = session_ttl
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def register(self, worker_id, address, pid=0):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO workers (worker_id, address, pid, heartbeat) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET address = excluded.address, pid = excluded.pid, "
+                "heartbeat = excluded.heartbeat",
+                (worker_id, address, pid, time.time())
+            )
+
+    def heartbeat(self, worker_ids):
+        with self._lock:
+            self._conn.executemany("UPDATE workers SET heartbeat = ? WHERE worker_id = ?",
+                                   [(time.time(), worker_id) for worker_id in worker_ids])
+
+    def remove(self, worker_id):
+        """Forget a worker; its sessions move to other workers on their next request."""
+        with self._lock:
+            self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self):
+        """[(worker_id, address)] of workers with a recent heartbeat."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT worker_id, address FROM workers WHERE heartbeat > ? ORDER BY worker_id",
+                (time.time() - self.heartbeat_timeout,)
+            ).fetchall()
+        return rows
+
+    def assign(self, affinity_id, home):
+        """
+        The (worker_id, address) serving this session, pinning it to the
+        least-loaded live worker if it has none. None if no worker is alive.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.worker_id, w.address, s.last_seen FROM sessions s JOIN workers w USING (worker_id) "
+                "WHERE s.affinity_id = ? AND s.home = ? AND w.heartbeat > ?",
+                (affinity_id, home, now - self.heartbeat_timeout)
+            ).fetchone()
+            if row is not None and now - row[2] < self.touch_interval:
+                return row[0], row[1]
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if row is None:
+                    # Re-check inside the write lock: another router may have just assigned it
+                    row = self._pinned(affinity_id, home, now) or self._least_loaded(now)
+                if row is not None:
+                    self._conn.execute(
+                        "INSERT INTO sessions (affinity_id, home, worker_id, last_seen) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (affinity_id, home) DO UPDATE SET worker_id = excluded.worker_id, "
+                        "last_seen = excluded.last_seen",
+                        (affinity_id, home, row[0], now)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return (row[0], row[1]) if row is not None else None
+
+    def expire(self):
+        """Drop sessions idle for longer than `session_ttl`. Returns how many were dropped."""
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE last_seen < ?",
+                                      (time.time() - self.session_ttl,)).rowcount
+
+    def load(self):
+        """{worker_id: sessions seen within session_ttl} for live workers."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT w.worker_id, COUNT(s.affinity_id) FROM workers w "
+                "LEFT JOIN sessions s ON s.worker_id = w.worker_id AND s.last_seen > ? "
+                "WHERE w.heartbeat > ? GROUP BY w.worker_id ORDER BY w.worker_id",
+                (now - self.session_ttl, now - self.heartbeat_timeout)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _pinned(self, affinity_id, home, now):
+        return self._conn.execute(
+            "SELECT s.worker_id, w.address FROM sessions s JOIN workers w USING (worker_id) "
+            "WHERE s.affinity_id = ? AND s.home = ? AND w.heartbeat > ?",
+            (affinity_id, home, now - self.heartbeat_timeout)
+        ).fetchone()
+
+    def _least_loaded(self, now):
+        return self._conn.execute(
+            "SELECT w.worker_id, w.address FROM workers w "
+            "LEFT JOIN sessions s ON s.worker_id = w.worker_id AND s.last_seen > ? "
+            "WHERE w.heartbeat > ? GROUP BY w.worker_id ORDER BY COUNT(s.affinity_id), w.worker_id LIMIT 1",
+            (now - self.session_ttl, now - self.heartbeat_timeout)
+        ).fetchone()
@@ -0,0 +1,79 @@
+"""
+Benchmark: per-turn latency with a cold Anthropic client vs the pooled one.
+
+Runs against a local fake Messages API server, so it needs no API key.
+
+    python scripts/bench_client_pool.py --turns 50 --ttft 0.02
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_llm_server import FakeLLMServer
+from pocketpa.clients import build_anthropic_client
+
+MESSAGES = [{"role": "user", "content": "Marcus threw his plate in the dining room."}]
+
+
+def run_turn(client):
+    client.messages.create(model="fake", max_tokens=256, system="You are PocketPA.", messages=MESSAGES)
+
+
+def bench_cold(server, turns):
+    timings = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        client = build_anthropic_client("test", base_url=server.url)
+        run_turn(client)
+        timings.append(time.perf_counter() - start)
+        client.close()
+    return timings
+
+
+def bench_pooled(server, turns):
+    client = build_anthropic_client("test", base_url=server.url)
+    run_turn(client)  # warm the pool
+    timings = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        run_turn(client)
+        timings.append(time.perf_counter() - start)
+    client.close()
+    return timings
+
+
+def summarise(name, timings, connections):
+    ordered = sorted(timings)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(f"{name:<8} mean {statistics.mean(timings) * 1000:7.2f} ms | "
+          f"p50 {statistics.median(timings) * 1000:7.2f} ms | "
+          f"p95 {p95 * 1000:7.2f} ms | connections {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--ttft", type=float, default=0.0, help="Simulated server latency in seconds")
+    args = parser.parse_args()
+
+    with FakeLLMServer(ttft=args.ttft) as server:
+        before = server.connections
+        cold = bench_cold(server, args.turns)
+        cold_connections = server.connections - before
+
+        before = server.connections
+        pooled = bench_pooled(server, args.turns)
+        pooled_connections = server.connections - before
+
+    print(f"⏱️  {args.turns} turns against {server.url}")
+    summarise("cold", cold, cold_connections)
+    summarise("pooled", pooled, pooled_connections)
+    print(f"Speed-up (p50): {statistics.median(cold) / statistics.median(pooled):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark: precision, recall and speed of the local gap-detection engine.
+
+Runs pocketpa.gap_detection.check_report over a labelled corpus of reports
+(scripts/gap_detection_corpus.jsonl: one {"id", "report", "gaps"} per line,
+where gaps is a list of [field, kind] pairs). A finding counts as a hit when
+both its field and kind match a label.
+
+Ambiguous findings are the ones that would be sent to the model to settle, so
+two sets of scores are reported:
+
+- all: every finding, as if the model confirmed all the ambiguous ones;
+- definite: ambiguous findings left out, as if the model rejected them all.
+
+A real model lands between the two. `fallback_rate` is the share of reports
+that would need a model call at all.
+
+    python scripts/bench_gap_detection.py --output gaps-baseline.json
+    python scripts/bench_gap_detection.py --compare gaps-baseline.json --verbose
+
+With --compare, a drop in any precision or recall, or a p95 check time more
+than --tolerance slower, is reported as a regression and the exit status is 1.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pocketpa.gap_detection import KINDS, check_report
+
+DEFAULT_CORPUS = os.path.join(ROOT, "scripts", "gap_detection_corpus.jsonl")
+DEFAULT_SKILL = os.path.join(ROOT, "skills", "incident-report.md")
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    for case in cases:
+        case["gaps"] = {tuple(gap) for gap in case["gaps"]}
+    return cases
+
+
+def score(hits, false_positives, misses):
+    precision = hits / (hits + false_positives) if hits + false_positives else 1.0
+    recall = hits / (hits + misses) if hits + misses else 1.0
+    return round(precision, 3), round(recall, 3)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--skill", default=DEFAULT_SKILL, help="skill file with the required-fields table")
+    parser.add_argument("--repeat", type=int, default=50, help="checks per report, for the timings")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown of p95 (default 0.5)")
+    parser.add_argument("--verbose", action="store_true", help="list every report the engine got wrong")
+    args = parser.parse_args()
+
+    with open(args.skill, encoding="utf-8") as f:
+        skill_text = f.read()
+    cases = load_corpus(args.corpus)
+
+    counts = {mode: collections.Counter() for mode in ("all", "definite")}
+    per_kind = collections.defaultdict(collections.Counter)
+    timings = []
+    fallbacks = 0
+    for case in cases:
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            report = check_report(case["report"], skill_text)
+            timings.append((time.perf_counter() - started) * 1000)
+        fallbacks += bool(report.ambiguous)
+        found = {
+            "all": {(gap.field, gap.kind) for gap in report.gaps},
+            "definite": {(gap.field, gap.kind) for gap in report.definite},
+        }
+        for mode, predicted in found.items():
+            counts[mode]["hits"] += len(predicted & case["gaps"])
+            counts[mode]["false_positives"] += len(predicted - case["gaps"])
+            counts[mode]["misses"] += len(case["gaps"] - predicted)
+        for field, kind in found["all"] | case["gaps"]:
+            outcome = ("hits" if (field, kind) in case["gaps"] and (field, kind) in found["all"]
+                       else "misses" if (field, kind) in case["gaps"] else "false_positives")
+            per_kind[kind][outcome] += 1
+        if args.verbose and found["all"] != case["gaps"]:
+            print(f"{case['id']}: expected {sorted(case['gaps'])}")
+            for gap in report.gaps:
+                print(f"    found {gap!r}")
+
+    results = {}
+    for mode, counter in counts.items():
+        precision, recall = score(counter["hits"], counter["false_positives"], counter["misses"])
+        results[f"{mode}.precision"] = precision
+        results[f"{mode}.recall"] = recall
+    for kind in KINDS:
+        if per_kind[kind]:
+            precision, recall = score(per_kind[kind]["hits"], per_kind[kind]["false_positives"], per_kind[kind]["misses"])
+            results[f"kind.{kind}.precision"] = precision
+            results[f"kind.{kind}.recall"] = recall
+    results["fallback_rate"] = round(fallbacks / len(cases), 3)
+    results["check_ms.p50"] = round(percentile(timings, 50), 3)
+    results["check_ms.p95"] = round(percentile(timings, 95), 3)
+
+    report = {"meta": {"corpus": os.path.relpath(args.corpus, ROOT), "reports": len(cases),
+                       "labels": sum(len(case["gaps"]) for case in cases)}, "results": results}
+
+    if args.verbose:
+        print()
+    width = max(len(metric) for metric in results)
+    for metric, value in results.items():
+        print(f"{metric:<{width}}  {value}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = []
+        for metric, old in sorted(baseline.items()):
+            new = results.get(metric)
+            if new is None:
+                continue
+            if metric.endswith((".precision", ".recall")) and new < old:
+                regressions.append((metric, old, new))
+            elif metric == "check_ms.p95" and new > old * (1 + args.tolerance):
+                regressions.append((metric, old, new))
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for metric, old, new in regressions:
+                print(f"  {metric}: {old} -> {new}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
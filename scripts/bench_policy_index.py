@@ -0,0 +1,135 @@
+"""
+Benchmark: policy retrieval index on a synthetic policy corpus.
+
+Generates N markdown policy documents (headings, sections, boilerplate and a
+few distinctive facts per section), then measures:
+
+- index build time and size on disk;
+- reopen time (memory-mapped, no rebuild);
+- query latency (p50 / p95) for questions aimed at a known section;
+- retrieval accuracy (target section in the top-k);
+- prompt tokens for the top-k sections versus pasting the best-matching
+  whole document or the whole corpus (~4 characters per token).
+
+    python scripts/bench_policy_index.py --docs 500 --queries 300 --top-k 4
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pocketpa.policy_index import JSON_NAME, PolicyIndex, format_hits
+
+TOPICS = [
+    "Safeguarding", "Incident Reporting", "Medication", "Behaviour Management", "Confidentiality",
+    "Missing from Care", "Restraint", "Complaints", "Health and Safety", "Fire Safety",
+    "Recruitment", "Supervision", "Online Safety", "Education", "Contact with Families",
+]
+SUBTOPICS = [
+    "Purpose", "Scope", "Responsibilities", "Procedure", "Recording", "Escalation", "Timescales",
+    "Training", "Monitoring", "Review", "Definitions", "Legal Framework",
+]
+BOILERPLATE = [
+    "Staff must follow this procedure at all times and seek advice from the shift leader if unsure.",
+    "The registered manager is responsible for ensuring this policy is understood by every team member.",
+    "All records must be accurate, factual, signed and dated, and stored securely in line with data protection law.",
+    "This policy should be read alongside the home's statement of purpose and the children's homes regulations.",
+    "Young people should be involved in decisions that affect them wherever it is safe and appropriate.",
+    "Concerns should be raised promptly so that the right support can be put in place.",
+]
+FACT_WORDS = [
+    "ofsted", "lado", "pharmacist", "gp", "ambulance", "police", "social worker", "body map",
+    "key worker", "night staff", "designated lead", "placing authority", "independent visitor",
+    "advocate", "school", "camhs", "out of hours", "team meeting", "handover", "risk assessment",
+]
+UNITS = ["hours", "days", "minutes", "working days", "weeks"]
+
+
+def synthetic_corpus(directory, docs, seed=11):
+    """Write `docs` policy files; return [(file, heading, fact sentence)] for query generation."""
+    rng = random.Random(seed)
+    targets = []
+    for doc_id in range(docs):
+        topic = TOPICS[doc_id % len(TOPICS)]
+        title = f"{topic} Policy {doc_id}"
+        lines = [f"# {title}", "", rng.choice(BOILERPLATE), ""]
+        for subtopic in rng.sample(SUBTOPICS, rng.randint(6, 10)):
+            a, b = rng.sample(FACT_WORDS, 2)
+            code = f"{topic.split()[0].lower()}{doc_id}x{subtopic.lower()}"
+            fact = (f"For {subtopic.lower()} under procedure {code}, notify the {a} and the {b} "
+                    f"within {rng.randint(1, 72)} {rng.choice(UNITS)}.")
+            paragraphs = [" ".join(rng.choice(BOILERPLATE) for _ in range(3)) for _ in range(2)]
+            lines += [f"## {subtopic}", "", paragraphs[0], "", fact, "", paragraphs[1], ""]
+            targets.append((f"policy-{doc_id:04d}.md", f"{title} > {subtopic}", code, a, b))
+        with open(os.path.join(directory, f"policy-{doc_id:04d}.md"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    return targets
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        policies_dir = os.path.join(tmp, "policies")
+        index_dir = os.path.join(tmp, "index")
+        os.makedirs(policies_dir)
+        targets = synthetic_corpus(policies_dir, args.docs)
+
+        corpus_chars = 0
+        doc_chars = {}
+        for name in os.listdir(policies_dir):
+            size = len(open(os.path.join(policies_dir, name), encoding="utf-8").read())
+            doc_chars[name] = size
+            corpus_chars += size
+
+        started = time.perf_counter()
+        index = PolicyIndex.build(policies_dir, index_dir)
+        build_seconds = time.perf_counter() - started
+        index.close()
+        disk = os.path.getsize(os.path.join(index_dir, JSON_NAME)) + os.path.getsize(index.bin_path)
+
+        started = time.perf_counter()
+        index = PolicyIndex.open(policies_dir, index_dir)
+        open_seconds = time.perf_counter() - started
+
+        rng = random.Random(5)
+        latencies, found, prompt_chars, best_doc_chars = [], 0, [], []
+        for source, heading, code, a, b in rng.sample(targets, min(args.queries, len(targets))):
+            query = f"who do I notify under {code}, the {a} or the {b}?"
+            started = time.perf_counter()
+            hits = index.search(query, k=args.top_k)
+            latencies.append(time.perf_counter() - started)
+            found += any(hit["source"] == source and hit["heading"] == heading for hit in hits)
+            prompt_chars.append(len(format_hits(hits)))
+            best_doc_chars.append(doc_chars[hits[0]["source"]] if hits else 0)
+        index.close()
+
+    n = len(latencies)
+    print(f"Corpus: {args.docs} documents, {len(targets)} sections, ~{corpus_chars // 4:,} tokens")
+    print(f"Build:  {build_seconds * 1000:.0f} ms, {disk / 1024:.0f} KiB on disk")
+    print(f"Reopen: {open_seconds * 1000:.1f} ms (memory-mapped, no rebuild)")
+    print(f"Query:  p50 {percentile(latencies, 50) * 1000:.2f} ms, p95 {percentile(latencies, 95) * 1000:.2f} ms over {n} queries")
+    print(f"Target section in top-{args.top_k}: {found / n:.1%}")
+    avg_prompt = statistics.mean(prompt_chars) / 4
+    avg_doc = statistics.mean(best_doc_chars) / 4
+    print(f"Prompt tokens per query: top-{args.top_k} sections ~{avg_prompt:,.0f} | "
+          f"best whole document ~{avg_doc:,.0f} ({1 - avg_prompt / avg_doc:.0%} saved) | "
+          f"whole corpus ~{corpus_chars / 4:,.0f} ({1 - avg_prompt / (corpus_chars / 4):.2%} saved)")
+
+
+if __name__ == "__main__":
+    main()
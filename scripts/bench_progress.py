@@ -0,0 +1,118 @@
+"""
+Microbenchmark: per-rerun cost of progress extraction over long conversations.
+
+Compares the original full-history scan against the incremental
+ProgressTracker on synthetic conversations, measuring the cost of one
+Streamlit rerun at increasing conversation lengths.
+
+    python scripts/bench_progress.py --turns 200
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pocketpa.progress import ProgressTracker
+
+USER_LINES = [
+    "He threw his plate on the floor in the dining room.",
+    "It happened at about half past twelve, just after lunch.",
+    "Just me and Dave were there, Dave saw the whole thing.",
+    "He was upset before and crying during it, calm now.",
+    "We talked him down and helped him clean up.",
+    "No injuries, just a broken plate and some mess.",
+    "Sorry, I'm a bit flustered, it's been a long shift.",
+]
+ASSISTANT_LINES = [
+    "Thank you, take your time. Could you tell me what happened next?",
+    "I understand this can be stressful. Who else was present?",
+    "Got it. How would you describe his emotional state during the incident?",
+    "Noted. Was anyone hurt, or was there any damage?",
+]
+
+# Message boundaries the incremental scan must handle exactly as the full scan does
+EDGE_CASES = [
+    ["It happened", "at about noon"],
+    ["We sat with the other 123456789012", "Then he went out"],
+    ["Nothing to note", "no", "injuries at all"],
+    ["x" * 40, "calm"],
+]
+
+
+def full_scan(messages):
+    """The original calculate_progress implementation, for comparison."""
+    full_text = " ".join([m['content'].lower() for m in messages])
+    fields = {name: False for name in ["Date/Time", "Location", "Child ID", "Staff Present",
+                                       "Description", "Emotional State", "Action Taken", "Injuries"]}
+    if re.search(r'\b(date|time|happened at|when)\b', full_text): fields["Date/Time"] = True
+    if re.search(r'\b(where|location|room|lounge|garden|bedroom)\b', full_text): fields["Location"] = True
+    if re.search(r'\b(child|resident|who|initials|name|him|her)\b', full_text): fields["Child ID"] = True
+    if re.search(r'\b(staff|witness|present|saw|colleague)\b', full_text): fields["Staff Present"] = True
+    if len(messages) > 4: fields["Description"] = True
+    if re.search(r'\b(emotion|feeling|upset|calm|angry|crying|distressed|happy)\b', full_text): fields["Emotional State"] = True
+    if re.search(r'\b(did|action|intervention|called|helped|comforted|administered)\b', full_text): fields["Action Taken"] = True
+    if re.search(r'\b(hurt|injury|mark|bruise|cut|scratch|wound|no injur)\b', full_text): fields["Injuries"] = True
+    return sum(fields.values()) / len(fields), fields
+
+
+def synthetic_conversation(turns, seed=7):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(turns):
+        messages.append({"role": "user", "content": " ".join(rng.choice(USER_LINES) for _ in range(3))})
+        messages.append({"role": "assistant", "content": rng.choice(ASSISTANT_LINES)})
+    return messages
+
+
+def time_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for texts in EDGE_CASES:
+        conversation = [{"role": "user", "content": text} for text in texts]
+        tracker = ProgressTracker()
+        for end in range(1, len(conversation) + 1):
+            assert tracker.update(conversation[:end]) == full_scan(conversation[:end]), texts
+
+    messages = synthetic_conversation(args.turns)
+    checkpoints = sorted({max(1, args.turns // 20), args.turns // 4, args.turns // 2, args.turns})
+
+    print(f"📈 Per-rerun progress cost over a synthetic {args.turns}-turn conversation")
+    print(f"{'turn':>6} | {'full scan':>12} | {'incremental (new msg)':>22} | {'incremental (no change)':>24}")
+
+    tracker = ProgressTracker()
+    tracker.update(messages[:max(0, 2 * checkpoints[0] - 2)])
+    for turn in checkpoints:
+        history = messages[:2 * turn]
+        assert tracker.update(history) == full_scan(history)
+
+        full = time_call(lambda: full_scan(history), args.repeat)
+
+        # Cost of a rerun right after one new message arrived.
+        def new_message():
+            t = ProgressTracker()
+            t.update(history[:-1])
+            start = time.perf_counter()
+            t.update(history)
+            return time.perf_counter() - start
+        incremental_new = sum(new_message() for _ in range(20)) / 20
+
+        unchanged = time_call(lambda: tracker.update(history), args.repeat)
+        print(f"{turn:>6} | {full * 1e6:>9.1f} µs | {incremental_new * 1e6:>19.1f} µs | {unchanged * 1e6:>21.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: app.py rerun time against chat history length.
+
+Every keystroke-triggered rerun redraws the chat history, so a long session
+gets slower the longer it runs. This seeds a session with N synthetic
+messages (every tenth assistant message a formal report with its PDF
+button) and times reruns with streamlit's AppTest, for each --sizes value:
+
+- rerun_ms p50 / p95: the whole script, as a staff member waits for it;
+- elements: how many elements the rerun produced (what goes to the browser).
+
+    python scripts/bench_render.py --output render-baseline.json
+    python scripts/bench_render.py --compare render-baseline.json
+
+Results are flat {metric: value} JSON, as for bench_replay.py; with
+--compare, reruns slower than --tolerance (and at least --min-ms) are
+reported as regressions.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from bench_replay import compare, git_revision, prepare_workdir
+
+REPORT = """INCIDENT REPORT
+BASIC INFORMATION
+Date: 14/03/2025
+Time: 12:30
+Location: Dining room
+Child: Marcus
+Reporting Staff: Sarah Jones
+
+INCIDENT DESCRIPTION
+Report {number}: Marcus threw his plate on the floor during lunch and shouted at the other young people.
+
+I've prepared your incident report. Please review it carefully."""
+
+
+def synthetic_history(count):
+    messages = []
+    for index in range(count):
+        if index % 2 == 0:
+            messages.append({"role": "user", "content": f"Message {index}: he threw the plate at about half twelve."})
+        elif index % 20 == 19:
+            messages.append({"role": "assistant", "content": REPORT.format(number=index)})
+        else:
+            messages.append({"role": "assistant", "content": f"Thanks. Reply {index}: who else was in the dining room?"})
+    return messages
+
+
+def count_elements(node):
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return 1 + sum(count_elements(child) for child in children.values())
+
+
+def measure(size, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.secrets["ANTHROPIC_API_KEY"] = "bench"
+    at.secrets["SPECULATE_AT_PROGRESS"] = 2.0
+    at.session_state["messages"] = synthetic_history(size)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].value}")
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, count_elements(at._tree)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,50,200", help="comma-separated history lengths")
+    parser.add_argument("--reruns", type=int, default=20, help="timed reruns per size")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir)
+        os.chdir(workdir)
+        for size in [int(size) for size in args.sizes.split(",")]:
+            timings, elements = measure(size, args.reruns)
+            results[f"history_{size}.rerun_ms.p50"] = round(percentile(timings, 50), 1)
+            results[f"history_{size}.rerun_ms.p95"] = round(percentile(timings, 95), 1)
+            results[f"history_{size}.elements"] = elements
+            print(f"{size:>5} messages: rerun p50 {results[f'history_{size}.rerun_ms.p50']} ms, "
+                  f"p95 {results[f'history_{size}.rerun_ms.p95']} ms, {elements} elements")
+
+    report = {"meta": {"revision": git_revision(), "reruns": args.reruns}, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.tolerance, args.min_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for metric, old, new in regressions:
+                print(f"  {metric}: {old} -> {new}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""
+Benchmark: replay recorded conversations offline, through both entry points.
+
+Each recording is replayed turn by turn against a deterministic fake LLM that
+answers with the recorded assistant reply, after a time-to-first-token and
+token rate taken from a latency profile. Nothing touches the network.
+
+- streamlit: app.py under streamlit's AppTest, one session per recording,
+  against the fake Messages API server (scripts/fake_llm_server.py);
+- chief: PocketPAChiefOfStaff.chat() with an in-process fake Gemini model;
+- local: the app's local work per turn (routing, progress, draft journal)
+  and a PDF of the final transcript, timed on their own.
+
+For each path it reports end-to-end turn latency, the part of it spent in
+local code (turn time minus time inside the fake model), tokens sent and
+received per turn, and the per-stage p50s recorded by pocketpa.tracing.
+
+Recordings default to memory/staff-contexts/*/conversation.json. A staff
+folder (or its turns/ memory store) is replayed from the store. JSONL files
+are accepted too: lines with role/content are one conversation, lines with
+a "messages" list are one conversation each, and any other line with a
+"body" or "text" (e.g. a requests.jsonl) becomes a user turn with no
+recorded reply.
+
+Results are written as flat JSON so runs can be compared:
+
+    python scripts/bench_replay.py --profile typical --output replay-baseline.json
+    python scripts/bench_replay.py --profile typical --compare replay-baseline.json
+
+With --compare, token counts that grew at all, or timings that grew by more
+than --tolerance (and at least --min-ms), are reported as regressions and the
+exit status is 1.
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from fake_llm_server import DEFAULT_REPLY, FakeLLMServer, estimate_tokens
+from pocketpa.admission import AdmissionController
+from pocketpa.drafts import DraftJournal
+from pocketpa.memory_store import STORE_DIR, StaffMemory
+from pocketpa.pdf import create_pdf_report
+from pocketpa.progress import ProgressTracker
+from pocketpa.routing import LocalRouter
+from pocketpa.skills import get_skill_registry
+from pocketpa.tracing import get_tracer
+
+# name -> (time to first token in seconds, output tokens per second; 0 = instant)
+PROFILES = {
+    "instant": (0.0, 0.0),
+    "fast": (0.05, 400.0),
+    "typical": (0.4, 80.0),
+    "slow": (1.5, 30.0),
+}
+PATHS = ("streamlit", "chief", "local")
+DEFAULT_RECORDINGS = os.path.join(ROOT, "memory", "staff-contexts", "*", "conversation.json")
+# Files app.py and the Chief of Staff read from the working directory
+APP_FILES = ("AGENTS.md", "TABLE-OF-CONTENTS.md", "settings.json", "skills", "policies", "help")
+# Required documents a checkout may not have (AGENTS.md is not committed); stand-ins are written
+STUB_FILES = {"AGENTS.md": "# PocketPA\n\nStand-in agent instructions for benchmarking.\n"}
+# The fake model has no rate limits; keep the admission controllers out of the timings
+UNLIMITED = 10 ** 9
+ROUTING_MARKER = "You are the Chief of Staff for PocketPA"
+REPORT_MARKERS = ("INCIDENT RECORD", "Please generate the incident report")
+REPORT_REPLY = """INCIDENT REPORT
+BASIC INFORMATION
+Date: 01/01/2025
+Time: 12:30
+Location: Dining room
+Child: Marcus
+Reporting Staff: Demo Staff
+Report ID: INC-20250101-0000
+
+INCIDENT DESCRIPTION
+Marcus threw his plate on the floor at lunch.
+
+CHILD'S EMOTIONAL STATE
+Before: Settled
+During: Angry
+After: Calm
+
+IMMEDIATE ACTION TAKEN
+Verbal de-escalation.
+
+INJURIES / DAMAGE
+None reported
+
+FOLLOW-UP REQUIRED
+No
+
+COMPLIANCE NOTES
+None.
+
+Report Generated: 01/01/2025 12:45
+Status: AWAITING STAFF APPROVAL"""
+
+
+# --- Recordings ---
+
+def load_recordings(patterns):
+    """Return [(name, [(user text, recorded reply or None), ...])] from the given files."""
+    recordings = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            name = os.path.relpath(path, ROOT)
+            if os.path.isdir(path):
+                store = StaffMemory(os.path.dirname(path) if os.path.basename(path) == STORE_DIR else path)
+                recordings.append((name, to_turns(store.iter_messages())))
+                store.close()
+            elif path.endswith(".jsonl"):
+                with open(path, encoding="utf-8") as f:
+                    lines = [json.loads(line) for line in f if line.strip()]
+                messages, prompts = [], []
+                for index, line in enumerate(lines):
+                    if isinstance(line.get("messages"), list):
+                        recordings.append((f"{name}:{index + 1}", to_turns(line["messages"])))
+                    elif "role" in line and "content" in line:
+                        messages.append(line)
+                    elif line.get("body") or line.get("text"):
+                        prompts.append({"role": "user", "content": line.get("body") or line.get("text")})
+                for conversation in (messages, prompts):
+                    if conversation:
+                        recordings.append((name, to_turns(conversation)))
+            else:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                recordings.append((name, to_turns(data["messages"] if isinstance(data, dict) else data)))
+    return [(name, turns) for name, turns in recordings if turns]
+
+
+def to_turns(messages):
+    """Pair each user message with the assistant reply that followed it."""
+    turns = []
+    for msg in messages:
+        if msg.get("role") == "user":
+            turns.append([msg.get("content", ""), None])
+        elif msg.get("role") == "assistant" and turns and turns[-1][1] is None:
+            turns[-1][1] = msg.get("content", "")
+    return [(text, reply) for text, reply in turns if text]
+
+
+class ReplayScript:
+    """Recorded replies, looked up by the user message they answered."""
+
+    def __init__(self, recordings):
+        self.replies = collections.defaultdict(collections.deque)
+        for _, turns in recordings:
+            for text, reply in turns:
+                self.replies[text].append(reply or DEFAULT_REPLY)
+
+    def reply(self, user_text):
+        queue = self.replies.get(user_text)
+        if not queue:
+            return DEFAULT_REPLY
+        reply = queue[0]
+        if len(queue) > 1:
+            queue.rotate(-1)
+        return reply
+
+    def responder(self, body):
+        """fake_llm_server responder: the recorded reply for the request's last user message."""
+        messages = body.get("messages") or [{}]
+        content = messages[-1].get("content", "")
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") for block in content)
+        if any(marker in content for marker in REPORT_MARKERS):
+            return REPORT_REPLY
+        return self.reply(content)
+
+
+# --- Fake Gemini model for the Chief of Staff ---
+
+class FakeGeminiModel:
+    """generate_content()/generate_content_async() with recorded replies and a latency profile."""
+
+    def __init__(self, script, ttft=0.0, tokens_per_second=0.0):
+        self.script = script
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.busy_seconds = 0.0
+
+    def _respond(self, prompt):
+        parts = prompt if isinstance(prompt, list) else [prompt]
+        text = "\n".join(parts)
+        if ROUTING_MARKER in parts[0]:
+            reply = "incident-report"
+        else:
+            marker = 'USER\'S LATEST MESSAGE: "'
+            user_text = text[text.rfind(marker) + len(marker):].split('"\n')[0] if marker in text else ""
+            reply = self.script.reply(user_text)
+        usage = SimpleNamespace(
+            prompt_token_count=estimate_tokens(text),
+            candidates_token_count=estimate_tokens(reply),
+            cached_content_token_count=0,
+        )
+        self.input_tokens += usage.prompt_token_count
+        self.output_tokens += usage.candidates_token_count
+        delay = self.ttft + (usage.candidates_token_count / self.tokens_per_second if self.tokens_per_second else 0)
+        return SimpleNamespace(text=reply, usage_metadata=usage), delay
+
+    def generate_content(self, prompt):
+        response, delay = self._respond(prompt)
+        started = time.perf_counter()
+        if delay:
+            time.sleep(delay)
+        self.busy_seconds += time.perf_counter() - started
+        return response
+
+    async def generate_content_async(self, prompt):
+        response, delay = self._respond(prompt)
+        started = time.perf_counter()
+        if delay:
+            await asyncio.sleep(delay)
+        self.busy_seconds += time.perf_counter() - started
+        return response
+
+
+# --- Paths ---
+
+def replay_streamlit(recordings, script, workdir, profile, speculate):
+    from streamlit.testing.v1 import AppTest
+
+    ttft, tps = profile
+    samples = Samples()
+    with FakeLLMServer(ttft=ttft, tokens_per_second=tps, responder=script.responder) as server:
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+        for _, turns in recordings:
+            at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+            at.secrets["ANTHROPIC_API_KEY"] = "replay"
+            at.secrets["ANTHROPIC_REQUESTS_PER_MINUTE"] = UNLIMITED
+            at.secrets["ANTHROPIC_TOKENS_PER_MINUTE"] = UNLIMITED
+            if not speculate:
+                at.secrets["SPECULATE_AT_PROGRESS"] = 2.0
+            started = time.perf_counter()
+            at.run()
+            samples.add("load_ms", (time.perf_counter() - started) * 1000)
+            for text, _ in turns:
+                before = (server.busy_seconds, server.input_tokens, server.output_tokens)
+                started = time.perf_counter()
+                at.chat_input[0].set_value(text).run()
+                elapsed = time.perf_counter() - started
+                if at.exception:
+                    raise RuntimeError(f"app.py raised during replay: {at.exception[0].value}")
+                samples.turn(elapsed, server.busy_seconds - before[0],
+                             server.input_tokens - before[1], server.output_tokens - before[2])
+    return samples
+
+
+def replay_chief(recordings, script, profile, workdir):
+    import main
+
+    model = FakeGeminiModel(script, *profile)
+    admission = AdmissionController(requests_per_minute=UNLIMITED, tokens_per_minute=UNLIMITED)
+    pa = main.PocketPAChiefOfStaff(model=model, admission=admission, base_path=workdir)
+    samples = Samples()
+    for _, turns in recordings:
+        history = []
+        for text, _ in turns:
+            before = (model.busy_seconds, model.input_tokens, model.output_tokens)
+            started = time.perf_counter()
+            pa.chat(text, history)
+            samples.turn(time.perf_counter() - started, model.busy_seconds - before[0],
+                         model.input_tokens - before[1], model.output_tokens - before[2])
+    samples.counts["routed_locally"] = pa.router.stats["local"]
+    samples.counts["routed_by_llm"] = pa.router.stats["llm"]
+    return samples
+
+
+def replay_local(recordings, workdir):
+    """Time the per-turn local work the app does around each model call."""
+    # Built here rather than taken from a chief run, so --paths local works on its own
+    router = LocalRouter(get_skill_registry(workdir).triggers())
+    samples = Samples()
+    for _, turns in recordings:
+        tracker = ProgressTracker()
+        journal = DraftJournal(uuid.uuid4().hex, os.path.join(workdir, "memory", "drafts"))
+        messages = []
+        for text, reply in turns:
+            messages.append({"role": "user", "content": text})
+            samples.timed("routing_ms", router.route, text, messages)
+            messages.append({"role": "assistant", "content": reply or DEFAULT_REPLY})
+            samples.timed("progress_ms", tracker.update, messages)
+            samples.timed("persistence_ms", journal.sync, messages)
+        transcript = "\n\n".join(f"[{m['role'].upper()}] {m['content']}" for m in messages)
+        samples.timed("pdf_ms", create_pdf_report, REPORT_REPLY + "\n\n" + transcript)
+        journal.discard()
+    return samples
+
+
+class Samples:
+    """Per-turn measurements for one path."""
+
+    def __init__(self):
+        self.values = collections.defaultdict(list)
+        self.counts = collections.Counter()
+
+    def add(self, name, value):
+        self.values[name].append(value)
+
+    def timed(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.add(name, (time.perf_counter() - started) * 1000)
+        return result
+
+    def turn(self, elapsed, model_seconds, input_tokens, output_tokens):
+        self.add("turn_ms", elapsed * 1000)
+        self.add("local_ms", max(0.0, elapsed - model_seconds) * 1000)
+        self.counts["turns"] += 1
+        self.counts["input_tokens"] += input_tokens
+        self.counts["output_tokens"] += output_tokens
+
+    def results(self, prefix):
+        flat = {}
+        for name, values in sorted(self.values.items()):
+            flat[f"{prefix}.{name}.p50"] = round(percentile(values, 50), 3)
+            flat[f"{prefix}.{name}.p95"] = round(percentile(values, 95), 3)
+            flat[f"{prefix}.{name}.mean"] = round(statistics.mean(values), 3)
+        turns = self.counts.get("turns")
+        for name, value in sorted(self.counts.items()):
+            flat[f"{prefix}.{name}"] = value
+            if turns and name.endswith("_tokens"):
+                flat[f"{prefix}.{name}_per_turn"] = round(value / turns, 1)
+        return flat
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# --- Results ---
+
+def prepare_workdir(workdir):
+    """Give the app a copy of the skills and documents, and empty memory directories."""
+    for name in APP_FILES:
+        source = os.path.join(ROOT, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(workdir, name))
+        elif os.path.exists(source):
+            shutil.copy(source, workdir)
+        elif name in STUB_FILES:
+            with open(os.path.join(workdir, name), "w", encoding="utf-8") as f:
+                f.write(STUB_FILES[name])
+    os.makedirs(os.path.join(workdir, "memory", "staff-contexts"))
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """Return [(metric, old, new)] for metrics that got worse than the baseline allows."""
+    regressions = []
+    for metric, old in sorted(baseline.items()):
+        new = results.get(metric)
+        if new is None or not isinstance(old, (int, float)):
+            continue
+        if "_tokens" in metric:
+            worse = new > old
+        elif "_ms." in metric:
+            worse = new > old * (1 + tolerance) and new - old >= min_ms
+        else:
+            continue
+        if worse:
+            regressions.append((metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="*", default=[DEFAULT_RECORDINGS])
+    parser.add_argument("--paths", default=",".join(PATHS), help=f"comma-separated subset of {', '.join(PATHS)}")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant")
+    parser.add_argument("--repeat", type=int, default=1, help="replay every recording this many times")
+    parser.add_argument("--speculate", action="store_true", help="let the app pre-draft reports in the background")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--verbose", action="store_true", help="show the Chief of Staff's per-turn output")
+    args = parser.parse_args()
+
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"unknown path(s): {', '.join(sorted(unknown))}")
+    recordings = load_recordings(args.recordings) * args.repeat
+    if not recordings:
+        parser.error("no recorded conversations found")
+    script = ReplayScript(recordings)
+    profile = PROFILES[args.profile]
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir)
+        os.chdir(workdir)
+        try:
+            if "chief" in paths:
+                with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, "w")):
+                    results.update(replay_chief(recordings, script, profile, workdir).results("chief"))
+            if "local" in paths:
+                results.update(replay_local(recordings, workdir).results("local"))
+            if "streamlit" in paths:
+                results.update(replay_streamlit(recordings, script, workdir, profile, args.speculate).results("streamlit"))
+        finally:
+            os.chdir(cwd)
+
+    for stage, row in get_tracer().summary().items():
+        results[f"stage.{stage}_ms.p50"] = row["p50_ms"]
+        results[f"stage.{stage}_ms.p95"] = row["p95_ms"]
+
+    report = {
+        "meta": {
+            "commit": git_revision(),
+            "python": platform.python_version(),
+            "profile": args.profile,
+            "ttft": profile[0],
+            "tokens_per_second": profile[1],
+            "recordings": len(recordings),
+            "turns": sum(len(turns) for _, turns in recordings),
+            "paths": paths,
+            "speculate": args.speculate,
+        },
+        "results": results,
+    }
+
+    width = max(len(metric) for metric in results)
+    for metric, value in results.items():
+        print(f"{metric:<{width}}  {value}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("profile") != args.profile:
+            print(f"⚠️ Baseline used profile '{baseline.get('meta', {}).get('profile')}', this run '{args.profile}'")
+        regressions = compare(results, baseline.get("results", {}), args.tolerance, args.min_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for metric, old, new in regressions:
+                print(f"  {metric}: {old} -> {new}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: hit rate, wrong answers and latency of the skill response cache.
+
+Generates a stream of policy questions from groups of paraphrases (one group
+per topic and aspect, e.g. "restraint" x "reporting rule"), drawn with a
+skewed popularity so some questions are asked far more often than others,
+and replays it through a ResponseCache as the Chief of Staff would: look up,
+and store the reply on a miss. Reports:
+
+- hit rate, against the ceiling of questions whose group was asked before;
+- wrong hits (a reply served from a different group) - this must stay 0;
+- lookup latency (p50 / p95) for hits and misses with the cache full.
+
+    python scripts/bench_response_cache.py --queries 5000 --threshold 0.9
+    python scripts/bench_response_cache.py --embedding-model all-MiniLM-L6-v2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pocketpa.policy_index import load_embedder
+from pocketpa.response_cache import ResponseCache
+
+TOPICS = [
+    "restraint", "medication error", "missing from care", "body map", "self-harm", "allegation against staff",
+    "online safety", "family contact", "fire drill", "room search", "sanctions", "bullying",
+]
+ASPECTS = ["reporting rule", "notification timescale", "recording requirement", "who to inform", "training requirement"]
+TEMPLATES = [
+    "What's the {topic} {aspect}?",
+    "what is the {aspect} for {topic}",
+    "{topic} {aspect}?",
+    "What is the {aspect} on {topic}?",
+    "Can you remind me of the {aspect} for {topic}?",
+    "whats the {aspect} for {topic} again",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def question_stream(count, seed=3):
+    """[(group, question)] with Zipf-like group popularity."""
+    rng = random.Random(seed)
+    groups = [(topic, aspect) for topic in TOPICS for aspect in ASPECTS]
+    rng.shuffle(groups)
+    weights = [1 / rank for rank in range(1, len(groups) + 1)]
+    stream = []
+    for group in rng.choices(groups, weights, k=count):
+        template = rng.choice(TEMPLATES)
+        stream.append((group, template.format(topic=group[0], aspect=group[1])))
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--max-entries", type=int, default=512)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--embedding-model", default="", help="sentence-transformers model for similarity (default: word overlap)")
+    args = parser.parse_args()
+
+    embedder = load_embedder(args.embedding_model) if args.embedding_model else None
+    if args.embedding_model and embedder is None:
+        sys.exit("sentence-transformers is not installed")
+    cache = ResponseCache(max_entries=args.max_entries, threshold=args.threshold, embedder=embedder)
+
+    seen, ceiling, wrong = set(), 0, 0
+    hit_ms, miss_ms = [], []
+    for group, question in question_stream(args.queries):
+        ceiling += group in seen
+        seen.add(group)
+        started = time.perf_counter()
+        reply = cache.get("policy-query", question, version=1)
+        elapsed = (time.perf_counter() - started) * 1000
+        if reply is None:
+            miss_ms.append(elapsed)
+            cache.put("policy-query", question, 1, repr(group))
+        else:
+            hit_ms.append(elapsed)
+            wrong += reply != repr(group)
+
+    n = args.queries
+    similarity = f"embeddings ({args.embedding_model})" if embedder else "word overlap"
+    print(f"Stream: {n} questions over {len(seen)} topics, {similarity}, threshold {args.threshold}")
+    print(f"Hit rate:   {cache.hit_rate:.1%} (ceiling {ceiling / n:.1%}: questions whose topic was asked before)")
+    print(f"Wrong hits: {wrong} ({wrong / n:.2%})")
+    print(f"Hit:  p50 {percentile(hit_ms, 50):.3f} ms, p95 {percentile(hit_ms, 95):.3f} ms over {len(hit_ms)}")
+    print(f"Miss: p50 {percentile(miss_ms, 50):.3f} ms, p95 {percentile(miss_ms, 95):.3f} ms over {len(miss_ms)}")
+    print(f"Entries: {len(cache)} of {args.max_entries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark: cold start and rerun time, with an import-time breakdown.
+
+Each target is started in a fresh interpreter under `python -X importtime`,
+so nothing is warm from a previous run:
+
+- app: import streamlit's AppTest, run app.py once (cold start: what the
+  first visitor after a deploy waits for), then rerun it --reruns times with
+  no input, which is the work every widget interaction repeats;
+- chief: import scripts/main.py and construct the PocketPAChiefOfStaff.
+
+From the -X importtime log it reports the time the target spent importing
+(interpreter start-up and the benchmark's own imports are left out) and the
+top-level modules that took longest, and which of the heavy, only-sometimes
+needed modules (the Anthropic and Gemini SDKs, fpdf, sentence-transformers)
+were loaded eagerly. Those should only appear once a turn actually needs them.
+
+    python scripts/bench_startup.py --output startup-baseline.json
+    python scripts/bench_startup.py --compare startup-baseline.json
+
+With --compare, timings that grew by more than --tolerance (and at least
+--min-ms) and heavy modules that are now loaded at startup are reported as
+regressions and the exit status is 1. -X importtime itself adds a little to
+every import, so compare runs with each other rather than with `streamlit run`.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+TARGETS = ("app", "chief")
+# Modules that only some turns need; none of them should be imported at startup
+HEAVY_MODULES = ("anthropic", "google.generativeai", "fpdf", "sentence_transformers", "http.server")
+RESULT_MARKER = "BENCH_STARTUP "
+# Written to the importtime log (stderr) once the benchmark's own imports are done
+BEGIN_MARKER = "BENCH_STARTUP_BEGIN"
+
+
+# --- Child process (one cold start) ---
+
+def child_app(reruns):
+    from streamlit.testing.v1 import AppTest
+
+    timings = {"import_ms": (time.perf_counter() - STARTED) * 1000}
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.secrets["ANTHROPIC_API_KEY"] = "bench"
+    at.secrets["SPECULATE_AT_PROGRESS"] = 2.0
+    started = time.perf_counter()
+    at.run()
+    timings["first_run_ms"] = (time.perf_counter() - started) * 1000
+    if at.exception:
+        raise RuntimeError(f"app.py raised on startup: {at.exception[0].value}")
+    rerun_ms = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        rerun_ms.append((time.perf_counter() - started) * 1000)
+    timings["rerun_ms"] = rerun_ms
+    return timings
+
+
+def child_chief(reruns):
+    import main
+
+    timings = {"import_ms": (time.perf_counter() - STARTED) * 1000}
+    started = time.perf_counter()
+    # Like the app, read skills and documents from the prepared working directory
+    main.PocketPAChiefOfStaff(base_path=os.getcwd())
+    timings["first_run_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def run_child(target, reruns):
+    print(BEGIN_MARKER, file=sys.stderr, flush=True)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        timings = CHILDREN[target](reruns)
+    timings["loaded"] = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(RESULT_MARKER + json.dumps(timings))
+
+
+CHILDREN = {"app": child_app, "chief": child_chief}
+STARTED = time.perf_counter()
+
+
+# --- Parent ---
+
+def parse_importtime(log):
+    """Return ({top-level module: cumulative ms}, total self ms) from a -X importtime log."""
+    top_level = {}
+    total_us = 0
+    for line in log.partition(BEGIN_MARKER)[2].splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <name, indented two spaces per nesting level>"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        total_us += int(self_us)
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = top_level.get(name.strip(), 0) + int(cumulative_us) / 1000
+    return top_level, total_us / 1000
+
+
+def cold_start(target, workdir, reruns):
+    """Start `target` in a fresh interpreter; return (wall ms, child timings, importtime log)."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", target, "--reruns", str(reruns)],
+        cwd=workdir, capture_output=True, text=True, timeout=600
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    lines = [line for line in proc.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+    if proc.returncode != 0 or not lines:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"{target} failed to start:\n" + "\n".join(errors[-20:]))
+    return wall_ms, json.loads(lines[-1][len(RESULT_MARKER):]), proc.stderr
+
+
+def measure(target, workdir, runs, reruns, top):
+    """Median timings over `runs` cold starts of `target`, as flat results."""
+    samples = {"cold_start": [], "imports": [], "first_run": []}
+    modules = {}
+    rerun_ms = []
+    loaded = set()
+    for _ in range(runs):
+        wall_ms, timings, log = cold_start(target, workdir, reruns)
+        top_level, import_ms = parse_importtime(log)
+        samples["cold_start"].append(wall_ms)
+        samples["imports"].append(import_ms)
+        samples["first_run"].append(timings["first_run_ms"])
+        rerun_ms += timings.get("rerun_ms", [])
+        loaded.update(timings["loaded"])
+        for name, ms in top_level.items():
+            modules.setdefault(name, []).append(ms)
+
+    results = {f"{target}.startup_ms.{name}": round(statistics.median(values), 1) for name, values in samples.items()}
+    if rerun_ms:
+        results[f"{target}.rerun_ms.p50"] = round(percentile(rerun_ms, 50), 1)
+        results[f"{target}.rerun_ms.p95"] = round(percentile(rerun_ms, 95), 1)
+    slowest = sorted(modules.items(), key=lambda item: -statistics.median(item[1]))[:top]
+    for name, values in slowest:
+        results[f"{target}.import_ms.{name}"] = round(statistics.median(values), 1)
+    results[f"{target}.eager_modules"] = sorted(loaded)
+    return results
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"comma-separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per target; medians are reported")
+    parser.add_argument("--reruns", type=int, default=20, help="app reruns timed after each cold start")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to report")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument("--min-ms", type=float, default=20.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--child", choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.reruns)
+        return
+
+    from bench_replay import compare, git_revision, prepare_workdir
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir)
+        for target in targets:
+            results.update(measure(target, workdir, args.runs, args.reruns, args.top))
+
+    report = {
+        "meta": {
+            "commit": git_revision(),
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "reruns": args.reruns,
+            "targets": targets,
+        },
+        "results": results,
+    }
+
+    width = max(len(metric) for metric in results)
+    for metric, value in results.items():
+        print(f"{metric:<{width}}  {value}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.tolerance, args.min_ms)
+        for metric, modules in results.items():
+            if metric.endswith(".eager_modules") and metric in baseline:
+                newly_eager = sorted(set(modules) - set(baseline[metric]))
+                if newly_eager:
+                    regressions.append((metric, baseline[metric], modules))
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for metric, old, new in regressions:
+                print(f"  {metric}: {old} -> {new}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Export saved reports as PDFs: one ZIP, or one merged PDF with a contents page.
+
+Reports are selected from the Past Reports index by date range, child and
+staff member (formal reports only, unless --all-kinds). The ZIP is rendered
+across a process pool; compare --workers 1 with the default (one per core) to
+see the speed-up.
+
+    python scripts/export_reports.py --child Marcus --from 2025-01-01 --to 2025-03-31 --out marcus-q1.zip
+    python scripts/export_reports.py --staff Dave --format pdf --out dave.pdf
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pocketpa.export import export_merged_pdf, export_zip, report_heading
+from pocketpa.report_index import KIND_FORMAL, ReportIndex
+from pocketpa.tenancy import DEFAULT_HOME, HomeStorage
+
+MEMORY_ROOT = os.path.join(ROOT, "memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="date_from", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="last day, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--child")
+    parser.add_argument("--staff")
+    parser.add_argument("--all-kinds", action="store_true", help="include conversation logs")
+    parser.add_argument("--format", choices=("zip", "pdf"), default="zip")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--workers", type=int, help="render processes for --format zip (default: one per core)")
+    parser.add_argument("--home", default=DEFAULT_HOME, help="care home to export from")
+    parser.add_argument("--reports-dir", help="default: the home's staff-contexts/ folder")
+    parser.add_argument("--index", help="default: the home's report-index.sqlite3")
+    args = parser.parse_args()
+
+    storage = HomeStorage(MEMORY_ROOT, args.home)
+    index = ReportIndex(args.index or storage.report_index_path, args.reports_dir or storage.reports_dir)
+    index.ensure_built()
+    filters = dict(kind=None if args.all_kinds else KIND_FORMAL, child=args.child, staff=args.staff,
+                   date_from=args.date_from, date_to=args.date_to)
+    rows = index.search(limit=index.count(**filters), **filters)
+    index.close()
+    if not rows:
+        sys.exit("No reports match.")
+    rows.reverse()  # oldest first reads better in an export
+
+    started = time.perf_counter()
+    if args.format == "zip":
+        export_zip([row["path"] for row in rows], args.out, workers=args.workers)
+    else:
+        export_merged_pdf([(report_heading(row), row["path"]) for row in rows], args.out)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {len(rows)} report(s) to {args.out} ({os.path.getsize(args.out) / 1024:.0f} KiB) "
+          f"in {elapsed:.2f}s - {len(rows) / elapsed:.1f} reports/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Local stand-in for the Anthropic Messages API, used by the benchmark scripts.
+
+Serves `POST /v1/messages` (plain JSON or SSE streaming) over HTTP/1.1 with
+keep-alive, with a configurable time-to-first-token and token rate so results
+are deterministic and never touch the network. A minimal Message Batches API
+(create, retrieve, results) is served too; a batch reports "ended" once
+`batch_delay` seconds have passed.
+"""
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Thank you, I've noted that. What time did this happen?"
+
+
+def default_responder(body):
+    """Return the reply text for a request body."""
+    return DEFAULT_REPLY
+
+
+class FakeLLMServer:
+    """
+    Threaded fake Messages API server.
+
+    Usage:
+        with FakeLLMServer(ttft=0.05, tokens_per_second=200) as server:
+            client = anthropic.Anthropic(api_key="test", base_url=server.url)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, ttft=0.0, tokens_per_second=0.0, responder=None, batch_delay=0.0):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.responder = responder or default_responder
+        self.batch_delay = batch_delay
+        self.batches = {}
+        self.requests = 0
+        self.connections = 0
+        # Totals for benchmarks: tokens sent and returned, and time spent answering
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, attr, amount=1):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + amount)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; with Nagle's algorithm
+            # on, each keep-alive response stalls ~40 ms waiting on a delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                server._count("connections")
+
+            def do_POST(self):
+                started = time.perf_counter()
+                try:
+                    self._handle_post()
+                finally:
+                    server._count("busy_seconds", time.perf_counter() - started)
+
+            def _handle_post(self):
+                length = int(self.headers.get("content-length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server._count("requests")
+
+                if self.path.startswith("/v1/messages/batches"):
+                    self._send_json(200, server._create_batch(body))
+                    return
+                if not self.path.startswith("/v1/messages"):
+                    self._not_found()
+                    return
+
+                text = server.responder(body)
+                tokens = split_tokens(text)
+                usage = request_usage(body, tokens)
+                server._count("input_tokens", usage["input_tokens"])
+                server._count("output_tokens", usage["output_tokens"])
+
+                if server.ttft:
+                    time.sleep(server.ttft)
+
+                if body.get("stream"):
+                    self._stream(tokens, usage, body.get("model", "fake"))
+                else:
+                    if server.tokens_per_second:
+                        time.sleep(len(tokens) / server.tokens_per_second)
+                    self._send_json(200, message_payload(text, usage, body.get("model", "fake")))
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                batch = server.batches.get(parts[3]) if parts[:3] == ["v1", "messages", "batches"] and len(parts) > 3 else None
+                if batch is None:
+                    self._not_found()
+                elif len(parts) == 4:
+                    self._send_json(200, server._batch_payload(batch))
+                elif parts[4:] == ["results"] and server._batch_ended(batch):
+                    data = "".join(json.dumps(line) + "\n" for line in batch["results"]).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("content-type", "application/binary")
+                    self.send_header("content-length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self._not_found()
+
+            def _not_found(self):
+                self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _event(self, name, data):
+                chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+
+            def _stream(self, tokens, usage, model):
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+
+                start = message_payload("", usage, model)
+                start["content"] = []
+                start["stop_reason"] = None
+                self._event("message_start", {"type": "message_start", "message": start})
+                self._event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+                delay = 1.0 / server.tokens_per_second if server.tokens_per_second else 0
+                for token in tokens:
+                    if delay:
+                        time.sleep(delay)
+                    self._event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}})
+                self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+                self._event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": usage["output_tokens"]}})
+                self._event("message_stop", {"type": "message_stop"})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    # --- Message Batches ---
+
+    def _create_batch(self, body):
+        results = []
+        for request in body.get("requests", []):
+            params = request.get("params", {})
+            text = self.responder(params)
+            usage = request_usage(params, split_tokens(text))
+            self._count("input_tokens", usage["input_tokens"])
+            self._count("output_tokens", usage["output_tokens"])
+            results.append({
+                "custom_id": request.get("custom_id"),
+                "result": {"type": "succeeded", "message": message_payload(text, usage, params.get("model", "fake"))},
+            })
+        batch = {"id": f"msgbatch_{uuid.uuid4().hex[:24]}", "created_at": datetime.now(timezone.utc), "results": results}
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        return self._batch_payload(batch)
+
+    def _batch_ended(self, batch):
+        return datetime.now(timezone.utc) >= batch["created_at"] + timedelta(seconds=self.batch_delay)
+
+    def _batch_payload(self, batch):
+        ended = self._batch_ended(batch)
+        count = len(batch["results"])
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else count, "succeeded": count if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": batch["created_at"].isoformat(),
+            "expires_at": (batch["created_at"] + timedelta(days=1)).isoformat(),
+            "ended_at": (batch["created_at"] + timedelta(seconds=self.batch_delay)).isoformat() if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+
+def request_usage(body, tokens):
+    """Usage block for a request body and its reply tokens."""
+    return {
+        "input_tokens": estimate_tokens(json.dumps(body.get("system", ""))) + estimate_tokens(json.dumps(body.get("messages", []))),
+        "output_tokens": len(tokens),
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+
+
+def split_tokens(text):
+    """Split text into pseudo-tokens of roughly four characters."""
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def message_payload(text, usage, model):
+    return {
+        "id": "msg_fake",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": usage,
+    }
@@ -0,0 +1,109 @@
+"""
+Load test: N concurrent simulated staff against a local fake LLM server.
+
+Each simulated staff member runs in its own thread (like a Streamlit script
+thread) and streams a number of turns. In `service` mode turns go through the
+shared ConversationService; in `direct` mode each thread calls the pooled
+sync client itself, as app.py used to. Reports p50/p99 turn latency and
+time-to-first-token.
+
+    python scripts/loadtest_service.py --staff 32 --turns 5 --ttft 0.2 --tps 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_llm_server import FakeLLMServer
+from pocketpa.clients import build_anthropic_client, build_async_anthropic_client
+from pocketpa.service import ConversationService, stream_claude
+
+SYSTEM = [{"type": "text", "text": "You are PocketPA, an AI assistant for care home staff."}]
+USER_TURN = "He threw his plate on the floor in the dining room about twenty minutes ago."
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def staff_member(staff_id, turns, think_time, run_turn, results):
+    history = []
+    for _ in range(turns):
+        history.append({"role": "user", "content": USER_TURN})
+        start = time.perf_counter()
+        first = None
+        reply = ""
+        for chunk in run_turn(staff_id, history[-5:]):
+            if first is None:
+                first = time.perf_counter()
+            reply += chunk
+        end = time.perf_counter()
+        history.append({"role": "assistant", "content": reply})
+        results.append((end - start, (first or end) - start))
+        if think_time:
+            time.sleep(think_time)
+
+
+def service_runner(server, args):
+    service = ConversationService(max_concurrency=args.concurrency, max_queue=args.staff * 2)
+    client = build_async_anthropic_client("test", pool_size=args.concurrency, base_url=server.url)
+
+    def run_turn(staff_id, messages):
+        return service.stream(staff_id, lambda: stream_claude(
+            client, model="fake", max_tokens=512, system=SYSTEM, messages=messages))
+    return run_turn
+
+
+def direct_runner(server, args):
+    client = build_anthropic_client("test", pool_size=args.staff, base_url=server.url)
+
+    def run_turn(staff_id, messages):
+        with client.messages.stream(model="fake", max_tokens=512, system=SYSTEM, messages=messages) as stream:
+            yield from stream.text_stream
+    return run_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--staff", type=int, default=32, help="Concurrent simulated staff")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per staff member")
+    parser.add_argument("--think", type=float, default=0.0, help="Pause between a staff member's turns (s)")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Fake server time-to-first-token (s)")
+    parser.add_argument("--tps", type=float, default=200, help="Fake server tokens per second")
+    parser.add_argument("--concurrency", type=int, default=8, help="Service max concurrent turns")
+    parser.add_argument("--mode", choices=["service", "direct", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["service", "direct"] if args.mode == "both" else [args.mode]
+    with FakeLLMServer(ttft=args.ttft, tokens_per_second=args.tps) as server:
+        print(f"🧪 {args.staff} staff x {args.turns} turns | ttft {args.ttft}s, {args.tps:.0f} tok/s")
+        for mode in modes:
+            run_turn = (service_runner if mode == "service" else direct_runner)(server, args)
+            results = []
+            threads = [
+                threading.Thread(target=staff_member, args=(f"staff-{i}", args.turns, args.think, run_turn, results))
+                for i in range(args.staff)
+            ]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+
+            latencies = [r[0] for r in results]
+            ttfts = [r[1] for r in results]
+            print(f"{mode:<8} turns {len(results):4d} | "
+                  f"turn p50 {statistics.median(latencies) * 1000:7.0f} ms p99 {percentile(latencies, 99) * 1000:7.0f} ms | "
+                  f"ttft p50 {statistics.median(ttfts) * 1000:7.0f} ms p99 {percentile(ttfts, 99) * 1000:7.0f} ms | "
+                  f"{len(results) / elapsed:6.1f} turns/s")
+
+
+if __name__ == "__main__":
+    main()
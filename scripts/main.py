@@ -1,12 +1,40 @@
-import google.generativeai as genai
 from datetime import datetime
 import json
 import os
-import time
+import sys
 
-# Configure Gemini with API key from environment variable
-# Note: Set GOOGLE_API_KEY environment variable before running
-genai.configure(api_key=os.environ.get("GOOGLE_API_KEY", ""))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pocketpa.admission import PRIORITY_CHAT, estimate_tokens, get_admission_controller
+from pocketpa.clients import get_gemini_model
+from pocketpa.context import ConversationContext
+from pocketpa.gap_detection import check_report, format_gaps
+from pocketpa.memory_store import get_staff_memory, migrate_json
+from pocketpa.policy_index import format_hits, get_policy_library, load_embedder
+from pocketpa.prompts import CacheStats
+from pocketpa.response_cache import get_response_cache
+from pocketpa.routing import LocalRouter, RouteDecision, last_skill_used
+from pocketpa.skills import get_skill_registry
+from pocketpa.tenancy import HomeStorage
+from pocketpa.tracing import current_span, get_tracer
+
+MODEL_NAME = 'gemini-2.0-flash-exp'
+# Gemini rate limits we admit requests under (set to your project's quota)
+REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "10"))
+TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "250000"))
+# Output budget assumed when estimating a request's token cost
+RESPONSE_TOKEN_ESTIMATE = 1024
+# Policy sections retrieved for policy-query turns, and an optional local embedding model
+POLICY_TOP_K = int(os.environ.get("POCKETPA_POLICY_TOP_K", "4"))
+EMBEDDING_MODEL = os.environ.get("POCKETPA_EMBEDDING_MODEL", "")
+# Care home whose memory folder the demo writes to (see pocketpa/tenancy.py)
+HOME_ID = os.environ.get("POCKETPA_HOME", "default")
+# Earlier messages from the staff member's memory store a demo session picks up from
+RESUME_MESSAGES = int(os.environ.get("POCKETPA_RESUME_MESSAGES", "6"))
+# Replies to standalone policy and training questions, shared across staff (size 0 disables it)
+RESPONSE_CACHE_SIZE = int(os.environ.get("POCKETPA_RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.environ.get("POCKETPA_RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("POCKETPA_RESPONSE_CACHE_THRESHOLD", "0.9"))
 
 class PocketPAChiefOfStaff:
     """
@@ -14,22 +42,55 @@ class PocketPAChiefOfStaff:
     Acts as the 'Chief of Staff' agent that routes user requests to the appropriate specialized skill.
     """
     
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')  # Updated model name
+    def __init__(self, model=None, admission=None, tracer=None, base_path=None):
+        # Skills, documents and policies are read from base_path (default: the repo root).
+        # Gemini is configured from the GOOGLE_API_KEY environment variable.
+        # The model handle, admission controller and tracer are shared process-wide.
+        # The SDK takes about a second to import, so the handle is fetched on the
+        # first turn that needs the LLM (see `model`).
+        self._model = model
+        self.admission = admission or get_admission_controller(
+            "gemini", requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE
+        )
+        # Stage timings (POCKETPA_TRACE_FILE / POCKETPA_METRICS_PORT to export them)
+        self.tracer = tracer or get_tracer()
+        self.cache_stats = CacheStats()
+        self.base_path = base_path or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.load_configuration()
         
     def load_configuration(self):
         """Loads the core agent configuration and valid skills index."""
         print("📚 Loading PocketPA configuration...")
         
-        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        base_path = self.base_path
+        
+        # Skills and documents are held in memory and reloaded when edited on disk
+        self.registry = get_skill_registry(base_path)
+        embedder = load_embedder(EMBEDDING_MODEL) if EMBEDDING_MODEL else None
+        # Built (or reopened) on the first policy question
+        self.policies = get_policy_library(
+            os.path.join(base_path, 'policies'),
+            os.path.join(base_path, 'memory', 'policy-index'),
+            embedder
+        )
+        self.responses = get_response_cache(
+            "gemini",
+            max_entries=RESPONSE_CACHE_SIZE,
+            ttl=RESPONSE_CACHE_TTL,
+            threshold=RESPONSE_CACHE_THRESHOLD,
+            embedder=embedder
+        )
+        self.router = None
+        self.context = None
+        self._skills_version = None
         
         try:
-            with open(os.path.join(base_path, 'AGENTS.md'), 'r', encoding='utf-8') as f:
-                self.agents_config = f.read()
+            self.registry.document('AGENTS.md', required=True)
+            self.registry.document('TABLE-OF-CONTENTS.md', required=True)
+            if self.registry.skill('incident-report') is None:
+                raise FileNotFoundError(os.path.join(self.registry.skills_dir, 'incident-report.md'))
             
-            with open(os.path.join(base_path, 'TABLE-OF-CONTENTS.md'), 'r', encoding='utf-8') as f:
-                self.toc = f.read()
+            self.sync_skills()
             
             print("✅ Configuration loaded successfully\n")
         except FileNotFoundError as e:
@@ -37,14 +98,43 @@ class PocketPAChiefOfStaff:
             print(f"Base path: {base_path}")
             raise
 
-    def route_request(self, user_input, conversation_context):
-        """
-        Semantic Router: Analyzes user intent and selects the best skill.
-        """
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = get_gemini_model(MODEL_NAME)
+        return self._model
+
+    @property
+    def agents_config(self):
+        return self.registry.document('AGENTS.md')
+
+    @property
+    def toc(self):
+        return self.registry.document('TABLE-OF-CONTENTS.md')
+
+    def sync_skills(self):
+        """Rebuild the router and context tracker if skill files changed since the last turn."""
+        self.registry.refresh()
+        if self.registry.version == self._skills_version:
+            return
+        self._skills_version = self.registry.version
+        
+        stats = self.router.stats if self.router else None
+        self.router = LocalRouter(self.registry.triggers())
+        if stats:
+            self.router.stats = stats
+        
+        # Older turns are summarised under the incident-report required fields
+        self.context = ConversationContext.from_skill(self.registry.skill_text('incident-report'))
+
+    def build_routing_prompt(self, user_input, conversation_context):
+        """Routing prompt as [static prefix, per-turn request]."""
         # Take the last few messages for context to avoid token limit issues
         recent_context = conversation_context[-3:] if len(conversation_context) > 3 else conversation_context
         
-        routing_prompt = f"""
+        # Static prefix first (identical every turn) so the provider can cache it,
+        # then the per-turn context.
+        routing_prefix = f"""
 You are the Chief of Staff for PocketPA. Your job is to analyze the user's request and route it to the most appropriate skill.
 
 SYSTEM CONFIGURATION:
@@ -53,11 +143,6 @@ SYSTEM CONFIGURATION:
 AVAILABLE SKILLS INDEX:
 {self.toc}
 
-CONVERSATION CONTEXT:
-{json.dumps(recent_context, indent=2)}
-
-USER'S LATEST REQUEST: "{user_input}"
-
 Analyze the user's intent carefully. Consider:
 - What are they trying to accomplish? (Reporting, Asking Policy, Training?)
 - Which skill file matches this intent?
@@ -66,97 +151,312 @@ Respond with ONLY the skill name (e.g., "incident-report", "policy-query", "micr
 If unsure, default to "incident-report".
         """
         
-        try:
-            response = self.model.generate_content(routing_prompt)
-            skill_name = response.text.strip().lower()
-            
-            # Normalize skill name
-            skill_name = skill_name.replace('.md', '').replace('skills/', '').strip()
-            
-            print(f"🔀 Routing decision: '{skill_name}'")
-            return skill_name
-            
-        except Exception as e:
-            print(f"⚠️ Routing error: {e}")
-            return "incident-report"  # Safe fallback
+        routing_request = f"""
+CONVERSATION CONTEXT:
+{json.dumps(recent_context, indent=2)}
 
-    def execute_skill(self, skill_name, user_input, conversation_history):
+USER'S LATEST REQUEST: "{user_input}"
         """
-        Executes the selected skill by loading its specific instructions (system prompt)
-        and passing the conversation context to the LLM.
+        return [routing_prefix, routing_request]
+
+    def record_usage(self, response):
+        """Count prompt-cache hits and add the response's token usage to the current span."""
+        usage = getattr(response, "usage_metadata", None)
+        self.cache_stats.record(usage)
+        span = current_span()
+        if span is not None:
+            span.record_usage(usage)
+
+    def parse_routing_response(self, response):
+        self.record_usage(response)
+        skill_name = response.text.strip().lower()
+        
+        # Normalize skill name
+        skill_name = skill_name.replace('.md', '').replace('skills/', '').strip()
+        
+        print(f"🔀 Routing decision: '{skill_name}'")
+        return skill_name
+
+    def route_request(self, user_input, conversation_context):
+        """
+        Semantic Router: Analyzes user intent and selects the best skill.
+        """
+        with self.tracer.span("route_request", source="llm") as span:
+            try:
+                prompt = self.build_routing_prompt(user_input, conversation_context)
+                response = self.admission.run(
+                    lambda: self.model.generate_content(prompt),
+                    estimate_tokens(prompt, [], RESPONSE_TOKEN_ESTIMATE),
+                    PRIORITY_CHAT
+                )
+                return self.parse_routing_response(response)
+            except Exception as e:
+                print(f"⚠️ Routing error: {e}")
+                span.set(error=type(e).__name__)
+                return "incident-report"  # Safe fallback
+
+    async def aroute_request(self, user_input, conversation_context):
+        """Async version of route_request, for the conversation service."""
+        with self.tracer.span("route_request", source="llm") as span:
+            try:
+                prompt = self.build_routing_prompt(user_input, conversation_context)
+                response = await self.admission.run_async(
+                    lambda: self.model.generate_content_async(prompt),
+                    estimate_tokens(prompt, [], RESPONSE_TOKEN_ESTIMATE),
+                    PRIORITY_CHAT
+                )
+                return self.parse_routing_response(response)
+            except Exception as e:
+                print(f"⚠️ Routing error: {e}")
+                span.set(error=type(e).__name__)
+                return "incident-report"  # Safe fallback
+
+    def check_gaps(self, conversation_history):
+        """
+        Run the local gap check on the latest incident report in the
+        conversation (the user's message included). Returns a GapReport, or
+        None if there is no report to check.
+        """
+        for msg in reversed(conversation_history):
+            if "INCIDENT REPORT" in msg["content"]:
+                with self.tracer.span("gap_detection") as span:
+                    result = check_report(msg["content"], self.registry.skill_text("incident-report"))
+                    span.set(gaps=len(result.gaps), ambiguous=len(result.ambiguous))
+                return result
+        return None
+
+    def shares_reply(self, skill_name, user_input, conversation_history):
+        """
+        True if the reply can be cached and served to other staff: a cacheable
+        skill, and a turn that opens it rather than following up, since
+        follow-ups depend on the conversation so far. Shared replies are
+        generated from the question alone (see execute_skill), so they can't
+        repeat anything from the staff member's conversation.
         """
-        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        skill_path = os.path.join(base_path, 'skills', f"{skill_name}.md")
+        return (self.responses.cacheable(skill_name, user_input)
+                and last_skill_used(conversation_history) != skill_name)
+
+    def cache_version(self, skill_name):
+        """What a cached reply depends on: the skill file and, for policy questions, the policies."""
+        skill = self.registry.skill(skill_name)
+        version = (skill.mtime if skill else None,)
+        if skill_name == "policy-query":
+            version += (self.policies.index().meta["sources"],)
+        return version
+
+    def local_skill_reply(self, skill_name, user_input, conversation_history):
+        """
+        A reply that needs no model call, as (reply, source) with source
+        "local" or "cache"; (None, None) if the model has to answer.
+        """
+        if skill_name == "gap-detection":
+            result = self.check_gaps(conversation_history)
+            # Ambiguous findings need the model to settle them
+            if result is not None and not result.ambiguous:
+                return format_gaps(result.gaps), "local"
+        if self.shares_reply(skill_name, user_input, conversation_history):
+            with self.tracer.span("response_cache", skill=skill_name) as span:
+                reply = self.responses.get(skill_name, user_input, self.cache_version(skill_name))
+                span.set(cache_hit=reply is not None)
+            if reply is not None:
+                return reply, "cache"
+        return None, None
+
+    def remember_reply(self, skill_name, user_input, reply):
+        if reply:
+            self.responses.put(skill_name, user_input, self.cache_version(skill_name), reply)
+
+    def build_execution_prompt(self, skill_name, user_input, conversation_history):
+        """
+        Load the skill's instructions and build the execution prompt as
+        [static skill prefix, per-turn request]. Returns (prompt, error_message).
+        """
+        with self.tracer.span("load_skill", skill=skill_name):
+            skill = self.registry.skill(skill_name)
         
         # Fallback if skill doesn't exist
-        if not os.path.exists(skill_path):
-            print(f"⚠️ Skill file not found: {skill_path}")
-            return f"I'm sorry, I don't know how to handle '{skill_name}' yet. Please try 'incident-report'."
+        if skill is None:
+            print(f"⚠️ Skill file not found: {os.path.join(self.registry.skills_dir, skill_name + '.md')}")
+            return None, f"I'm sorry, I don't know how to handle '{skill_name}' yet. Please try 'incident-report'."
         
-        try:
-            with open(skill_path, 'r', encoding='utf-8') as f:
-                skill_content = f.read()
-        except Exception as e:
-            return f"❌ Error loading skill definition: {e}"
+        if skill.path in self.registry.errors:
+            return None, f"❌ Error loading skill definition: {self.registry.errors[skill.path]}"
+        skill_content = skill.text
         
         print(f"📖 Executing skill: {skill_name}")
         
-        # Execution Prompt
-        execution_prompt = f"""
+        # Execution Prompt - static skill prefix first, per-turn content last
+        execution_prefix = f"""
 You are PocketPA, executing the '{skill_name}' skill for care home staff.
 
 SKILL INSTRUCTIONS (Follow these strictly):
 {skill_content}
 
-CONVERSATION HISTORY:
-{json.dumps(conversation_history, indent=2)}
-
-USER'S LATEST MESSAGE: "{user_input}"
-
 Instructions:
 1. Adhere to the 'Detailed Workflow' in the skill instructions.
 2. Maintain a warm, professional, and supportive tone.
 3. If gathering information, ask ONE question at a time.
 4. Check for missing required fields if applicable.
+        """
+        
+        summary, recent = self.context.build(conversation_history)
+        history_text = "\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in recent)
+        
+        # Per-skill context: only the most relevant policy sections, or the local gap check's findings
+        policy_context = ""
+        if skill_name == "policy-query":
+            hits = self.policies.search(user_input, k=POLICY_TOP_K)
+            policy_context = "RELEVANT POLICY SECTIONS (answer from these and cite them; say so if they don't cover the question):\n"
+            policy_context += format_hits(hits) if hits else "No matching policy sections were found."
+        elif skill_name == "gap-detection":
+            result = self.check_gaps(conversation_history)
+            if result is not None:
+                policy_context = "LOCAL CHECK FINDINGS (confirm or dismiss the ones marked '?', then feed back):\n"
+                policy_context += "\n".join(
+                    f"- {gap.label()} ({gap.kind}{'?' if gap.ambiguous else ''}): {gap.detail}" for gap in result.gaps
+                )
+        
+        execution_request = f"""
+{policy_context}
+
+{summary}
+
+RECENT CONVERSATION:
+{history_text}
+
+USER'S LATEST MESSAGE: "{user_input}"
 
 Respond naturally to the user:
         """
-        
-        try:
-            response = self.model.generate_content(execution_prompt)
-            return response.text
-        except Exception as e:
-            return f"❌ AI Execution error: {e}"
+        return [execution_prefix, execution_request], None
 
-    def chat(self, user_input, conversation_history=None):
+    def execute_skill(self, skill_name, user_input, conversation_history):
         """
-        Main entry point for the conversation.
-        Updates history, routes request, executes skill, and returns response.
+        Executes the selected skill by loading its specific instructions (system prompt)
+        and passing the conversation context to the LLM.
         """
-        if conversation_history is None:
-            conversation_history = []
-        
-        # Append user message
+        with self.tracer.span("execute_skill", skill=skill_name) as span:
+            reply, source = self.local_skill_reply(skill_name, user_input, conversation_history)
+            if reply is not None:
+                span.set(source=source)
+                return reply
+            
+            shared = self.shares_reply(skill_name, user_input, conversation_history)
+            # A reply other staff may be served is built without this conversation's history
+            history = [{"role": "user", "content": user_input}] if shared else conversation_history
+            prompt, error = self.build_execution_prompt(skill_name, user_input, history)
+            if error:
+                span.set(error="skill_unavailable")
+                return error
+            
+            try:
+                response = self.admission.run(
+                    lambda: self.model.generate_content(prompt),
+                    estimate_tokens(prompt, [], RESPONSE_TOKEN_ESTIMATE),
+                    PRIORITY_CHAT
+                )
+                self.record_usage(response)
+                if shared:
+                    self.remember_reply(skill_name, user_input, response.text)
+                return response.text
+            except Exception as e:
+                span.set(error=type(e).__name__)
+                return f"❌ AI Execution error: {e}"
+
+    async def aexecute_skill(self, skill_name, user_input, conversation_history):
+        """Async version of execute_skill, for the conversation service."""
+        with self.tracer.span("execute_skill", skill=skill_name) as span:
+            reply, source = self.local_skill_reply(skill_name, user_input, conversation_history)
+            if reply is not None:
+                span.set(source=source)
+                return reply
+            
+            shared = self.shares_reply(skill_name, user_input, conversation_history)
+            # A reply other staff may be served is built without this conversation's history
+            history = [{"role": "user", "content": user_input}] if shared else conversation_history
+            prompt, error = self.build_execution_prompt(skill_name, user_input, history)
+            if error:
+                span.set(error="skill_unavailable")
+                return error
+            
+            try:
+                response = await self.admission.run_async(
+                    lambda: self.model.generate_content_async(prompt),
+                    estimate_tokens(prompt, [], RESPONSE_TOKEN_ESTIMATE),
+                    PRIORITY_CHAT
+                )
+                self.record_usage(response)
+                if shared:
+                    self.remember_reply(skill_name, user_input, response.text)
+                return response.text
+            except Exception as e:
+                span.set(error=type(e).__name__)
+                return f"❌ AI Execution error: {e}"
+
+    def start_turn(self, user_input, conversation_history):
+        """Append the user message and try to route locally. Returns the local RouteDecision."""
         conversation_history.append({
             "role": "user",
             "content": user_input,
             "timestamp": datetime.now().isoformat()
         })
-        
-        # 1. Route
-        skill = self.route_request(user_input, conversation_history)
-        
-        # 2. Execute
-        response_text = self.execute_skill(skill, user_input, conversation_history)
-        
-        # Append assistant message
+        self.sync_skills()
+        with self.tracer.span("route_request", source="local") as span:
+            decision = self.router.route(user_input, conversation_history)
+            span.set(skill=decision.skill, confident=decision.confidence >= self.router.threshold)
+        if decision.confidence >= self.router.threshold:
+            print(f"🔀 Local routing: '{decision.skill}' ({decision.reason})")
+        return decision
+
+    def finish_turn(self, decision, response_text, conversation_history):
+        """Record the routing decision and append the assistant message."""
+        self.router.record(decision)
         conversation_history.append({
             "role": "assistant",
             "content": response_text,
             "timestamp": datetime.now().isoformat(),
-            "skill_used": skill
+            "skill_used": decision.skill,
+            "route_source": decision.source
         })
+
+    def chat(self, user_input, conversation_history=None):
+        """
+        Main entry point for the conversation.
+        Updates history, routes request, executes skill, and returns response.
+        """
+        if conversation_history is None:
+            conversation_history = []
+        
+        # 1. Route - resolve locally when confident, otherwise ask the LLM
+        decision = self.start_turn(user_input, conversation_history)
+        if decision.confidence < self.router.threshold:
+            skill = self.route_request(user_input, conversation_history)
+            decision = RouteDecision(skill, "llm", 1.0, f"escalated ({decision.reason})")
+        
+        # 2. Execute
+        response_text = self.execute_skill(decision.skill, user_input, conversation_history)
+        
+        self.finish_turn(decision, response_text, conversation_history)
+        return response_text, conversation_history
+
+    async def achat(self, user_input, conversation_history=None):
+        """
+        Async version of chat(). Submit it to a ConversationService so one slow
+        model call doesn't hold up other users:
+
+            service.submit(staff_id, lambda: pa.achat(text, history))
+        """
+        if conversation_history is None:
+            conversation_history = []
         
+        decision = self.start_turn(user_input, conversation_history)
+        if decision.confidence < self.router.threshold:
+            skill = await self.aroute_request(user_input, conversation_history)
+            decision = RouteDecision(skill, "llm", 1.0, f"escalated ({decision.reason})")
+        
+        response_text = await self.aexecute_skill(decision.skill, user_input, conversation_history)
+        
+        self.finish_turn(decision, response_text, conversation_history)
         return response_text, conversation_history
 
 
@@ -175,7 +475,19 @@ def demo_conversation():
         print("Failed to initialize PocketPA. Exiting.")
         return
 
-    conversation_history = []
+    # Each turn is appended to the staff member's memory store as it happens
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    staff_dir = HomeStorage(os.path.join(base_path, "memory"), HOME_ID).staff_dir("demo-staff")
+    memory = get_staff_memory(staff_dir)
+    imported = migrate_json(staff_dir, memory)
+    if imported:
+        print(f"📦 Imported {imported} messages from conversation.json into the memory store")
+
+    # Pick up where this staff member left off; only this session's turns are appended
+    conversation_history = memory.recent(RESUME_MESSAGES) if RESUME_MESSAGES > 0 else []
+    resumed = len(conversation_history)
+    if resumed:
+        print(f"🧠 Resuming with the last {resumed} messages from memory")
     
     # Scripted interaction for the demo
     # Scenario: A staff member reporting a behavioral incident
@@ -200,28 +512,25 @@ def demo_conversation():
         print(f"{'-'*60}")
         print(f"User: {msg}\n")
         
-        # Simulate processing time
-        time.sleep(1) 
-        
+        saved = len(conversation_history)
         response, conversation_history = pa.chat(msg, conversation_history)
+        memory.extend(conversation_history[saved:])
         
         print(f"🤖 PocketPA Response:\n{response}")
+        print(f"🗄️ Prompt cache: {pa.cache_stats.hits} hits / {pa.cache_stats.misses} misses")
+    
+    print(f"\n🔀 Routing: {pa.router.stats['local']} local / {pa.router.stats['llm']} LLM")
+    print(f"🗃️ Response cache: {pa.responses.hits} hits / {pa.responses.misses} misses ({pa.responses.hit_rate:.0%})")
+    for stage, row in pa.tracer.summary().items():
+        print(f"⏱️ {stage}: p50 {row['p50_ms']:.0f} ms / p95 {row['p95_ms']:.0f} ms over {row['count']}")
     
     # Save the resulting memory
     print(f"\n{'='*80}")
     print("💾 PERSISTING MEMORY")
     print(f"{'='*80}")
     
-    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    output_dir = os.path.join(base_path, "memory", "staff-contexts", "demo-staff")
-    os.makedirs(output_dir, exist_ok=True)
-    
-    output_file = os.path.join(output_dir, "conversation.json")
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(conversation_history, f, indent=2)
-        
-    print(f"✅ Conversation history saved to: {output_file}")
+    memory.close()
+    print(f"✅ {len(conversation_history) - resumed} messages appended to: {memory.path} ({len(memory)} in total)")
     print("🎉 Demo complete. System is fully operational.")
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""
+Import every staff member's conversation.json into their append-only memory store.
+
+Folders whose store already has messages are skipped, so this is safe to run
+again. The JSON files are left in place.
+
+    python scripts/migrate_staff_memory.py
+    python scripts/migrate_staff_memory.py --staff-dir memory/staff-contexts/demo-staff
+"""
+import argparse
+import glob
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pocketpa.memory_store import LEGACY_NAME, StaffMemory, migrate_json
+from pocketpa.tenancy import DEFAULT_HOME, HomeStorage
+
+MEMORY_ROOT = os.path.join(ROOT, "memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--staff-dir", action="append", help="one staff folder (repeatable; default: all of them)")
+    parser.add_argument("--home", default=DEFAULT_HOME, help="care home whose staff folders to migrate")
+    parser.add_argument("--memory-dir", help="default: the home's staff-contexts/ folder")
+    args = parser.parse_args()
+    args.memory_dir = args.memory_dir or HomeStorage(MEMORY_ROOT, args.home).reports_dir
+
+    staff_dirs = args.staff_dir or sorted(
+        os.path.dirname(path) for path in glob.glob(os.path.join(args.memory_dir, "*", LEGACY_NAME))
+    )
+    if not staff_dirs:
+        sys.exit(f"No {LEGACY_NAME} files under {args.memory_dir}")
+
+    for staff_dir in staff_dirs:
+        store = StaffMemory(staff_dir)
+        try:
+            imported = migrate_json(staff_dir, store)
+        finally:
+            store.close()
+        if imported:
+            print(f"✅ {staff_dir}: imported {imported} messages")
+        else:
+            print(f"⏭️ {staff_dir}: nothing to import ({len(store)} messages already stored)")
+
+
+if __name__ == "__main__":
+    main()
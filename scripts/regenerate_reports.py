@@ -0,0 +1,345 @@
+"""
+Regenerate formal reports from archived conversation logs.
+
+When the report template (pocketpa/reports.py) changes, past reports can be
+rebuilt from the conversation_log_*.txt files the app saves. Logs are read
+one at a time as they are submitted, either:
+
+- live (default): up to --concurrency Messages API calls in flight, admitted
+  by the shared AdmissionController so the account's request and token rate
+  limits are respected and 429/529 responses are retried;
+- batch: through the Message Batches API, --batch-size logs per batch (half
+  the price; results can take up to a day).
+
+Each conversation_log_<stamp>.txt in the --home's staff-contexts/ folder
+produces FORMAL_INCIDENT_REPORT_<stamp>.txt and .pdf in --output-dir. Every finished report and every submitted batch is
+appended to a checkpoint file in the output directory, so an interrupted run
+can be started again with the same command: finished logs are skipped and
+submitted batches are collected rather than re-sent. Reports regenerated with
+a different template, model or --max-tokens do not count as finished.
+
+    python scripts/regenerate_reports.py --concurrency 8
+    python scripts/regenerate_reports.py --mode batch --batch-size 200
+    python scripts/regenerate_reports.py --home oakfield
+    python scripts/regenerate_reports.py --fake --mode batch    # local stub, no API calls
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from pocketpa.admission import PRIORITY_BACKGROUND, AdmissionController, estimate_tokens
+from pocketpa.clients import build_async_anthropic_client
+from pocketpa.pdf import create_pdf_report
+from pocketpa.report_index import CONVERSATION_PREFIX, ReportIndex
+from pocketpa.reports import (
+    build_report_request, parse_conversation_log, report_filename, template_fingerprint
+)
+from pocketpa.service import complete_claude
+from pocketpa.tenancy import DEFAULT_HOME, HomeStorage
+
+# Same model as app.py unless overridden
+MODEL_NAME = os.environ.get("ANTHROPIC_MODEL", "claude-opus-4-20250514")
+MAX_TOKENS = 2048
+MEMORY_ROOT = os.path.join(ROOT, "memory")
+OUTPUT_NAME = "regenerated"
+CHECKPOINT_NAME = "regenerate-checkpoint.jsonl"
+CUSTOM_ID_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class Checkpoint:
+    """
+    Append-only JSONL record of progress. Only entries written with the
+    current template fingerprint count; a torn last line is ignored.
+    """
+
+    def __init__(self, path, template):
+        self.path = path
+        self.template = template
+        self.done = set()
+        self.failed = {}
+        self.batches = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("template") == template:
+                        self._apply(entry)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _apply(self, entry):
+        event = entry.get("event")
+        if event == "done":
+            self.done.add(entry["log"])
+            self.failed.pop(entry["log"], None)
+        elif event == "failed":
+            self.failed[entry["log"]] = entry.get("error", "")
+        elif event == "batch":
+            self.batches[entry["batch"]] = entry["logs"]
+        elif event == "collected":
+            self.batches.pop(entry["batch"], None)
+
+    def record(self, event, **fields):
+        entry = {"event": event, "template": self.template, "at": datetime.now().isoformat(timespec="seconds"), **fields}
+        self._apply(entry)
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class Regenerator:
+    """Turns conversation logs into report files, recording progress as it goes."""
+
+    def __init__(self, client, admission, args, checkpoint, index=None):
+        self.client = client
+        self.admission = admission
+        self.args = args
+        self.checkpoint = checkpoint
+        self.index = index
+        self.written = 0
+        self.failed = 0
+
+    def pending_logs(self):
+        """Log paths still to do, in filename order, skipping finished and in-flight ones."""
+        in_batches = {name for names in self.checkpoint.batches.values() for name in names}
+        count = 0
+        for path in sorted(glob.glob(os.path.join(self.args.logs_dir, self.args.pattern))):
+            name = os.path.basename(path)
+            if name in self.checkpoint.done or name in in_batches:
+                continue
+            if self.args.limit and count >= self.args.limit:
+                return
+            count += 1
+            yield path
+
+    def build_request(self, path):
+        """Return (params, estimated tokens), or None if the log holds no conversation."""
+        with open(path, encoding="utf-8") as f:
+            messages = parse_conversation_log(f.read())
+        if not messages:
+            return None
+        system_blocks, report_messages = build_report_request(messages)
+        params = dict(model=self.args.model, max_tokens=self.args.max_tokens, system=system_blocks, messages=report_messages)
+        return params, estimate_tokens(system_blocks, report_messages, self.args.max_tokens)
+
+    async def finish(self, name, text):
+        path = await asyncio.to_thread(self.write_report, name, text)
+        self.checkpoint.record("done", log=name, report=os.path.basename(path))
+        self.written += 1
+        print(f"✅ {name} -> {os.path.basename(path)}")
+
+    def fail(self, name, error):
+        self.checkpoint.record("failed", log=name, error=error)
+        self.failed += 1
+        print(f"❌ {name}: {error}")
+
+    def write_report(self, name, text):
+        path = os.path.join(self.args.output_dir, report_filename(name))
+        write_atomic(path, text.encode("utf-8"))
+        if not self.args.no_pdf:
+            write_atomic(path[:-len(".txt")] + ".pdf", create_pdf_report(text))
+        if self.index is not None:
+            self.index.add(path, text)
+        return path
+
+    # --- Live ---
+
+    async def run_live(self):
+        logs = self.pending_logs()
+
+        async def worker():
+            for path in logs:
+                await self.regenerate_one(path)
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def regenerate_one(self, path):
+        name = os.path.basename(path)
+        request = self.build_request(path)
+        if request is None:
+            self.fail(name, "no conversation in log")
+            return
+        params, tokens = request
+        try:
+            response = await self.admission.run_async(
+                lambda: complete_claude(self.client, **params), tokens, PRIORITY_BACKGROUND
+            )
+        except Exception as e:
+            self.fail(name, f"{type(e).__name__}: {e}")
+            return
+        await self.finish(name, response.content[0].text)
+
+    # --- Message Batches ---
+
+    async def run_batches(self):
+        for batch_id in list(self.checkpoint.batches):
+            print(f"⏳ Collecting batch {batch_id} from an earlier run")
+            await self.collect_batch(batch_id)
+
+        submitted = []
+        chunk = []
+        for path in self.pending_logs():
+            chunk.append(path)
+            if len(chunk) >= self.args.batch_size:
+                submitted.append(await self.submit_batch(chunk))
+                chunk = []
+        if chunk:
+            submitted.append(await self.submit_batch(chunk))
+
+        for batch_id in filter(None, submitted):
+            await self.collect_batch(batch_id)
+
+    async def submit_batch(self, paths):
+        requests, names = [], []
+        for path in paths:
+            name = os.path.basename(path)
+            request = self.build_request(path)
+            if request is None:
+                self.fail(name, "no conversation in log")
+                continue
+            requests.append({"custom_id": custom_id(name), "params": request[0]})
+            names.append(name)
+        if not requests:
+            return None
+        batch = await self.admission.run_async(
+            lambda: self.client.messages.batches.create(requests=requests), 1, PRIORITY_BACKGROUND
+        )
+        self.checkpoint.record("batch", batch=batch.id, logs=names)
+        print(f"📨 Submitted batch {batch.id} ({len(names)} logs)")
+        return batch.id
+
+    async def collect_batch(self, batch_id):
+        names = {custom_id(name): name for name in self.checkpoint.batches[batch_id]}
+        while True:
+            batch = await self.admission.run_async(
+                lambda: self.client.messages.batches.retrieve(batch_id), 1, PRIORITY_BACKGROUND
+            )
+            if batch.processing_status == "ended":
+                break
+            await asyncio.sleep(self.args.poll_interval)
+
+        async for entry in await self.client.messages.batches.results(batch_id):
+            name = names.get(entry.custom_id)
+            if name is None:
+                continue
+            if entry.result.type == "succeeded":
+                await self.finish(name, entry.result.message.content[0].text)
+            else:
+                self.fail(name, f"batch result {entry.result.type}")
+        self.checkpoint.record("collected", batch=batch_id)
+
+
+def custom_id(name):
+    """Batch custom_id for a log filename (letters, digits, _ and -, at most 64)."""
+    return CUSTOM_ID_RE.sub("_", os.path.splitext(name)[0])[-64:]
+
+
+def write_atomic(path, data):
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def fake_responder(body):
+    """Stub report for --fake; only the description depends on the request."""
+    return (
+        "INCIDENT REPORT\nBASIC INFORMATION\nDate: 01/01/2025\nTime: Not recorded\nLocation: Not recorded\n"
+        "Child: Not recorded\nReporting Staff: Not recorded\nReport ID: INC-STUB\n\n"
+        f"INCIDENT DESCRIPTION\nRegenerated from {len(json.dumps(body.get('messages', [])))} characters of conversation.\n\n"
+        "Report Generated: 01/01/2025 00:00\nStatus: AWAITING STAFF APPROVAL"
+    )
+
+
+async def run(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    template = template_fingerprint(args.model, args.max_tokens)
+    checkpoint = Checkpoint(os.path.join(args.output_dir, CHECKPOINT_NAME), template)
+    index = ReportIndex(args.index, args.output_dir) if args.index else None
+
+    server = None
+    base_url = args.base_url
+    api_key = os.environ.get("ANTHROPIC_API_KEY", "")
+    if args.fake:
+        from fake_llm_server import FakeLLMServer
+
+        server = FakeLLMServer(responder=fake_responder, batch_delay=min(args.poll_interval, 1.0)).start()
+        base_url, api_key = server.url, "fake"
+    elif not api_key:
+        sys.exit("Set ANTHROPIC_API_KEY (or use --fake to run against the local stub).")
+
+    # Retries are handled by the admission controller, which honours retry-after
+    client = build_async_anthropic_client(api_key, pool_size=args.concurrency, base_url=base_url).with_options(max_retries=0)
+    admission = AdmissionController(
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        max_retries=args.max_retries,
+    )
+    regenerator = Regenerator(client, admission, args, checkpoint, index)
+    skipped = len(checkpoint.done)
+
+    started = time.perf_counter()
+    try:
+        if args.mode == "batch":
+            await regenerator.run_batches()
+        else:
+            await regenerator.run_live()
+    finally:
+        checkpoint.close()
+        await client.close()
+        if server is not None:
+            server.stop()
+        if index is not None:
+            index.close()
+
+    print(f"\n{regenerator.written} regenerated, {regenerator.failed} failed, {skipped} already done "
+          f"in {time.perf_counter() - started:.1f}s (template {template})")
+    print(f"Checkpoint: {os.path.join(args.output_dir, CHECKPOINT_NAME)}")
+    return regenerator.failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--home", default=DEFAULT_HOME, help="care home whose logs to regenerate")
+    parser.add_argument("--logs-dir", help="default: the home's staff-contexts/ folder")
+    parser.add_argument("--pattern", default=f"{CONVERSATION_PREFIX}_*.txt")
+    parser.add_argument("--output-dir", help=f"default: {OUTPUT_NAME}/ in the logs folder")
+    parser.add_argument("--mode", choices=("live", "batch"), default="live")
+    parser.add_argument("--concurrency", type=int, default=8, help="live mode: requests in flight")
+    parser.add_argument("--batch-size", type=int, default=100, help="batch mode: logs per batch")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="batch mode: seconds between status checks")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many logs (0 = all)")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    parser.add_argument("--requests-per-minute", type=int, default=int(os.environ.get("ANTHROPIC_REQUESTS_PER_MINUTE", "50")))
+    parser.add_argument("--tokens-per-minute", type=int, default=int(os.environ.get("ANTHROPIC_TOKENS_PER_MINUTE", "40000")))
+    parser.add_argument("--max-retries", type=int, default=int(os.environ.get("ANTHROPIC_MAX_RETRIES", "4")))
+    parser.add_argument("--no-pdf", action="store_true", help="write the .txt reports only")
+    parser.add_argument("--index", help="also add the reports to this Past Reports index (e.g. the home's report-index.sqlite3)")
+    parser.add_argument("--base-url", help="Anthropic API base URL")
+    parser.add_argument("--fake", action="store_true", help="run against a local stub of the API")
+    args = parser.parse_args()
+    args.logs_dir = args.logs_dir or HomeStorage(MEMORY_ROOT, args.home).reports_dir
+    args.output_dir = args.output_dir or os.path.join(args.logs_dir, OUTPUT_NAME)
+
+    failed = asyncio.run(run(args))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Run several Streamlit workers behind a session-affine router.
+
+One Streamlit process serves every session from a single Python process, so
+a busy host - or several care homes on one box - runs several workers. This
+script starts `--workers` copies of app.py on local ports and accepts
+browsers on `--port`:
+
+- Each browser gets an affinity cookie, and every request carrying it goes to
+  the same worker, where its session state lives. New sessions go to the
+  live worker with the fewest recent sessions.
+- The home is chosen from the Host header (`--home oakfield=oakfield.example.org`,
+  repeatable; `--default-home` for anything else) and passed to the worker
+  in the X-PocketPA-Home header, replacing any value the browser sent. Each
+  home's data lives in its own directory (see pocketpa/tenancy.py).
+- Dead workers are restarted; their sessions move to live workers and recover
+  their drafts from disk.
+
+Routers and workers share nothing but the filesystem and a SQLite WAL
+database (memory/workers.sqlite3), so more routers can run against the same
+workers, e.g. one per port behind a load balancer, with `--router-only`.
+
+    python scripts/serve.py --workers 4 --port 8501
+    python scripts/serve.py --workers 8 --home oakfield=oakfield.local --home elmhurst=elmhurst.local
+"""
+import argparse
+import asyncio
+import http.cookies
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pocketpa.tenancy import DEFAULT_HOME, HOME_HEADER, valid_home
+from pocketpa.workers import WorkerDirectory
+
+DEFAULT_DB = os.path.join(ROOT, "memory", "workers.sqlite3")
+AFFINITY_COOKIE = "pocketpa_affinity"
+MAX_HEAD_BYTES = 64 * 1024
+HEARTBEAT_SECONDS = 5.0
+# Request headers the router sets itself; copies sent by the browser are dropped
+STRIPPED_HEADERS = {HOME_HEADER.lower(), "x-forwarded-for", "x-forwarded-host"}
+
+
+def parse_head(head):
+    """(request line, [(name, value)]) from a raw HTTP request head."""
+    lines = head.decode("latin-1").split("\r\n")
+    headers = []
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def header(headers, name):
+    name = name.lower()
+    return next((value for key, value in headers if key.lower() == name), None)
+
+
+def affinity_id(headers):
+    cookie = http.cookies.SimpleCookie()
+    try:
+        cookie.load(header(headers, "cookie") or "")
+    except http.cookies.CookieError:
+        return None
+    morsel = cookie.get(AFFINITY_COOKIE)
+    value = morsel.value if morsel else ""
+    return value if len(value) == 32 and all(c in "0123456789abcdef" for c in value) else None
+
+
+def rewrite_head(request_line, headers, home, client_ip):
+    """
+    The request head forwarded to the worker: the home header set, and
+    plain HTTP requests closed after one response so every request on the
+    browser's connection passes through the router (and its home check).
+    """
+    upgrade = (header(headers, "upgrade") or "").lower() == "websocket"
+    lines = [request_line]
+    for name, value in headers:
+        if name.lower() in STRIPPED_HEADERS or (not upgrade and name.lower() in ("connection", "keep-alive")):
+            continue
+        lines.append(f"{name}: {value}")
+    lines += [f"{HOME_HEADER}: {home}", f"X-Forwarded-For: {client_ip}"]
+    if not upgrade:
+        lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def pipe(reader, writer):
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+async def respond(writer, status, body):
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n{body}".encode())
+    await writer.drain()
+    writer.close()
+
+
+class Router:
+    """Forwards each browser connection to its session's worker."""
+
+    def __init__(self, directory, homes, default_home):
+        self.directory = directory
+        self.homes = homes
+        self.default_home = default_home
+
+    def home_for(self, headers):
+        host = (header(headers, "host") or "").split(":")[0].lower()
+        return self.homes.get(host, self.default_home)
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        request_line, headers = parse_head(head)
+        home = self.home_for(headers)
+        if home is None:
+            await respond(client_writer, "404 Not Found", "Unknown care home.\n")
+            return
+
+        affinity = affinity_id(headers)
+        new_cookie = affinity is None
+        if new_cookie:
+            affinity = uuid.uuid4().hex
+        # SQLite calls are short but blocking; keep them off the event loop
+        assigned = await asyncio.to_thread(self.directory.assign, affinity, home)
+        if assigned is None:
+            await respond(client_writer, "503 Service Unavailable", "No PocketPA worker is available.\n")
+            return
+        host, port = assigned[1].rsplit(":", 1)
+        try:
+            worker_reader, worker_writer = await asyncio.open_connection(host, int(port))
+        except OSError:
+            await respond(client_writer, "502 Bad Gateway", "PocketPA worker is restarting, please retry.\n")
+            return
+
+        client_ip = client_writer.get_extra_info("peername", ("", 0))[0]
+        worker_writer.write(rewrite_head(request_line, headers, home, client_ip))
+        if new_cookie:
+            try:
+                response_head = await worker_reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                client_writer.close()
+                worker_writer.close()
+                return
+            cookie = f"Set-Cookie: {AFFINITY_COOKIE}={affinity}; Path=/; HttpOnly; SameSite=Lax\r\n"
+            status_end = response_head.index(b"\r\n") + 2
+            client_writer.write(response_head[:status_end] + cookie.encode() + response_head[status_end:])
+        await asyncio.gather(pipe(client_reader, worker_writer), pipe(worker_reader, client_writer))
+
+
+class Launcher:
+    """Starts the workers, restarts any that exit, and keeps their heartbeats fresh."""
+
+    def __init__(self, directory, count, base_port, app_args):
+        self.directory = directory
+        self.count = count
+        self.base_port = base_port
+        self.app_args = app_args
+        self.processes = {}
+
+    def start(self, index):
+        worker_id = f"worker-{index}"
+        port = self.base_port + index
+        env = dict(os.environ, POCKETPA_WORKER_ID=worker_id)
+        process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"),
+             "--server.address", "127.0.0.1", "--server.port", str(port), "--server.headless", "true",
+             *self.app_args],
+            cwd=ROOT, env=env
+        )
+        self.processes[worker_id] = (process, index)
+        self.directory.register(worker_id, f"127.0.0.1:{port}", process.pid)
+        print(f"🚀 {worker_id} on 127.0.0.1:{port} (pid {process.pid})")
+
+    async def supervise(self):
+        for index in range(self.count):
+            self.start(index)
+        while True:
+            for worker_id, (process, index) in list(self.processes.items()):
+                if process.poll() is not None:
+                    print(f"⚠️ {worker_id} exited with {process.returncode}; restarting")
+                    self.directory.remove(worker_id)
+                    self.start(index)
+            await asyncio.to_thread(self.directory.heartbeat, list(self.processes))
+            await asyncio.to_thread(self.directory.expire)
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    def stop(self):
+        for worker_id, (process, _) in self.processes.items():
+            process.terminate()
+            self.directory.remove(worker_id)
+        deadline = time.monotonic() + 10
+        for process, _ in self.processes.values():
+            try:
+                process.wait(max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def parse_homes(values):
+    homes = {}
+    for value in values or []:
+        home, _, hosts = value.partition("=")
+        if not valid_home(home) or not hosts:
+            sys.exit(f"--home expects id=host[,host...], got {value!r}")
+        for host in hosts.split(","):
+            homes[host.strip().lower()] = home
+    return homes
+
+
+async def run(args):
+    directory = WorkerDirectory(args.db)
+    default_home = None if args.default_home == "none" else args.default_home
+    router = Router(directory, parse_homes(args.home), default_home)
+    server = await asyncio.start_server(router.handle, args.host, args.port, limit=MAX_HEAD_BYTES)
+    print(f"🔀 Routing http://{args.host}:{args.port} -> workers in {args.db}")
+
+    launcher = None if args.router_only else Launcher(directory, args.workers, args.worker_port, args.app_args)
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, lambda: stopped.done() or stopped.set_result(None))
+    tasks = [asyncio.ensure_future(server.serve_forever())]
+    if launcher:
+        tasks.append(asyncio.ensure_future(launcher.supervise()))
+    try:
+        await asyncio.wait([stopped, *tasks], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if launcher:
+            launcher.stop()
+        directory.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--worker-port", type=int, default=8600, help="first worker port (default 8600)")
+    parser.add_argument("--home", action="append", help="home=host[,host...]: serve this home on these host names")
+    parser.add_argument("--default-home", default=DEFAULT_HOME,
+                        help=f"home for any other host name, or 'none' to refuse them (default {DEFAULT_HOME})")
+    parser.add_argument("--db", default=DEFAULT_DB, help="shared worker and session database")
+    parser.add_argument("--router-only", action="store_true", help="route to workers another serve.py launched")
+    parser.add_argument("app_args", nargs=argparse.REMAINDER, help="extra arguments for `streamlit run`, after --")
+    args = parser.parse_args()
+    if args.app_args[:1] == ["--"]:
+        args.app_args = args.app_args[1:]
+    if args.default_home != "none" and not valid_home(args.default_home):
+        sys.exit(f"Invalid --default-home: {args.default_home!r}")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()